@@ -0,0 +1,288 @@
+"""
+This contains the client for the Buggy Cars API, which the tests use rather than building the URLs
+and reading the JSON themselves.
+
+The responses are returned as records, which use `__slots__` so that a catalog of models takes
+little memory, and `iter_models` fetches the pages of models one at a time as they are needed. The
+client doesn't need a browser, so it doesn't import selenium.
+"""
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import quote, urljoin
+
+import requests
+
+from buggy_cars_testing import http_session
+from buggy_cars_testing.constants import BASE_API_URL
+
+
+# The paths of the API endpoints, relative to the base URL of the API.
+TOKEN_PATH = "oauth/token"
+MODELS_PATH = "models"
+PROFILE_PATH = "users/profile"
+
+
+def model_path(model_id: str) -> str:
+    """
+    Returns the path of the details of a car model.
+    """
+    return quote(f"{MODELS_PATH}/{model_id}")
+
+
+def vote_path(model_id: str) -> str:
+    """
+    Returns the path for voting for a car model.
+    """
+    return quote(f"{MODELS_PATH}/{model_id}/vote")
+
+
+class ApiError(RuntimeError):
+    """
+    The API responded with an error status.
+    """
+
+    def __init__(self, status: int, message: str, url: str) -> None:
+        super().__init__(f"{status} from {url}: {message}")
+        self.status = status
+        self.message = message
+
+
+def _api_field(name: str) -> str:
+    """
+    Returns the name of the API field for an attribute, e.g. "makeId" for "make_id".
+    """
+    first, *rest = name.split("_")
+    return first + "".join(part.capitalize() for part in rest)
+
+
+class Record:
+    """
+    The base class for the records returned by the API client.
+    Each subclass lists its attributes in `__slots__`, and their types as annotations. The API
+    field of each attribute is its name in camel case.
+    """
+
+    __slots__: Tuple[str, ...] = ()
+
+    def __init__(self, **values: Any) -> None:
+        for name in self.__slots__:
+            setattr(self, name, values.get(name))
+
+    @classmethod
+    def from_json(cls, data: Dict[str, Any]) -> "Record":
+        """
+        Returns the record for the JSON returned by the API.
+        """
+        return cls(**{name: data.get(_api_field(name)) for name in cls.__slots__})
+
+    def to_json(self) -> Dict[str, Any]:
+        """
+        Returns the record as the JSON used by the API.
+        """
+        return {_api_field(name): getattr(self, name) for name in self.__slots__}
+
+    def __eq__(self, other: object) -> bool:
+        return type(self) is type(other) and all(
+            getattr(self, name) == getattr(other, name) for name in self.__slots__
+        )
+
+    def __repr__(self) -> str:
+        values = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({values})"
+
+
+class RankedModel(Record):
+    """
+    A car model in the overall rankings. `comments` is the number of comments.
+    """
+
+    __slots__ = ("id", "make_id", "make", "name", "rank", "votes", "comments")
+    id: str
+    make_id: str
+    make: str
+    name: str
+    rank: int
+    votes: int
+    comments: int
+
+
+class Comment(Record):
+    """
+    A comment on a car model, with the full name of the user that posted it.
+    """
+
+    __slots__ = ("user", "text", "date_posted")
+    user: str
+    text: str
+    date_posted: str
+
+
+class Model(Record):
+    """
+    The details of a car model. `can_vote` is whether the user of the token can vote for it.
+    """
+
+    __slots__ = (
+        "id",
+        "make",
+        "name",
+        "description",
+        "engine_vol",
+        "max_speed",
+        "votes",
+        "can_vote",
+        "comments",
+    )
+    id: str
+    make: str
+    name: str
+    description: str
+    engine_vol: float
+    max_speed: int
+    votes: int
+    can_vote: bool
+    comments: List[Comment]
+
+    @classmethod
+    def from_json(cls, data: Dict[str, Any]) -> "Model":
+        model = super().from_json(data)
+        model.comments = [Comment.from_json(comment) for comment in data.get("comments") or []]
+        return model
+
+    def to_json(self) -> Dict[str, Any]:
+        data = super().to_json()
+        data["comments"] = [comment.to_json() for comment in self.comments]
+        return data
+
+
+class Profile(Record):
+    """
+    The profile of a user.
+    """
+
+    __slots__ = (
+        "username",
+        "first_name",
+        "last_name",
+        "gender",
+        "age",
+        "address",
+        "phone",
+        "hobby",
+    )
+    username: str
+    first_name: str
+    last_name: str
+    gender: str
+    age: str
+    address: str
+    phone: str
+    hobby: str
+
+    @property
+    def full_name(self) -> str:
+        """
+        The name that is shown with the user's comments.
+        """
+        return f"{self.first_name} {self.last_name}"
+
+
+class ModelsPage(Record):
+    """
+    A page of the overall rankings.
+    """
+
+    __slots__ = ("page", "total_pages", "models")
+    page: int
+    total_pages: int
+    models: List[RankedModel]
+
+    @classmethod
+    def from_json(cls, data: Dict[str, Any]) -> "ModelsPage":
+        page = super().from_json(data)
+        page.models = [RankedModel.from_json(model) for model in data.get("models") or []]
+        return page
+
+
+class ApiClient:
+    """
+    This sends requests to the API using the shared HTTP session.
+    Requests are sent with the `token` if there is one, as the user it belongs to.
+    """
+
+    def __init__(self, token: Optional[str] = None, base_url: str = BASE_API_URL) -> None:
+        self.token = token
+        self.base_url = base_url
+
+    def with_token(self, token: Optional[str]) -> "ApiClient":
+        """
+        Returns a client that sends requests with the `token`.
+        """
+        return ApiClient(token, self.base_url)
+
+    def request(self, method: str, path: str, **kwargs: Any) -> requests.Response:
+        """
+        Send a request to the API `path`, and return the response.
+        Raises `ApiError` if the API responds with an error status.
+        """
+        if self.token:
+            kwargs["headers"] = {"authorization": self.token, **kwargs.get("headers", {})}
+        url = urljoin(self.base_url, path)
+        response = http_session.request(method, url, **kwargs)
+        if response.status_code >= 400:
+            try:
+                message = response.json().get("message", response.text)
+            except ValueError:
+                message = response.text
+            raise ApiError(response.status_code, message, url)
+        return response
+
+    def get_json(self, path: str, **kwargs: Any) -> Any:
+        """
+        Returns the JSON response to a GET request to the API `path`.
+        """
+        return self.request("GET", path, **kwargs).json()
+
+    def models_page(self, page_num: int) -> ModelsPage:
+        """
+        Returns page `page_num` of the overall rankings.
+        """
+        return ModelsPage.from_json(self.get_json(MODELS_PATH, params={"page": page_num}))
+
+    def iter_models(self, first_page: int = 1) -> Iterator[RankedModel]:
+        """
+        Yields the car models in the overall rankings, fetching each page only when the models
+        before it have been used.
+        The rankings can change between pages, so a model can be yielded twice or be skipped.
+        """
+        page_num = first_page
+        while True:
+            page = self.models_page(page_num)
+            yield from page.models
+            if page_num >= page.total_pages or not page.models:
+                return
+            page_num += 1
+
+    def model(self, model_id: str) -> Model:
+        """
+        Returns the details of a car model.
+        """
+        return Model.from_json(self.get_json(model_path(model_id)))
+
+    def vote(self, model_id: str, comment: str = "") -> None:
+        """
+        Vote for a car model, with a comment if there is one.
+        """
+        self.request("POST", vote_path(model_id), json={"comment": comment})
+
+    def profile(self) -> Profile:
+        """
+        Returns the profile of the user.
+        """
+        return Profile.from_json(self.get_json(PROFILE_PATH))
+
+    def update_profile(self, profile: Profile) -> Profile:
+        """
+        Update the profile of the user, and return the updated profile.
+        """
+        fields = {field: value for field, value in profile.to_json().items() if value is not None}
+        return Profile.from_json(self.request("PUT", PROFILE_PATH, json=fields).json())
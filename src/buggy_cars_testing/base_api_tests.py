@@ -0,0 +1,120 @@
+"""
+This contains the base class for the tests that only use the API, which is also the base class of
+the tests that use a browser.
+
+It doesn't import selenium, so tests that only use the API run without a browser and import fast.
+"""
+import contextlib
+import os
+import secrets
+import string
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, TypeVar
+import unittest
+
+from buggy_cars_testing import stand_in_server, token_cache, tracing
+from buggy_cars_testing.api_client import ApiClient
+from buggy_cars_testing.constants import NAME_LENGTH, SUBTEST_SHARD_ENV_VAR, USE_LOCAL_SERVER
+
+T = TypeVar("T")
+TestMethod = TypeVar("TestMethod", bound=Callable[..., None])
+
+
+def subtest_shards(count: int) -> Callable[[TestMethod], TestMethod]:
+    """
+    Mark a test case with a long loop of subTests, so the test runner splits it into `count` shards
+    that run in parallel. The test case needs to loop over `BaseApiTests.shard_subtests`.
+    """
+
+    def decorator(test_method: TestMethod) -> TestMethod:
+        test_method.subtest_shards = count
+        return test_method
+
+    return decorator
+
+
+class BaseApiTests(unittest.TestCase):
+    """
+    This is the base class for the tests that only use the API.
+    It contains common methods that are shared across all of the tests.
+    """
+
+    # Whether the tests need a browser. Tests that don't are only run once by the test runner,
+    # rather than once per browser.
+    uses_browser = False
+
+    # A client for the API, without a token.
+    api = ApiClient()
+
+    # The users (username to password) that need to exist when running against the stand-in server.
+    stand_in_users: Dict[str, str] = {}
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """
+        Start the stand-in server in this process if the tests have been configured to use it.
+        """
+        if USE_LOCAL_SERVER:
+            stand_in_server.ensure_running(cls.stand_in_users)
+
+    def run(self, result: Optional[unittest.TestResult] = None) -> Optional[unittest.TestResult]:
+        """
+        Run the test case, timing it including its setUp and tearDown.
+        """
+        with tracing.span("test", self.id()):
+            return super().run(result)
+
+    @contextlib.contextmanager
+    def subTest(self, *args: Any, **params: Any) -> Iterator[None]:
+        """
+        Run a subTest, timing it.
+        """
+        with super().subTest(*args, **params), tracing.span(
+            "subtest", f"{self._testMethodName} {params}"
+        ):
+            yield
+
+    def shard_subtests(self, items: Iterable[T]) -> List[T]:
+        """
+        Returns the items that subTests should be run for.
+        This is all of the items, unless the test runner has split the test case into shards.
+        """
+        items = list(items)
+        shard = os.environ.get(SUBTEST_SHARD_ENV_VAR)
+        if not shard:
+            return items
+        index, count = (int(part) for part in shard.split("/"))
+        return items[index::count]
+
+    def generate_random_name(self) -> str:
+        """
+        Generate a random name that can be used as either a first or last name.
+        """
+        return self.generate_random_string(string.ascii_lowercase, NAME_LENGTH).capitalize()
+
+    def generate_random_string(self, chars_to_use: str, length: str) -> str:
+        """
+        Generate a random string using characters from `chars_to_use` and make the string of length
+        `length`.
+        """
+        random_string_list = [secrets.choice(chars_to_use) for _ in range(length)]
+        return "".join(random_string_list)
+
+    def generate_token(self, username: str, password: str) -> str:
+        """
+        Generate a new token to use for API calls.
+        """
+        with tracing.span("token", "generate_token"):
+            return token_cache.request_token(username, password)[0]
+
+    def get_token(self, username: str, password: str) -> str:
+        """
+        Get a token to use for API calls, reusing a cached token if it is not about to expire.
+        """
+        return token_cache.TOKEN_PROVIDER.get_token(username, password)
+
+    def get_request_from_api_with_token(self, token: str, url: str) -> Dict[Any, Any]:
+        """
+        Send a GET request to the API with the provided token.
+        Returns the JSON response.
+        """
+        return self.api.with_token(token).get_json(url)
@@ -1,54 +1,60 @@
 """
-This contains the base class for the tests for the Buggy Car testing.
+This contains the base class for the tests for the Buggy Car testing that use a browser.
 """
-import os
-import secrets
-import string
-from typing import Any, Dict
-import unittest
-from urllib.parse import urljoin
-
-import requests
+import json
+from typing import Any, Dict, List, Optional
+
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.remote.webelement import WebElement
 
-from buggy_cars_testing.constants import (
-    API_WAIT_TIME,
-    BASE_API_URL,
-    NAME_LENGTH,
-    BROWSER_TYPE_ENV_VAR,
+from buggy_cars_testing import dom_extraction, page_objects, page_performance, tracing, waits
+
+# subtest_shards is imported from here by the test modules.
+from buggy_cars_testing.base_api_tests import (  # pylint: disable=unused-import
+    BaseApiTests,
+    subtest_shards,
 )
+from buggy_cars_testing.constants import BASE_URL, TOKEN_STORAGE_KEY
+from buggy_cars_testing.driver_pool import DRIVER_POOL
 
 
-class BaseBuggyCarTests(unittest.TestCase):
+class BaseBuggyCarTests(BaseApiTests):
     """
-    This is the base class for all of the tests for the Buggy Car testing.
+    This is the base class for all of the tests for the Buggy Car testing that use a browser.
     It contains common methods that is shared across the tests.
     """
 
+    uses_browser = True
     driver: webdriver.remote.webdriver.WebDriver
 
     def setUp(self) -> None:
         """
-        Start up a new browser per test case.
+        Get a browser for the test case from the pool of browsers.
         The browser type can be changed based on an environment variable.
         """
-        # Chrome is the default
-        chosen_browser = webdriver.Chrome
-
-        if BROWSER_TYPE_ENV_VAR in os.environ:
-            browser_type = os.environ[BROWSER_TYPE_ENV_VAR]
-            if browser_type == "firefox":
-                chosen_browser = webdriver.Firefox
+        self.driver = DRIVER_POOL.acquire()
+        # A cleanup is used rather than tearDown so the browser is returned even if a subclass
+        # setUp or tearDown fails. Returning the browser resets it for the next test case.
+        self.addCleanup(DRIVER_POOL.release, self.driver)
 
-        self.driver = chosen_browser()
+    def open_page(self, url: str) -> None:
+        """
+        Go to the `url`, timing how long the page takes to load.
+        """
+        page_objects.open_page(self.driver, url)
 
-    def tearDown(self) -> None:
+    def assert_page_within_budget(self) -> page_performance.PageMetrics:
         """
-        Close the browser after each test case.
+        Check that the page the browser is on loaded within its budget in `PAGE_BUDGETS`.
+        Returns how fast the page loaded.
         """
-        self.driver.close()
+        metrics = page_performance.CAPTURE.collect(self.driver) or page_performance.measure(
+            self.driver
+        )
+        over_budget = page_performance.check_budget(metrics)
+        self.assertFalse(over_budget, f"{metrics.url} is over its budget: {'; '.join(over_budget)}")
+        return metrics
 
     def set_value_in_input_box(
         self, element_id: str, value: str, use_name: bool = False
@@ -60,59 +66,60 @@ class BaseBuggyCarTests(unittest.TestCase):
 
         Returns the element that was updated.
         """
-        elem = self.driver.find_element(By.NAME if use_name else By.ID, element_id)
-        elem.clear()
-        elem.send_keys(value)
+        with tracing.span("input", element_id):
+            elem = self.driver.find_element(By.NAME if use_name else By.ID, element_id)
+            elem.clear()
+            elem.send_keys(value)
 
         return elem
 
-    def find_active_alert_messages(self) -> None:
+    def wait_for_alert_messages(self) -> List[str]:
         """
-        Check for any displayed alerts.
+        Wait for any alerts to be displayed, and return their text.
         """
-        return [
-            alert.text
-            for alert in self.driver.find_elements(By.XPATH, "//div[contains(@class, 'alert')]")
-            if alert.is_displayed()
-        ]
+        return waits.wait_for_alert_messages(self.driver)
 
-    def get_element_containing_text(self, text: str) -> WebElement:
+    def wait_for_element(self, css_selector: str) -> WebElement:
         """
-        Return the element which contains the specified text.
+        Wait for an element that matches the `css_selector` to appear, and return it.
         """
-        return self.driver.find_element(By.XPATH, f"//*[contains(text(), '{text}')]")
+        return waits.wait_for_element(self.driver, css_selector)
 
-    def generate_random_name(self) -> str:
+    def get_table_contents(self, css_selector: str = "table") -> Optional[Dict[str, Any]]:
         """
-        Generate a random name that can be used as either a first or last name.
+        Returns the whole table matching the `css_selector` in one round trip to the browser: the
+        `headers`, and the text of the `cells` and the URLs of the `links` in each of the `rows`.
+        Returns None if there is no matching table.
         """
-        return self.generate_random_string(string.ascii_lowercase, NAME_LENGTH).capitalize()
+        return dom_extraction.get_table(self.driver, css_selector)
 
-    def generate_random_string(self, chars_to_use: str, length: str) -> str:
+    def log_in_with_token(self, token: str) -> None:
         """
-        Generate a random string using characters from `chars_to_use` and make the string of length
-        `length`.
+        Log the browser in using an API token rather than the login form, and go to the home page.
         """
-        random_string_list = [secrets.choice(chars_to_use) for _ in range(length)]
-        return "".join(random_string_list)
+        with tracing.span("login", "token"):
+            self._log_in_with_token(token)
 
-    def generate_token(self, username: str, password: str) -> str:
-        """
-        Generate a token to use for API calls.
-        """
-        url = urljoin(BASE_API_URL, "oauth/token")
-        token_contents = requests.post(
-            url,
-            data={"grant_type": "password", "username": username, "password": password},
-            timeout=API_WAIT_TIME,
-        ).json()
-        return f"{token_contents['token_type']} {token_contents['access_token']}"
-
-    def get_request_from_api_with_token(self, token: str, url: str) -> Dict[Any, Any]:
-        """
-        Send a GET request to the API with the provided token.
-        Returns the JSON response.
-        """
-        return requests.get(
-            urljoin(BASE_API_URL, url), headers={"authorization": token}, timeout=API_WAIT_TIME
-        ).json()
+    def _log_in_with_token(self, token: str) -> None:
+        script = (
+            f"window.localStorage.setItem({json.dumps(TOKEN_STORAGE_KEY)}, {json.dumps(token)});"
+        )
+        if hasattr(self.driver, "execute_cdp_cmd"):
+            # Chrome can run the script before the website's own scripts, so the home page is
+            # logged in the first time it loads. The script is removed afterwards, as the browser
+            # is reused by other test cases.
+            script_id = self.driver.execute_cdp_cmd(
+                "Page.addScriptToEvaluateOnNewDocument", {"source": script}
+            )["identifier"]
+            self.open_page(BASE_URL)
+            self.driver.execute_cdp_cmd(
+                "Page.removeScriptToEvaluateOnNewDocument", {"identifier": script_id}
+            )
+        else:
+            # Local storage can only be set once a page from the website has loaded.
+            self.open_page(BASE_URL)
+            self.driver.execute_script(script)
+            page_performance.CAPTURE.collect(self.driver)
+            with tracing.span("page", "refresh"):
+                self.driver.refresh()
+            page_performance.CAPTURE.page_loaded(self.driver, BASE_URL)
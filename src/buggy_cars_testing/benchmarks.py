@@ -0,0 +1,395 @@
+"""
+This contains benchmarks of the building blocks of the tests, which are checked against a baseline
+so that a change that makes them slower is caught.
+
+Each benchmark runs its step a few times against the stand-in server and takes the median time.
+The results are saved to a baseline file, and later runs fail if a median is slower than the
+baseline by more than the threshold.
+
+Run it from the `src` directory, e.g.
+`BUGGY_CARS_TEST_SERVER=local python3 -m buggy_cars_testing.benchmarks --save-baseline` to create
+the baseline, and then without `--save-baseline` to compare against it.
+"""
+import argparse
+import json
+import os
+import platform
+import secrets
+import statistics
+import sys
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from selenium.webdriver.remote.webdriver import WebDriver
+
+from buggy_cars_testing import (
+    cache_files,
+    launch_profiles,
+    model_catalog,
+    stand_in_server,
+    token_cache,
+    user_pool,
+)
+from buggy_cars_testing.base_buggy_car_tests import BaseBuggyCarTests
+from buggy_cars_testing.constants import (
+    BENCHMARK_BASELINE,
+    BENCHMARK_NOISE_FLOOR,
+    BENCHMARK_REGRESSION_THRESHOLD,
+    BASE_URL,
+    SERVER,
+    USE_LOCAL_SERVER,
+)
+from buggy_cars_testing.driver_pool import DRIVER_POOL, get_browser_type, reset_driver
+from buggy_cars_testing.page_objects import HomePage, OverallPage, RegisterPage
+from buggy_cars_testing.vote_ledger import VoteLedger
+
+# The format of the baseline file. Baselines in an older format need to be recorded again.
+BASELINE_VERSION = 1
+
+
+class Benchmark(NamedTuple):
+    """
+    A benchmark, which runs its step once and returns how long the step took in seconds.
+    """
+
+    name: str
+    run: Callable[["BenchmarkContext"], float]
+    needs_browser: bool
+
+
+BENCHMARKS: Dict[str, Benchmark] = {}
+
+
+def benchmark(name: str, needs_browser: bool = True) -> Callable[[Callable], Callable]:
+    """
+    Add the decorated function to the benchmarks.
+    """
+
+    def decorator(run: Callable[["BenchmarkContext"], float]) -> Callable:
+        BENCHMARKS[name] = Benchmark(name, run, needs_browser)
+        return run
+
+    return decorator
+
+
+class BenchmarkContext:
+    """
+    The user, browser and helpers that the benchmarks share.
+    """
+
+    def __init__(self) -> None:
+        # A new user is registered, so the benchmarks don't use up the votes of the test users.
+        self.username = f"benchmark{secrets.token_hex(8)}"
+        self.password = "Benchmark1234!"
+        user_pool.register_user(self.username, self.password, "Bench", "Mark")
+        self.all_cars = model_catalog.load_model_ids()
+        self.vote_ledger = VoteLedger(self.username)
+        self._helper: Optional[BaseBuggyCarTests] = None
+
+    @property
+    def token(self) -> str:
+        """
+        A token for the benchmark user.
+        """
+        return token_cache.TOKEN_PROVIDER.get_token(self.username, self.password)
+
+    @property
+    def helper(self) -> BaseBuggyCarTests:
+        """
+        A test case with a browser, for its helper methods.
+        """
+        if self._helper is None:
+            self._helper = BaseBuggyCarTests()
+            self._helper.driver = DRIVER_POOL.acquire()
+        return self._helper
+
+    @property
+    def driver(self) -> WebDriver:
+        """
+        The browser that the benchmarks use.
+        """
+        return self.helper.driver
+
+    def fresh_page(self) -> None:
+        """
+        Reset the browser, so the step starts logged out on a blank page.
+        """
+        reset_driver(self.driver)
+
+    def close(self) -> None:
+        """
+        Give back the browser.
+        """
+        if self._helper is not None:
+            DRIVER_POOL.release(self._helper.driver)
+            self._helper = None
+
+
+@benchmark("driver cold start")
+def _driver_cold_start(_context: BenchmarkContext) -> float:
+    start = time.perf_counter()
+    driver = launch_profiles.start_browser(get_browser_type(), launch_profiles.get_profile())
+    elapsed = time.perf_counter() - start
+    driver.quit()
+    return elapsed
+
+
+@benchmark("driver warm start")
+def _driver_warm_start(context: BenchmarkContext) -> float:
+    # This is what a test case waits for when the pool has an idle browser: the reset of the
+    # browser by the previous test case, and handing it out.
+    helper = context.helper
+    start = time.perf_counter()
+    DRIVER_POOL.release(helper.driver)
+    helper.driver = DRIVER_POOL.acquire()
+    return time.perf_counter() - start
+
+
+@benchmark("login with form")
+def _login_with_form(context: BenchmarkContext) -> float:
+    context.fresh_page()
+    home_page = HomePage(context.driver).open()
+    home_page.wait_for("login")
+    start = time.perf_counter()
+    context.helper.set_value_in_input_box("login", context.username, True)
+    context.helper.set_value_in_input_box("password", context.password, True).submit()
+    home_page.wait_for("logout_link")
+    return time.perf_counter() - start
+
+
+@benchmark("login with token")
+def _login_with_token(context: BenchmarkContext) -> float:
+    token = context.token
+    context.fresh_page()
+    start = time.perf_counter()
+    context.helper.log_in_with_token(token)
+    HomePage(context.driver).wait_for("logout_link")
+    return time.perf_counter() - start
+
+
+@benchmark("catalog crawl", needs_browser=False)
+def _catalog_crawl(_context: BenchmarkContext) -> float:
+    start = time.perf_counter()
+    model_catalog.load_model_ids(use_cache=False)
+    return time.perf_counter() - start
+
+
+@benchmark("find model with no vote", needs_browser=False)
+def _find_model_with_no_vote(context: BenchmarkContext) -> float:
+    token = context.token
+    start = time.perf_counter()
+    context.vote_ledger.claim_model_with_no_vote(token, context.all_cars)
+    return time.perf_counter() - start
+
+
+@benchmark("find model with no vote (no ledger)", needs_browser=False)
+def _find_model_with_no_vote_cold(context: BenchmarkContext) -> float:
+    token = context.token
+    if os.path.exists(context.vote_ledger.path):
+        os.unlink(context.vote_ledger.path)
+    start = time.perf_counter()
+    context.vote_ledger.claim_model_with_no_vote(token, context.all_cars)
+    return time.perf_counter() - start
+
+
+@benchmark("alert wait")
+def _alert_wait(context: BenchmarkContext) -> float:
+    context.fresh_page()
+    RegisterPage(context.driver).open()
+    context.helper.wait_for_element("#username")
+    for element_id in ("username", "firstName", "lastName", "password"):
+        context.helper.set_value_in_input_box(element_id, "benchmark")
+    element = context.helper.set_value_in_input_box("confirmPassword", "benchmark")
+    start = time.perf_counter()
+    element.submit()
+    context.helper.wait_for_alert_messages()
+    return time.perf_counter() - start
+
+
+@benchmark("table extraction")
+def _table_extraction(context: BenchmarkContext) -> float:
+    if not context.driver.current_url.startswith(BASE_URL + "overall"):
+        OverallPage(context.driver).open()
+        context.helper.wait_for_element("table tbody tr")
+    start = time.perf_counter()
+    context.helper.get_table_contents()
+    return time.perf_counter() - start
+
+
+def run_benchmarks(names: List[str], repeat: int) -> Dict[str, Dict[str, Any]]:
+    """
+    Run each of the benchmarks `repeat` times, and return the median, minimum and maximum time of
+    each in seconds.
+    """
+    context = BenchmarkContext()
+    results = {}
+    try:
+        for name in names:
+            samples = [BENCHMARKS[name].run(context) for _ in range(repeat)]
+            results[name] = {
+                "median": statistics.median(samples),
+                "min": min(samples),
+                "max": max(samples),
+                "samples": samples,
+            }
+    finally:
+        context.close()
+    return results
+
+
+def get_environment() -> Dict[str, str]:
+    """
+    Returns what the benchmarks are measured on: the versions of Python and the OS, the browser, and
+    the launch profile.
+    """
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "browser": get_browser_type(),
+        "profile": launch_profiles.get_profile().name,
+    }
+
+
+def make_baseline(results: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Returns the baseline file contents for the `results`, with what they were measured on.
+    """
+    return {
+        "version": BASELINE_VERSION,
+        "created": time.time(),
+        "environment": get_environment(),
+        "results": results,
+    }
+
+
+def find_environment_changes(baseline: Dict[str, Any], environment: Dict[str, str]) -> List[str]:
+    """
+    Returns a description of each part of the `environment` that is different from the one the
+    baseline was measured on. Times measured on different environments can't be compared.
+    """
+    recorded = baseline.get("environment", {})
+    return [
+        f"{name}: {recorded.get(name)} in the baseline, {value} now"
+        for name, value in environment.items()
+        if recorded.get(name) != value
+    ]
+
+
+def find_regressions(
+    results: Dict[str, Dict[str, Any]],
+    baseline: Dict[str, Any],
+    threshold: float = BENCHMARK_REGRESSION_THRESHOLD,
+) -> List[str]:
+    """
+    Returns a description of each benchmark with a median that is slower than the baseline by more
+    than the `threshold` (and by more than the noise floor).
+    """
+    regressions = []
+    for name, result in results.items():
+        base = baseline["results"].get(name)
+        if not base:
+            continue
+        slower_by = result["median"] - base["median"]
+        if slower_by > base["median"] * threshold and slower_by > BENCHMARK_NOISE_FLOOR:
+            regressions.append(
+                f"{name}: median {result['median'] * 1000:.1f} ms, baseline "
+                f"{base['median'] * 1000:.1f} ms (+{slower_by / base['median']:.0%})"
+            )
+    return regressions
+
+
+def format_report(
+    results: Dict[str, Dict[str, Any]], baseline: Optional[Dict[str, Any]] = None
+) -> str:
+    """
+    Returns a table of the results, compared to the baseline if there is one.
+    """
+    lines = [
+        f"{'benchmark':<38} {'median ms':>10} {'min ms':>9} {'max ms':>9} "
+        f"{'baseline ms':>12} {'change':>8}"
+    ]
+    for name, result in results.items():
+        base = (baseline or {}).get("results", {}).get(name)
+        compared = (
+            f"{base['median'] * 1000:>12.1f} {result['median'] / base['median'] - 1:>+8.0%}"
+            if base and base["median"]
+            else f"{'-':>12} {'-':>8}"
+        )
+        lines.append(
+            f"{name:<38} {result['median'] * 1000:>10.1f} {result['min'] * 1000:>9.1f} "
+            f"{result['max'] * 1000:>9.1f} {compared}"
+        )
+    return "\n".join(lines)
+
+
+def main() -> int:
+    """
+    Run the benchmarks, and compare them against the baseline or save them as the baseline.
+    Returns the exit code, which is non-zero if any benchmark regressed.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="how many times to run each")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), help="benchmarks to run")
+    parser.add_argument(
+        "--no-browser", action="store_true", help="skip the benchmarks that need a browser"
+    )
+    parser.add_argument(
+        "--baseline", default=BENCHMARK_BASELINE, help="the baseline file to compare against"
+    )
+    parser.add_argument(
+        "--save-baseline", action="store_true", help="save the results as the baseline"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=BENCHMARK_REGRESSION_THRESHOLD,
+        help="how much slower a median can be, e.g. 0.2 for 20%%",
+    )
+    args = parser.parse_args()
+
+    if not SERVER:
+        parser.error("set BUGGY_CARS_TEST_SERVER to 'local' or to the URL of a stand-in server")
+    if USE_LOCAL_SERVER:
+        stand_in_server.ensure_running()
+
+    names = [
+        name
+        for name in args.only or BENCHMARKS
+        if not (args.no_browser and BENCHMARKS[name].needs_browser)
+    ]
+    results = run_benchmarks(names, args.repeat)
+
+    baseline = None if args.save_baseline else cache_files.read_json(args.baseline)
+    if baseline and baseline.get("version") != BASELINE_VERSION:
+        print(f"{args.baseline} is from an older version, save the baseline again", file=sys.stderr)
+        return 1
+    print(format_report(results, baseline))
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as baseline_file:
+            json.dump(make_baseline(results), baseline_file, indent=2)
+        print(f"\nSaved the baseline to {args.baseline}")
+        return 0
+    if not baseline:
+        print(f"\nThere is no baseline in {args.baseline} to compare against")
+        return 0
+
+    environment_changes = find_environment_changes(baseline, get_environment())
+    if environment_changes:
+        print(
+            "\nNot comparing against the baseline, as it was measured on a different environment "
+            "(save the baseline again):\n" + "\n".join(environment_changes),
+            file=sys.stderr,
+        )
+        return 0
+
+    regressions = find_regressions(results, baseline, args.threshold)
+    if regressions:
+        print("\nSlower than the baseline:\n" + "\n".join(regressions), file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
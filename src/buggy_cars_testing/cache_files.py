@@ -0,0 +1,78 @@
+"""
+This contains helpers for the JSON files that are shared between test runs and worker processes.
+"""
+import contextlib
+import gzip
+import json
+import os
+import tempfile
+from typing import Any, Iterator, Optional
+
+from buggy_cars_testing.constants import CACHE_DIR
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+def cache_path(file_name: str) -> str:
+    """
+    Returns the path of `file_name` in the cache directory, creating the directory if needed.
+    """
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    return os.path.join(CACHE_DIR, file_name)
+
+
+def read_json(path: str) -> Optional[Any]:
+    """
+    Returns the contents of the JSON file at `path`, or None if it is missing or unreadable.
+    Files ending in `.gz` are decompressed.
+    """
+    try:
+        if path.endswith(".gz"):
+            with gzip.open(path, "rt", encoding="utf-8") as json_file:
+                return json.load(json_file)
+        with open(path, encoding="utf-8") as json_file:
+            return json.load(json_file)
+    except (OSError, ValueError):
+        return None
+
+
+def write_json(path: str, contents: Any) -> None:
+    """
+    Write `contents` to the JSON file at `path`.
+    The file is replaced atomically, so other processes never read a partially written file.
+    Files ending in `.gz` are compressed.
+    """
+    file_descriptor, temp_path = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp"
+    )
+    try:
+        if path.endswith(".gz"):
+            with os.fdopen(file_descriptor, "wb") as raw_file:
+                with gzip.open(raw_file, "wt", encoding="utf-8") as json_file:
+                    json.dump(contents, json_file, separators=(",", ":"))
+        else:
+            with os.fdopen(file_descriptor, "w", encoding="utf-8") as json_file:
+                json.dump(contents, json_file)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+@contextlib.contextmanager
+def file_lock(path: str) -> Iterator[None]:
+    """
+    Hold an exclusive lock on the file at `path`, so that only one process at a time can update a
+    shared file. The lock file is created if needed.
+    """
+    with open(path, "a", encoding="utf-8") as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
@@ -0,0 +1,272 @@
+"""
+This contains a cassette, which records the API responses so that they can be replayed later
+without calling the API.
+
+A cassette is a compressed JSON file of the responses to each request, indexed by the method, the
+URL, the user the request was sent as, and a hash of the body of the request. A request that was
+sent more than once (e.g. reading a model before and after voting for it) replays its responses in
+the order they were recorded. Secrets are scrubbed before anything is written: passwords in request
+bodies, and tokens in request headers and response bodies.
+
+The user is found from the token in the request, which is registered by the token cache when it
+hands out the token. The tokens change between runs, so the cassette is keyed by a digest of the
+username instead. Each user's tokens are replayed as a different scrubbed token, so the users can
+still be told apart when replaying.
+
+The mode is set using `BUGGY_CARS_TEST_CASSETTE_MODE`:
+* `record` sends every request to the API, and records the responses.
+* `replay` only replays responses, and fails if a request was not recorded. The body of the request
+  has to match, so this catches changes to what the tests send.
+* `lenient` replays a response recorded for the same method and URL even if the body is different,
+  and sends requests that were not recorded to the API, recording their responses.
+"""
+import atexit
+import hashlib
+import json
+import threading
+from typing import Any, Callable, Dict, List, Optional, Set
+from urllib.parse import quote_plus, unquote_plus
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from buggy_cars_testing import cache_files
+from buggy_cars_testing.constants import (
+    CASSETTE_MODE,
+    CASSETTE_MODE_ENV_VAR,
+    CASSETTE_MODES,
+    CASSETTE_PATH,
+)
+
+SCRUBBED = "<scrubbed>"
+# Fields of request and response bodies that hold secrets, and the ones of those that hold tokens.
+TOKEN_FIELDS = {"access_token", "refresh_token", "id_token"}
+SECRET_FIELDS = {"password", "confirmPassword"} | TOKEN_FIELDS
+# The user of requests that were sent without a token, or with a token that wasn't registered.
+ANONYMOUS = "-"
+CASSETTE_VERSION = 2
+
+
+# The identity digest of each token that has been registered.
+_identities: Dict[str, str] = {}
+_identities_lock = threading.Lock()
+
+
+class CassetteMissError(RuntimeError):
+    """
+    A request was made in replay mode that is not in the cassette.
+    """
+
+
+def identity_digest(username: str) -> str:
+    """
+    Returns the digest of the `username` that requests sent as that user are recorded under.
+    """
+    return hashlib.sha256(username.encode()).hexdigest()[:16]
+
+
+def register_token(token: str, username: str) -> None:
+    """
+    Record that requests sent with the `token` are sent as the user `username`.
+    """
+    with _identities_lock:
+        _identities[token.split(" ")[-1]] = identity_digest(username)
+
+
+def _scrub_fields(value: Any, scrubbed_token: str = SCRUBBED) -> Any:
+    if isinstance(value, dict):
+        scrubbed = {}
+        for key, item in value.items():
+            if key in TOKEN_FIELDS:
+                scrubbed[key] = scrubbed_token
+            elif key in SECRET_FIELDS:
+                scrubbed[key] = SCRUBBED
+            else:
+                scrubbed[key] = _scrub_fields(item, scrubbed_token)
+        return scrubbed
+    if isinstance(value, list):
+        return [_scrub_fields(item, scrubbed_token) for item in value]
+    return value
+
+
+def _find_secrets(prepared: requests.PreparedRequest) -> Set[str]:
+    """
+    Returns the secrets in the request: the passwords in the body, and the token in the
+    authorization header.
+    """
+    secrets = set()
+    authorization = prepared.headers.get("authorization", "")
+    if authorization:
+        secrets.add(authorization.split(" ")[-1])
+
+    body = _body_text(prepared)
+    try:
+        fields = json.loads(body) if body else {}
+    except ValueError:
+        fields = dict(part.split("=", 1) for part in body.split("&") if "=" in part)
+    if isinstance(fields, dict):
+        secrets.update(str(fields[field]) for field in SECRET_FIELDS & set(fields) if fields[field])
+    return secrets
+
+
+def _scrub_text(text: str, secrets: Set[str]) -> str:
+    for secret in sorted(secrets, key=len, reverse=True):
+        text = text.replace(secret, SCRUBBED).replace(quote_plus(secret), SCRUBBED)
+    return text
+
+
+def _body_text(prepared: requests.PreparedRequest) -> str:
+    body = prepared.body or ""
+    return body.decode("utf-8", "replace") if isinstance(body, bytes) else body
+
+
+class Cassette:
+    """
+    This records and replays the responses to API requests.
+    """
+
+    def __init__(self, path: str, mode: str) -> None:
+        if mode not in CASSETTE_MODES:
+            raise ValueError(
+                f"{CASSETTE_MODE_ENV_VAR} should be one of {', '.join(CASSETTE_MODES)}, "
+                f"not '{mode}'"
+            )
+        self.path = path
+        self.mode = mode
+        self._lock = threading.Lock()
+        self._interactions: Dict[str, List[Dict[str, Any]]] = {}
+        if mode != "record":
+            contents = cache_files.read_json(path) or {}
+            if contents and contents.get("version") != CASSETTE_VERSION:
+                raise ValueError(f"{path} is from an older version, record the cassette again")
+            self._interactions = contents.get("interactions", {})
+        # The keys of the interactions by their method and URL, for lenient matching.
+        self._by_url: Dict[str, List[str]] = {}
+        for key in self._interactions:
+            self._by_url.setdefault(key.rsplit(" ", 2)[0], []).append(key)
+        self._recorded: Dict[str, List[Dict[str, Any]]] = {}
+        self._replayed: Dict[str, int] = {}
+
+    def request(
+        self, method: str, url: str, send: Callable[[], requests.Response], **kwargs: Any
+    ) -> requests.Response:
+        """
+        Returns the recorded response to the request, or calls `send` to send it to the API and
+        records the response, depending on the mode.
+        """
+        prepared = requests.Request(
+            method,
+            url,
+            params=kwargs.get("params"),
+            data=kwargs.get("data"),
+            json=kwargs.get("json"),
+            headers=kwargs.get("headers"),
+        ).prepare()
+        secrets = _find_secrets(prepared)
+        url = _scrub_text(prepared.url, secrets)
+        body_hash = hashlib.sha256(_scrub_text(_body_text(prepared), secrets).encode()).hexdigest()
+        identity = self._identity(prepared)
+        key = f"{method} {url} {identity} {body_hash[:16]}"
+
+        if self.mode != "record":
+            with self._lock:
+                interaction = self._next_interaction(key)
+                if interaction is None and self.mode == "lenient":
+                    for other_key in self._by_url.get(f"{method} {url}", []):
+                        interaction = self._next_interaction(other_key)
+                        break
+            if interaction is not None:
+                return _to_response(interaction, prepared.url)
+            if self.mode == "replay":
+                raise CassetteMissError(f"{key} is not in the cassette {self.path}")
+
+        response = send()
+        # The tokens in the response are scrubbed to one that says which user they are for.
+        scrubbed_token = SCRUBBED if identity == ANONYMOUS else f"<scrubbed-{identity}>"
+        with self._lock:
+            self._recorded.setdefault(key, []).append(
+                _to_interaction(response, secrets, scrubbed_token)
+            )
+        return response
+
+    def _identity(self, prepared: requests.PreparedRequest) -> str:
+        """
+        Returns the identity digest of the user that the request is sent as: the user of the
+        token, or the user requesting a token.
+        """
+        authorization = prepared.headers.get("authorization", "")
+        if authorization:
+            with _identities_lock:
+                return _identities.get(authorization.split(" ")[-1], ANONYMOUS)
+        body = _body_text(prepared)
+        if "username=" in body:
+            username = dict(part.split("=", 1) for part in body.split("&") if "=" in part)
+            return identity_digest(unquote_plus(username.get("username", "")))
+        return ANONYMOUS
+
+    def _next_interaction(self, key: str) -> Optional[Dict[str, Any]]:
+        interactions = self._interactions.get(key)
+        if not interactions:
+            return None
+        index = self._replayed.get(key, 0)
+        self._replayed[key] = index + 1
+        return interactions[min(index, len(interactions) - 1)]
+
+    def save(self) -> None:
+        """
+        Add the responses recorded by this process to the cassette file.
+        A request that was recorded again replaces what was recorded for it before.
+        """
+        with self._lock:
+            recorded = dict(self._recorded)
+        if not recorded:
+            return
+        with cache_files.file_lock(self.path + ".lock"):
+            contents = cache_files.read_json(self.path) or {}
+            interactions = (
+                contents.get("interactions", {})
+                if contents.get("version") == CASSETTE_VERSION
+                else {}
+            )
+            interactions.update(recorded)
+            cache_files.write_json(
+                self.path, {"version": CASSETTE_VERSION, "interactions": interactions}
+            )
+
+
+def _to_interaction(
+    response: requests.Response, secrets: Set[str], scrubbed_token: str = SCRUBBED
+) -> Dict[str, Any]:
+    """
+    Returns what is recorded for the response, with the secrets scrubbed, and any tokens replaced
+    by `scrubbed_token`.
+    """
+    try:
+        body = json.dumps(_scrub_fields(response.json(), scrubbed_token))
+    except ValueError:
+        body = response.text
+    return {
+        "status": response.status_code,
+        "reason": response.reason,
+        "content_type": response.headers.get("content-type", ""),
+        "body": _scrub_text(body, secrets),
+    }
+
+
+def _to_response(interaction: Dict[str, Any], url: str) -> requests.Response:
+    """
+    Returns a response made from a recorded interaction.
+    """
+    response = requests.Response()
+    response.status_code = interaction["status"]
+    response.reason = interaction["reason"]
+    response.headers = CaseInsensitiveDict({"content-type": interaction["content_type"]})
+    response._content = interaction["body"].encode()  # pylint: disable=protected-access
+    response.encoding = "utf-8"
+    response.url = url
+    return response
+
+
+CASSETTE: Optional[Cassette] = Cassette(CASSETTE_PATH, CASSETTE_MODE) if CASSETTE_PATH else None
+if CASSETTE:
+    atexit.register(CASSETTE.save)
@@ -0,0 +1,144 @@
+"""
+This contains a generator of combinations of test parameters, for tests that loop over subTests.
+
+Testing every combination of parameters (the cartesian product) gets multiplicatively slower with
+each parameter. Most bugs are caused by one parameter, or by an interaction of two, so a covering
+array of strength 2 (pairwise) tests every pair of values of every two parameters at least once, in
+far fewer combinations. Strength 3 covers every three parameters, and so on.
+
+The combinations are picked greedily with a seeded random number generator, so the same parameters
+and seed always give the same combinations. This matters when a test case is split into shards,
+as each shard has to pick the same combinations.
+"""
+import itertools
+import random
+from typing import Dict, List, Mapping, Optional, Sequence, Set, Tuple, TypeVar
+
+from buggy_cars_testing.constants import (
+    COMBINATIONS,
+    COMBINATIONS_ENV_VAR,
+    COMBINATION_SEED,
+    EXHAUSTIVE_COMBINATIONS,
+)
+
+T = TypeVar("T")
+
+# How many candidate combinations are tried before picking the one that covers the most.
+CANDIDATES_PER_COMBINATION = 20
+
+# A set of values is stored as the indexes of the parameters, and the indexes of their values.
+_ValueSet = Tuple[Tuple[int, ...], Tuple[int, ...]]
+
+
+def exhaustive(parameters: Mapping[str, Sequence[T]]) -> List[Dict[str, T]]:
+    """
+    Returns every combination of the values of the `parameters`.
+    """
+    names = list(parameters)
+    return [
+        dict(zip(names, values))
+        for values in itertools.product(*(parameters[name] for name in names))
+    ]
+
+
+def covering_array(
+    parameters: Mapping[str, Sequence[T]], strength: int = 2, seed: int = 0
+) -> List[Dict[str, T]]:
+    """
+    Returns combinations of the values of the `parameters`, such that every set of values of any
+    `strength` parameters appears in at least one combination.
+    """
+    names = list(parameters)
+    sizes = [len(parameters[name]) for name in names]
+    if strength >= len(names) or 0 in sizes:
+        return exhaustive(parameters)
+
+    rng = random.Random(seed)
+    parameter_sets = list(itertools.combinations(range(len(names)), strength))
+    uncovered: Set[_ValueSet] = {
+        (parameter_set, value_set)
+        for parameter_set in parameter_sets
+        for value_set in itertools.product(*(range(sizes[index]) for index in parameter_set))
+    }
+
+    rows: List[List[int]] = []
+    while uncovered:
+        best_row, best_covered = None, set()
+        for _ in range(CANDIDATES_PER_COMBINATION):
+            row = _candidate_row(rng, sizes, parameter_sets, uncovered)
+            covered = _covered_by(row, parameter_sets, uncovered)
+            if len(covered) > len(best_covered):
+                best_row, best_covered = row, covered
+        rows.append(best_row)
+        uncovered -= best_covered
+
+    return [{name: parameters[name][value] for name, value in zip(names, row)} for row in rows]
+
+
+def _candidate_row(
+    rng: random.Random,
+    sizes: List[int],
+    parameter_sets: List[Tuple[int, ...]],
+    uncovered: Set[_ValueSet],
+) -> List[int]:
+    """
+    Returns a combination that starts from a set of values that hasn't been covered, and fills in
+    the other parameters one at a time with the value that covers the most.
+    """
+    row: List[Optional[int]] = [None] * len(sizes)
+    parameter_set, value_set = rng.choice(sorted(uncovered))
+    for index, value in zip(parameter_set, value_set):
+        row[index] = value
+
+    unassigned = [index for index, value in enumerate(row) if value is None]
+    rng.shuffle(unassigned)
+    for index in unassigned:
+        scores = []
+        for value in range(sizes[index]):
+            row[index] = value
+            scores.append(
+                sum(
+                    (other_set, tuple(row[other] for other in other_set)) in uncovered
+                    for other_set in parameter_sets
+                    if index in other_set and all(row[other] is not None for other in other_set)
+                )
+            )
+        best_score = max(scores)
+        row[index] = rng.choice(
+            [value for value, score in enumerate(scores) if score == best_score]
+        )
+    return row
+
+
+def _covered_by(
+    row: List[int], parameter_sets: List[Tuple[int, ...]], uncovered: Set[_ValueSet]
+) -> Set[_ValueSet]:
+    covered = set()
+    for parameter_set in parameter_sets:
+        value_set = (parameter_set, tuple(row[index] for index in parameter_set))
+        if value_set in uncovered:
+            covered.add(value_set)
+    return covered
+
+
+def pick_combinations(
+    parameters: Mapping[str, Sequence[T]],
+    strength: Optional[int] = None,
+    seed: int = COMBINATION_SEED,
+) -> List[Dict[str, T]]:
+    """
+    Returns the combinations of the `parameters` that a test should run subTests for.
+    This is a covering array of the `strength` set in `BUGGY_CARS_TEST_COMBINATIONS` (pairwise by
+    default), or every combination if it is set to "exhaustive".
+    """
+    if COMBINATIONS == EXHAUSTIVE_COMBINATIONS:
+        return exhaustive(parameters)
+    if strength is None:
+        try:
+            strength = int(COMBINATIONS)
+        except ValueError:
+            raise ValueError(
+                f"{COMBINATIONS_ENV_VAR} should be a strength such as 2, or "
+                f"'{EXHAUSTIVE_COMBINATIONS}', not '{COMBINATIONS}'"
+            ) from None
+    return covering_array(parameters, strength, seed)
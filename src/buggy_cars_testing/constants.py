@@ -1,15 +1,173 @@
 """
 This contains the constants that are used in the tests.
 """
+import os
+import tempfile
 
-BASE_URL = "https://buggy.justtestit.org/"
-BASE_API_URL = "https://k51qryqov3.execute-api.ap-southeast-2.amazonaws.com/prod/"
+LIVE_BASE_URL = "https://buggy.justtestit.org/"
+LIVE_BASE_API_URL = "https://k51qryqov3.execute-api.ap-southeast-2.amazonaws.com/prod/"
 
 BROWSER_TYPE_ENV_VAR = "BUGGY_CARS_TEST_BROWSER"
 
+# The launch profile sets the options the browser is started with, such as headless mode. See
+# `launch_profiles.PROFILES` for the profiles. Set the stats variable to print how long the browsers
+# took to start when the tests finish.
+LAUNCH_PROFILE_ENV_VAR = "BUGGY_CARS_TEST_PROFILE"
+LAUNCH_PROFILE = os.environ.get(LAUNCH_PROFILE_ENV_VAR, "default")
+STARTUP_STATS_ENV_VAR = "BUGGY_CARS_TEST_STARTUP_STATS"
+
+# The test runner sets this to "<index>/<count>" to run only part of the subTests of a test case.
+SUBTEST_SHARD_ENV_VAR = "BUGGY_CARS_TEST_SUBTEST_SHARD"
+
+# Browsers are reused between test cases, and are replaced after this many test cases.
+DRIVER_MAX_USES_ENV_VAR = "BUGGY_CARS_TEST_DRIVER_MAX_USES"
+DRIVER_MAX_USES = int(os.environ.get(DRIVER_MAX_USES_ENV_VAR, "20"))
+
+# Set this to "local" to start the stand-in server in the test process, or to the URL of a
+# stand-in server that is already running. When unset, the tests use the live website.
+SERVER_ENV_VAR = "BUGGY_CARS_TEST_SERVER"
+LOCAL_SERVER = "local"
+
+STAND_IN_PORT_ENV_VAR = "BUGGY_CARS_STAND_IN_PORT"
+STAND_IN_MODELS_ENV_VAR = "BUGGY_CARS_STAND_IN_MODELS"
+STAND_IN_LATENCY_ENV_VAR = "BUGGY_CARS_STAND_IN_LATENCY"
+
+STAND_IN_HOST = "127.0.0.1"
+STAND_IN_PORT = int(os.environ.get(STAND_IN_PORT_ENV_VAR, "8980"))
+STAND_IN_MODEL_COUNT = int(os.environ.get(STAND_IN_MODELS_ENV_VAR, "25"))
+STAND_IN_PAGE_SIZE = 5
+STAND_IN_LATENCY = float(os.environ.get(STAND_IN_LATENCY_ENV_VAR, "0"))
+STAND_IN_API_PATH = "prod/"
+
+SERVER = os.environ.get(SERVER_ENV_VAR, "")
+USE_LOCAL_SERVER = SERVER == LOCAL_SERVER
+
+if USE_LOCAL_SERVER:
+    BASE_URL = f"http://{STAND_IN_HOST}:{STAND_IN_PORT}/"
+    BASE_API_URL = BASE_URL + STAND_IN_API_PATH
+elif SERVER:
+    BASE_URL = SERVER if SERVER.endswith("/") else SERVER + "/"
+    BASE_API_URL = BASE_URL + STAND_IN_API_PATH
+else:
+    BASE_URL = LIVE_BASE_URL
+    BASE_API_URL = LIVE_BASE_API_URL
+
 WEB_PAGE_WAIT_TIME = 20
 API_WAIT_TIME = 10
 
+# The overall ranking pages are checked using this many browsers at once.
+RANKING_PAGE_WORKERS = 4
+
+# The shared HTTP session keeps up to this many connections open per host, and retries requests
+# that fail with a 429 or 5xx status with an exponential backoff (in seconds).
+HTTP_POOL_SIZE = 16
+HTTP_RETRIES = 3
+HTTP_RETRY_BACKOFF = 0.5
+# Set this to print the API latency per endpoint when the tests finish.
+HTTP_STATS_ENV_VAR = "BUGGY_CARS_TEST_HTTP_STATS"
+
+# Files that are shared between test runs and worker processes, such as caches, are stored here.
+CACHE_DIR_ENV_VAR = "BUGGY_CARS_TEST_CACHE_DIR"
+CACHE_DIR = os.environ.get(
+    CACHE_DIR_ENV_VAR, os.path.join(tempfile.gettempdir(), "buggy_cars_testing")
+)
+
+# Set this to a directory to time each step of the tests (starting browsers, loading pages, waits,
+# API calls, and so on). Each process writes a Chrome trace file there, which can be opened in
+# Perfetto or chrome://tracing, and a summary of the steps that took the most time is printed.
+TRACE_DIR_ENV_VAR = "BUGGY_CARS_TEST_TRACE_DIR"
+TRACE_DIR = os.environ.get(TRACE_DIR_ENV_VAR, "")
+TRACE_TOP_SINKS = 15
+
+# Set this to a directory to capture how fast each page the tests load is (Navigation Timing,
+# Resource Timing, long tasks, and the DevTools network events on Chrome). Each process writes the
+# pages it captured there, and a report of the pages against their budgets is printed.
+PAGE_PERFORMANCE_DIR_ENV_VAR = "BUGGY_CARS_TEST_PAGE_PERFORMANCE_DIR"
+PAGE_PERFORMANCE_DIR = os.environ.get(PAGE_PERFORMANCE_DIR_ENV_VAR, "")
+
+# The budget of each page: the time to first byte and to DOMContentLoaded (in milliseconds from the
+# start of the navigation), and the bytes transferred and requests made by the page.
+PAGE_BUDGETS = {
+    page: {
+        "ttfb": 1000,
+        "dom_content_loaded": 3000,
+        "transferred_bytes": 3 * 2**20,
+        "requests": requests,
+    }
+    for page, requests in (("home", 40), ("register", 40), ("overall", 45), ("model", 45))
+}
+
+# Set this to the path of a cassette file (ending in `.json.gz`) to record the API responses to it,
+# or to replay them from it rather than calling the API. The mode is one of `CASSETTE_MODES`.
+CASSETTE_ENV_VAR = "BUGGY_CARS_TEST_CASSETTE"
+CASSETTE_PATH = os.environ.get(CASSETTE_ENV_VAR, "")
+CASSETTE_MODE_ENV_VAR = "BUGGY_CARS_TEST_CASSETTE_MODE"
+CASSETTE_MODE = os.environ.get(CASSETTE_MODE_ENV_VAR, "replay")
+CASSETTE_MODES = ("record", "replay", "lenient")
+
+# The test runner records each run to this SQLite database, and uses the median duration of each job
+# over the last few runs to start the longest jobs first. Flakiness is scored over more runs.
+HISTORY_DB_ENV_VAR = "BUGGY_CARS_TEST_HISTORY"
+HISTORY_DB = os.environ.get(HISTORY_DB_ENV_VAR, os.path.join(CACHE_DIR, "history.sqlite3"))
+HISTORY_DURATION_RUNS = 5
+HISTORY_FLAKE_RUNS = 30
+
+# The car model catalog is cached for this many seconds, and is crawled using this many threads.
+CATALOG_CACHE_TTL = 3600
+CATALOG_MAX_WORKERS = 8
+
+# API tokens are cached, and are refreshed when they are this many seconds from expiring.
+# Tokens without an expiry are treated as expiring after the default lifetime.
+TOKEN_REFRESH_MARGIN = 60
+TOKEN_DEFAULT_LIFETIME = 300
+
+# By default, the login tests log in by putting an API token into the browser's local storage
+# under this key, rather than by filling in the login form. Set this to "form" to use the form.
+# The form is used by default when a cassette is replayed, as the replayed tokens are scrubbed and
+# the browser still uses the website.
+LOGIN_MODE_ENV_VAR = "BUGGY_CARS_TEST_LOGIN"
+LOGIN_MODE = os.environ.get(
+    LOGIN_MODE_ENV_VAR, "form" if CASSETTE_PATH and CASSETTE_MODE != "record" else "token"
+)
+TOKEN_STORAGE_KEY = "token"
+
+# Set this to a number to have the login tests lease users from a pool of that many registered
+# users, rather than all using the same hardcoded user.
+USER_POOL_ENV_VAR = "BUGGY_CARS_TEST_USER_POOL"
+USER_POOL_SIZE = int(os.environ.get(USER_POOL_ENV_VAR, "0"))
+
+# The concurrent vote test has this many pooled users vote for the same model at the same time, each
+# sending this many votes at once. Every vote uses up one of a user's votes, so against the live
+# website it only runs when this is set.
+CONCURRENT_VOTERS_ENV_VAR = "BUGGY_CARS_TEST_CONCURRENT_VOTERS"
+CONCURRENT_VOTERS = int(os.environ.get(CONCURRENT_VOTERS_ENV_VAR, "8" if SERVER else "0"))
+CONCURRENT_VOTE_ATTEMPTS = 2
+
+# The benchmarks fail when the median time of a benchmark is this much slower than the baseline
+# (0.2 is 20% slower), unless it is slower by less than the noise floor in seconds. The baseline is
+# kept in the cache directory, as it is only meaningful on the machine it was recorded on.
+BENCHMARK_REGRESSION_THRESHOLD = 0.2
+BENCHMARK_NOISE_FLOOR = 0.005
+BENCHMARK_BASELINE = os.path.join(CACHE_DIR, "benchmark_baseline.json")
+
+# The soak mode samples the processes this often (in seconds), and reports a leak when memory (MB)
+# or file descriptors grow by more than this per hour, and go up steadily (a correlation of the
+# samples with time of at least the minimum).
+SOAK_SAMPLE_INTERVAL = 5
+SOAK_MAX_RSS_SLOPE = 50
+SOAK_MAX_FDS_SLOPE = 20
+SOAK_LEAK_MIN_CORRELATION = 0.7
+SOAK_REPORT = os.path.join(CACHE_DIR, "soak_report.json")
+
+# Tests with subTests for combinations of parameters run a pairwise covering array of them by
+# default. Set this to a higher strength (e.g. 3 for every three parameters), or to "exhaustive" to
+# run every combination. The seed sets which combinations are picked.
+COMBINATIONS_ENV_VAR = "BUGGY_CARS_TEST_COMBINATIONS"
+EXHAUSTIVE_COMBINATIONS = "exhaustive"
+COMBINATIONS = os.environ.get(COMBINATIONS_ENV_VAR, "2")
+COMBINATION_SEED_ENV_VAR = "BUGGY_CARS_TEST_COMBINATION_SEED"
+COMBINATION_SEED = int(os.environ.get(COMBINATION_SEED_ENV_VAR, "0"))
+
 PHONE_NUMBER_LENGTH = 10
 COMMENT_LENGTH = 50
 NAME_LENGTH = 10
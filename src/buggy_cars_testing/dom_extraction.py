@@ -0,0 +1,44 @@
+"""
+This contains helpers that read a part of the page in a single WebDriver round trip.
+
+Reading a table with `find_elements` and `.text` costs a round trip per row and per cell, and the
+elements go stale if the page re-renders part way through. Instead, the table is read by a script
+in the page and returned as JSON.
+"""
+from typing import Any, Dict, Optional
+
+from selenium.webdriver.remote.webdriver import WebDriver
+
+from buggy_cars_testing import tracing
+
+# This returns the headers, and the text and links of the cells of each row. A row of only header
+# cells (e.g. in the <thead>) is used as the headers rather than as a row.
+TABLE_SCRIPT = """
+const table = document.querySelector(arguments[0]);
+if (!table) return null;
+const text = (cell) => cell.innerText.trim();
+let headers = [];
+const rows = [];
+for (const row of table.rows) {
+  const cells = Array.from(row.cells);
+  if (cells.length && cells.every((cell) => cell.tagName === "TH") && !rows.length) {
+    headers = cells.map(text);
+    continue;
+  }
+  rows.push({
+    cells: cells.map(text),
+    links: Array.from(row.querySelectorAll("a[href]"), (link) => link.href),
+  });
+}
+return { headers, rows };
+"""
+
+
+def get_table(driver: WebDriver, css_selector: str = "table") -> Optional[Dict[str, Any]]:
+    """
+    Returns the first table matching the `css_selector` as a dictionary with the `headers` and the
+    `rows`. Each row has the text of its `cells` and the URLs of its `links`.
+    Returns None if there is no matching table.
+    """
+    with tracing.span("dom", f"table {css_selector}"):
+        return driver.execute_script(TABLE_SCRIPT, css_selector)
@@ -0,0 +1,148 @@
+"""
+This contains the pool of browsers that are reused across test cases.
+
+Starting a browser takes longer than most of the test cases, so rather than starting a new browser
+per test case, a browser is reset to a clean state and handed to the next test case. A browser is
+replaced after it has been used `DRIVER_MAX_USES` times, or if it stops responding.
+"""
+import atexit
+import os
+import threading
+from typing import Dict, List
+
+import urllib3
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.remote.webdriver import WebDriver
+
+from buggy_cars_testing import launch_profiles, page_performance, tracing
+from buggy_cars_testing.constants import BROWSER_TYPE_ENV_VAR, DRIVER_MAX_USES, WEB_PAGE_WAIT_TIME
+from buggy_cars_testing.waits import SCRIPT_TIMEOUT_MARGIN
+
+CLEAR_STORAGE_SCRIPT = """
+try {
+    window.localStorage.clear();
+    window.sessionStorage.clear();
+} catch (error) {
+    // Pages such as about:blank don't have any storage.
+}
+"""
+
+# The errors raised when the browser has crashed: errors from the browser, or errors connecting to
+# its driver (e.g. chromedriver) once the driver process has died.
+BROWSER_ERRORS = (WebDriverException, urllib3.exceptions.HTTPError, OSError)
+
+
+def get_browser_type() -> str:
+    """
+    Returns the type of browser to start, which can be changed based on an environment variable.
+    """
+    # Chrome is the default
+    browser_type = "chrome"
+
+    if BROWSER_TYPE_ENV_VAR in os.environ:
+        if os.environ[BROWSER_TYPE_ENV_VAR] == "firefox":
+            browser_type = "firefox"
+    return browser_type
+
+
+def create_driver() -> WebDriver:
+    """
+    Start up a new browser.
+    The browser type and launch profile can be changed based on environment variables.
+    """
+    driver = launch_profiles.start_browser(get_browser_type(), launch_profiles.get_profile())
+    driver.set_script_timeout(WEB_PAGE_WAIT_TIME + SCRIPT_TIMEOUT_MARGIN)
+    return driver
+
+
+def reset_driver(driver: WebDriver) -> None:
+    """
+    Reset the browser so that nothing from the previous test case is left behind: extra windows,
+    cookies, local and session storage, and the current page.
+    """
+    with tracing.span("driver", "reset"):
+        _reset_driver(driver)
+
+
+def _reset_driver(driver: WebDriver) -> None:
+    page_performance.CAPTURE.collect(driver)
+    for handle in driver.window_handles[1:]:
+        driver.switch_to.window(handle)
+        driver.close()
+    driver.switch_to.window(driver.window_handles[0])
+
+    if hasattr(driver, "execute_cdp_cmd"):
+        # Chrome can clear the cookies for every site at once.
+        driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+    else:
+        driver.delete_all_cookies()
+    driver.execute_script(CLEAR_STORAGE_SCRIPT)
+    driver.get("about:blank")
+
+
+class DriverPool:
+    """
+    This hands out browsers that have already been started, and starts new browsers when needed.
+    """
+
+    def __init__(self, max_uses: int = DRIVER_MAX_USES) -> None:
+        self.max_uses = max_uses
+        self._lock = threading.Lock()
+        self._idle: List[WebDriver] = []
+        self._uses: Dict[int, int] = {}
+
+    def acquire(self) -> WebDriver:
+        """
+        Returns a browser for a test case to use, starting a new browser if none are idle.
+        """
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        driver = create_driver()
+        with self._lock:
+            self._uses[id(driver)] = 0
+        return driver
+
+    def release(self, driver: WebDriver, discard: bool = False) -> None:
+        """
+        Return a browser to the pool once a test case has finished with it.
+        The browser is closed instead if `discard` is True, it has been used too many times, or it
+        can't be reset.
+        """
+        with self._lock:
+            self._uses[id(driver)] += 1
+            discard = discard or self._uses[id(driver)] >= self.max_uses
+
+        if not discard:
+            try:
+                reset_driver(driver)
+            except BROWSER_ERRORS:
+                # The browser has most likely crashed.
+                discard = True
+
+        if discard:
+            self._quit(driver)
+        else:
+            with self._lock:
+                self._idle.append(driver)
+
+    def close_all(self) -> None:
+        """
+        Close all of the idle browsers.
+        """
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for driver in idle:
+            self._quit(driver)
+
+    def _quit(self, driver: WebDriver) -> None:
+        with self._lock:
+            self._uses.pop(id(driver), None)
+        try:
+            driver.quit()
+        except BROWSER_ERRORS:
+            pass
+
+
+DRIVER_POOL = DriverPool()
+atexit.register(DRIVER_POOL.close_all)
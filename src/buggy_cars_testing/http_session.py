@@ -0,0 +1,180 @@
+"""
+This contains the shared HTTP session that is used for all of the API calls.
+
+Using one session per process means that connections are pooled and kept alive, so there is only
+one TLS handshake per host rather than one per request.
+"""
+import atexit
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, List
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from buggy_cars_testing import cassettes, tracing
+from buggy_cars_testing.constants import (
+    API_WAIT_TIME,
+    HTTP_POOL_SIZE,
+    HTTP_RETRIES,
+    HTTP_RETRY_BACKOFF,
+    HTTP_STATS_ENV_VAR,
+)
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class LatencyCounters:
+    """
+    This keeps track of how many calls were made to each endpoint and how long they took.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._counters: Dict[str, List[float]] = {}
+
+    def record(self, endpoint: str, seconds: float) -> None:
+        """
+        Record a call to the `endpoint` that took `seconds`.
+        """
+        with self._lock:
+            counter = self._counters.setdefault(endpoint, [0, 0.0, 0.0])
+            counter[0] += 1
+            counter[1] += seconds
+            counter[2] = max(counter[2], seconds)
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """
+        Returns the count, total, mean and max time in seconds for each endpoint.
+        """
+        with self._lock:
+            return {
+                endpoint: {"count": count, "total": total, "mean": total / count, "max": maximum}
+                for endpoint, (count, total, maximum) in self._counters.items()
+            }
+
+    def reset(self) -> None:
+        """
+        Clear all of the counters.
+        """
+        with self._lock:
+            self._counters.clear()
+
+    def summary(self) -> str:
+        """
+        Returns a table of the counters, with the endpoints that took the most time first.
+        """
+        lines = [f"{'endpoint':<40} {'calls':>6} {'total s':>9} {'mean ms':>9} {'max ms':>9}"]
+        for endpoint, counter in sorted(
+            self.snapshot().items(), key=lambda item: item[1]["total"], reverse=True
+        ):
+            lines.append(
+                f"{endpoint:<40} {counter['count']:>6} {counter['total']:>9.3f} "
+                f"{counter['mean'] * 1000:>9.1f} {counter['max'] * 1000:>9.1f}"
+            )
+        return "\n".join(lines)
+
+
+LATENCY_COUNTERS = LatencyCounters()
+
+# The session of this process, by the process ID it was created in.
+_sessions: Dict[int, requests.Session] = {}
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """
+    Returns the session for this process, creating it if needed.
+    A new session is created after a fork, since pooled connections can't be shared between
+    processes.
+    """
+    with _session_lock:
+        session = _sessions.get(os.getpid())
+        if session is None:
+            # POST is deliberately not retried, so a vote or registration is never sent twice.
+            retry = Retry(
+                total=HTTP_RETRIES,
+                backoff_factor=HTTP_RETRY_BACKOFF,
+                status_forcelist=RETRY_STATUSES,
+                respect_retry_after_header=True,
+                raise_on_status=False,
+            )
+            adapter = HTTPAdapter(
+                pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE, max_retries=retry
+            )
+            session = requests.Session()
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            # The session of the parent process is dropped after a fork.
+            _sessions.clear()
+            _sessions[os.getpid()] = session
+        return session
+
+
+def endpoint_name(method: str, url: str) -> str:
+    """
+    Returns the name used to group calls to the same endpoint, e.g. `GET models/{id}`.
+    """
+    parts = urlsplit(url).path.strip("/").split("/")
+    if "models" in parts:
+        parts = parts[parts.index("models") :]
+    elif "oauth" in parts:
+        parts = parts[parts.index("oauth") :]
+    elif "users" in parts:
+        parts = parts[parts.index("users") :]
+    if len(parts) > 1 and parts[0] == "models":
+        parts[1] = "{id}"
+    return f"{method} {'/'.join(parts)}"
+
+
+def request(method: str, url: str, **kwargs: Any) -> requests.Response:
+    """
+    Send a request using the shared session, and record how long it took.
+    If a cassette is used, the response may be replayed from the cassette instead.
+    """
+    kwargs.setdefault("timeout", API_WAIT_TIME)
+    endpoint = endpoint_name(method, url)
+    start = time.perf_counter()
+    try:
+        with tracing.span("http", endpoint, url=url):
+            if cassettes.CASSETTE:
+                return cassettes.CASSETTE.request(
+                    method, url, lambda: get_session().request(method, url, **kwargs), **kwargs
+                )
+            return get_session().request(method, url, **kwargs)
+    finally:
+        LATENCY_COUNTERS.record(endpoint, time.perf_counter() - start)
+
+
+def get(url: str, **kwargs: Any) -> requests.Response:
+    """
+    Send a GET request using the shared session.
+    """
+    return request("GET", url, **kwargs)
+
+
+def post(url: str, **kwargs: Any) -> requests.Response:
+    """
+    Send a POST request using the shared session.
+    """
+    return request("POST", url, **kwargs)
+
+
+def put(url: str, **kwargs: Any) -> requests.Response:
+    """
+    Send a PUT request using the shared session.
+    """
+    return request("PUT", url, **kwargs)
+
+
+def _print_latency_summary() -> None:
+    if LATENCY_COUNTERS.snapshot():
+        print(f"\nAPI latency per endpoint:\n{LATENCY_COUNTERS.summary()}", file=sys.stderr)
+
+
+if os.environ.get(HTTP_STATS_ENV_VAR):
+    atexit.register(_print_latency_summary)
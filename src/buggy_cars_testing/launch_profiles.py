@@ -0,0 +1,216 @@
+"""
+This contains the launch profiles, which are the options that the browsers are started with.
+
+The default profile starts the browser the same way as a user would. The other profiles trade that
+for speed: running headless, not waiting for images and stylesheets before a page counts as loaded,
+not downloading images, fonts and analytics scripts, sharing a disk cache between browser sessions,
+and turning off the sandbox and GPU. The profile is chosen using `BUGGY_CARS_TEST_PROFILE`.
+
+Run `python3 -m buggy_cars_testing.launch_profiles` from the `src` directory to compare how long the
+browsers take to start with each profile.
+"""
+import argparse
+import atexit
+import os
+import sys
+import time
+from typing import Dict, NamedTuple
+
+from selenium import webdriver
+from selenium.webdriver.remote.webdriver import WebDriver
+
+from buggy_cars_testing import cache_files, tracing
+from buggy_cars_testing.constants import (
+    BROWSER_TYPE_ENV_VAR,
+    LAUNCH_PROFILE,
+    LAUNCH_PROFILE_ENV_VAR,
+    PAGE_PERFORMANCE_DIR,
+    STARTUP_STATS_ENV_VAR,
+)
+from buggy_cars_testing.http_session import LatencyCounters
+
+# The URLs that are blocked by profiles that block assets. Chrome matches these with wildcards.
+BLOCKED_URL_PATTERNS = [
+    "*.png",
+    "*.jpg",
+    "*.jpeg",
+    "*.gif",
+    "*.svg",
+    "*.webp",
+    "*.ico",
+    "*.woff",
+    "*.woff2",
+    "*.ttf",
+    "*.otf",
+    "*google-analytics.com*",
+    "*googletagmanager.com*",
+    "*doubleclick.net*",
+]
+
+
+class LaunchProfile(NamedTuple):
+    """
+    The options that a browser is started with.
+    """
+
+    name: str
+    headless: bool = False
+    # "normal" waits for images and stylesheets, "eager" only waits for the document to be parsed.
+    page_load_strategy: str = "normal"
+    block_assets: bool = False
+    shared_cache: bool = False
+    # Turn off the sandbox and the GPU, which are not needed for testing and slow down start up.
+    no_sandbox: bool = False
+
+
+PROFILES: Dict[str, LaunchProfile] = {
+    profile.name: profile
+    for profile in [
+        LaunchProfile("default"),
+        LaunchProfile("headless", headless=True),
+        LaunchProfile("eager", headless=True, page_load_strategy="eager"),
+        LaunchProfile(
+            "lean",
+            headless=True,
+            page_load_strategy="eager",
+            block_assets=True,
+            shared_cache=True,
+            no_sandbox=True,
+        ),
+    ]
+}
+
+# How long each browser took to start, by browser and profile, e.g. `chrome/lean`.
+STARTUP_COUNTERS = LatencyCounters()
+
+
+def get_profile(name: str = LAUNCH_PROFILE) -> LaunchProfile:
+    """
+    Returns the launch profile called `name`.
+    """
+    try:
+        return PROFILES[name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown {LAUNCH_PROFILE_ENV_VAR} '{name}', expected one of {', '.join(PROFILES)}"
+        ) from None
+
+
+def _cache_dir(browser_type: str) -> str:
+    path = cache_files.cache_path(f"browser-cache-{browser_type}")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def chrome_options(profile: LaunchProfile) -> webdriver.ChromeOptions:
+    """
+    Returns the Chrome options for the `profile`.
+    Fonts and analytics are blocked once Chrome has started, by `apply_after_start`.
+    """
+    options = webdriver.ChromeOptions()
+    options.page_load_strategy = profile.page_load_strategy
+    if profile.headless:
+        options.add_argument("--headless=new")
+        options.add_argument("--window-size=1280,1024")
+    if profile.block_assets:
+        options.add_experimental_option(
+            "prefs", {"profile.managed_default_content_settings.images": 2}
+        )
+    if profile.shared_cache:
+        options.add_argument(f"--disk-cache-dir={_cache_dir('chrome')}")
+    if profile.no_sandbox:
+        options.add_argument("--no-sandbox")
+        options.add_argument("--disable-gpu")
+        options.add_argument("--disable-dev-shm-usage")
+        options.add_argument("--disable-extensions")
+    if PAGE_PERFORMANCE_DIR:
+        # Log the DevTools network events, so the page performance capture can count the requests.
+        options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+        options.add_experimental_option("perfLoggingPrefs", {"enableNetwork": True})
+    return options
+
+
+def firefox_options(profile: LaunchProfile) -> webdriver.FirefoxOptions:
+    """
+    Returns the Firefox options for the `profile`.
+    """
+    options = webdriver.FirefoxOptions()
+    options.page_load_strategy = profile.page_load_strategy
+    if profile.headless:
+        options.add_argument("-headless")
+        options.add_argument("--width=1280")
+        options.add_argument("--height=1024")
+    if profile.block_assets:
+        options.set_preference("permissions.default.image", 2)
+        options.set_preference("gfx.downloadable_fonts.enabled", False)
+        options.set_preference("browser.display.use_document_fonts", 0)
+        # Tracking protection blocks the analytics scripts.
+        options.set_preference("privacy.trackingprotection.enabled", True)
+    if profile.shared_cache:
+        options.set_preference("browser.cache.disk.parent_directory", _cache_dir("firefox"))
+    if profile.no_sandbox:
+        options.set_preference("layers.acceleration.disabled", True)
+        options.set_preference("media.hardware-video-decoding.enabled", False)
+    return options
+
+
+def apply_after_start(driver: WebDriver, profile: LaunchProfile) -> None:
+    """
+    Apply the parts of the `profile` that can only be set once the browser has started.
+    """
+    if profile.block_assets and hasattr(driver, "execute_cdp_cmd"):
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
+
+
+def start_browser(browser_type: str, profile: LaunchProfile) -> WebDriver:
+    """
+    Start a browser of `browser_type` ("chrome" or "firefox") with the `profile`, and record how
+    long it took to start.
+    """
+    start = time.perf_counter()
+    with tracing.span("driver", f"start {browser_type}/{profile.name}"):
+        if browser_type == "firefox":
+            driver = webdriver.Firefox(options=firefox_options(profile))
+        else:
+            driver = webdriver.Chrome(options=chrome_options(profile))
+        apply_after_start(driver, profile)
+    STARTUP_COUNTERS.record(f"{browser_type}/{profile.name}", time.perf_counter() - start)
+    return driver
+
+
+def _print_startup_summary() -> None:
+    if STARTUP_COUNTERS.snapshot():
+        print(
+            f"\nBrowser start up time per profile:\n{STARTUP_COUNTERS.summary()}", file=sys.stderr
+        )
+
+
+if os.environ.get(STARTUP_STATS_ENV_VAR):
+    atexit.register(_print_startup_summary)
+
+
+def main() -> None:
+    """
+    Start and close the browsers with each profile, and print how long they took to start.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--browsers",
+        nargs="+",
+        choices=["chrome", "firefox"],
+        default=[os.environ.get(BROWSER_TYPE_ENV_VAR, "chrome")],
+    )
+    parser.add_argument("--profiles", nargs="+", choices=list(PROFILES), default=list(PROFILES))
+    parser.add_argument("--repeat", type=int, default=3, help="how many times to start each")
+    args = parser.parse_args()
+
+    for browser_type in args.browsers:
+        for name in args.profiles:
+            for _ in range(args.repeat):
+                start_browser(browser_type, PROFILES[name]).quit()
+    print(STARTUP_COUNTERS.summary())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,437 @@
+"""
+This contains a load generator for the API, which sends the same requests as the website does.
+
+Each virtual user runs a flow, which is one or more API calls: requesting a token, listing a page of
+models, reading a model, voting for a model with a comment, or reading and updating their profile.
+Flows are started by asyncio either at a fixed arrival rate (an open model, where the latency
+includes any time spent queueing for a free connection) or back to back by a fixed number of
+virtual users (a closed model). The API calls are sent with `requests` in a thread pool the size of
+the concurrency, as the suite has no async HTTP client.
+
+Run it from the `src` directory against the stand-in server, e.g.
+`BUGGY_CARS_TEST_SERVER=http://127.0.0.1:8980/ python3 -m buggy_cars_testing.load_generator`.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import string
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import urljoin
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from buggy_cars_testing import model_catalog, stand_in_server, token_cache
+from buggy_cars_testing.api_client import (
+    MODELS_PATH,
+    PROFILE_PATH,
+    TOKEN_PATH,
+    model_path,
+    vote_path,
+)
+from buggy_cars_testing.constants import (
+    API_WAIT_TIME,
+    BASE_API_URL,
+    COMMENT_LENGTH,
+    NAME_LENGTH,
+    SERVER,
+    USE_LOCAL_SERVER,
+)
+from buggy_cars_testing.http_session import endpoint_name
+from buggy_cars_testing.user_pool import Lease, UserPool
+from buggy_cars_testing.vote_ledger import VoteLedger
+
+DEFAULT_MIX = "models_page=4,model=4,profile=1,vote=1,token=1"
+
+
+class LatencyHistogram:
+    """
+    This counts latencies in buckets that are about 1% wide, like an HDR histogram, so percentiles
+    can be read without keeping every latency.
+    """
+
+    # Each power of two is split into this many buckets, which sets the precision.
+    SUB_BUCKET_BITS = 7
+
+    def __init__(self) -> None:
+        self._counts: Dict[Tuple[int, int], int] = {}
+        self.count = 0
+        self.errors = 0
+        self.total_us = 0
+        self.max_us = 0
+
+    def record(self, microseconds: int, error: bool = False) -> None:
+        """
+        Record a call that took `microseconds`.
+        """
+        exponent = max(0, microseconds.bit_length() - self.SUB_BUCKET_BITS)
+        bucket = (exponent, microseconds >> exponent)
+        self._counts[bucket] = self._counts.get(bucket, 0) + 1
+        self.count += 1
+        self.errors += error
+        self.total_us += microseconds
+        self.max_us = max(self.max_us, microseconds)
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        """
+        Add the calls recorded by `other` to this histogram.
+        """
+        for bucket, count in other._counts.items():  # pylint: disable=protected-access
+            self._counts[bucket] = self._counts.get(bucket, 0) + count
+        self.count += other.count
+        self.errors += other.errors
+        self.total_us += other.total_us
+        self.max_us = max(self.max_us, other.max_us)
+
+    def percentile(self, percent: float) -> int:
+        """
+        Returns the latency in microseconds that `percent` of the calls were at or under. This is
+        the top of the bucket, so it is never less than the actual latency.
+        """
+        if not self.count:
+            return 0
+        target = max(1, round(self.count * percent / 100))
+        seen = 0
+        for exponent, sub_bucket in sorted(self._counts, key=lambda bucket: bucket[1] << bucket[0]):
+            seen += self._counts[(exponent, sub_bucket)]
+            if seen >= target:
+                return min(((sub_bucket + 1) << exponent) - 1, self.max_us)
+        return self.max_us
+
+    def summary(self, duration: float) -> Dict[str, float]:
+        """
+        Returns the throughput, error rate and latency percentiles in milliseconds.
+        """
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "error_rate": self.errors / self.count if self.count else 0.0,
+            "throughput": self.count / duration if duration else 0.0,
+            "mean": self.total_us / self.count / 1000 if self.count else 0.0,
+            "p50": self.percentile(50) / 1000,
+            "p95": self.percentile(95) / 1000,
+            "p99": self.percentile(99) / 1000,
+            "max": self.max_us / 1000,
+        }
+
+
+class VirtualUser(NamedTuple):
+    """
+    A user that runs the flows, with their own token and the models they haven't voted for yet.
+    """
+
+    lease: Lease
+    token: str
+    ledger: VoteLedger
+    unvoted: List[str]
+
+
+def create_virtual_user(lease: Lease, model_ids: List[str]) -> VirtualUser:
+    """
+    Returns a virtual user for the leased user.
+    Pooled users are reused between runs, so the models they have already voted for are left out,
+    and each vote is recorded in their ledger.
+    """
+    token = token_cache.TOKEN_PROVIDER.get_token(*lease)
+    ledger = VoteLedger(lease.username)
+    unvoted = ledger.unvoted_models(token, model_ids)
+    return VirtualUser(lease, token, ledger, random.sample(unvoted, len(unvoted)))
+
+
+class LoadGenerator:
+    """
+    This runs the flows and records the latency of every API call, by endpoint.
+    The flows all run in the event loop's thread, so the histograms and virtual users don't need
+    locks. The votes are recorded in the users' ledgers in another thread, so writing the ledger
+    files doesn't hold up the event loop. The ledger files are locked while they are written.
+    """
+
+    # The flows, by the name used in the mix, and the method that runs them.
+    FLOWS = {
+        "token": "token_flow",
+        "models_page": "models_page_flow",
+        "model": "model_flow",
+        "vote": "vote_flow",
+        "profile": "profile_flow",
+    }
+
+    def __init__(self, users: List[VirtualUser], model_ids: List[str], concurrency: int) -> None:
+        self.users = users
+        self.model_ids = model_ids
+        self.concurrency = concurrency
+        self.histograms: Dict[str, LatencyHistogram] = {}
+        self._executor = ThreadPoolExecutor(max_workers=concurrency)
+        # Retries are turned off, so that failures are counted rather than hidden.
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        self._total_pages = model_catalog.get_models_page(1).total_pages
+
+    def _record(self, endpoint: str, microseconds: int, error: bool) -> None:
+        self.histograms.setdefault(endpoint, LatencyHistogram()).record(microseconds, error)
+
+    async def call(
+        self, method: str, path: str, scheduled: float, **kwargs: Any
+    ) -> Optional[requests.Response]:
+        """
+        Send an API call in the thread pool, and record its latency from the `scheduled` time.
+        Returns None if the call failed without a response.
+        """
+        url = urljoin(BASE_API_URL, path)
+        kwargs.setdefault("timeout", API_WAIT_TIME)
+        loop = asyncio.get_running_loop()
+        response = None
+        try:
+            response = await loop.run_in_executor(
+                self._executor, lambda: self._session.request(method, url, **kwargs)
+            )
+        except requests.RequestException:
+            pass
+        finished = time.perf_counter()
+        error = response is None or response.status_code >= 400
+        self._record(endpoint_name(method, url), int((finished - scheduled) * 1e6), error)
+        return response
+
+    async def token_flow(self, user: VirtualUser, scheduled: float) -> None:
+        """
+        Request a new token.
+        """
+        username, password = user.lease
+        await self.call(
+            "POST",
+            TOKEN_PATH,
+            scheduled,
+            data={"grant_type": "password", "username": username, "password": password},
+        )
+
+    async def models_page_flow(self, _user: VirtualUser, scheduled: float) -> None:
+        """
+        List a random page of models, as the overall ranking page does.
+        """
+        page = random.randint(1, self._total_pages)
+        await self.call("GET", MODELS_PATH, scheduled, params={"page": page})
+
+    async def model_flow(self, user: VirtualUser, scheduled: float) -> None:
+        """
+        Read a random model, as the model page does.
+        """
+        model_id = random.choice(self.model_ids)
+        await self.call(
+            "GET", model_path(model_id), scheduled, headers={"authorization": user.token}
+        )
+
+    async def vote_flow(self, user: VirtualUser, scheduled: float) -> None:
+        """
+        Vote for a model that the user hasn't voted for, with a comment.
+        """
+        if not user.unvoted:
+            # Yield to the event loop, so a closed loop of flows never spins without awaiting.
+            await asyncio.sleep(0)
+            return
+        model_id = user.unvoted.pop()
+        comment = "".join(random.choices(string.ascii_letters, k=COMMENT_LENGTH))
+        response = await self.call(
+            "POST",
+            vote_path(model_id),
+            scheduled,
+            headers={"authorization": user.token},
+            json={"comment": comment},
+        )
+        if response is not None and response.ok:
+            await asyncio.to_thread(user.ledger.record_vote, model_id)
+
+    async def profile_flow(self, user: VirtualUser, scheduled: float) -> None:
+        """
+        Read the user's profile and save it with a new first name, as the profile page does.
+        """
+        headers = {"authorization": user.token}
+        response = await self.call("GET", PROFILE_PATH, scheduled, headers=headers)
+        if response is None or not response.ok:
+            return
+        profile = response.json()
+        profile["firstName"] = "".join(random.choices(string.ascii_lowercase, k=NAME_LENGTH))
+        await self.call("PUT", PROFILE_PATH, time.perf_counter(), headers=headers, json=profile)
+
+    def _pick(
+        self, mix: Dict[str, int]
+    ) -> Optional[Tuple[VirtualUser, Callable[..., Awaitable[None]]]]:
+        """
+        Pick a user and a flow for them to run. The vote flow is left out for users that have voted
+        for every model. Returns None if none of the users have a flow left to run.
+        """
+        choices = [
+            (user, flow, weight)
+            for user in self.users
+            for flow, weight in mix.items()
+            if flow != "vote" or user.unvoted
+        ]
+        if not choices:
+            return None
+        user, flow, _ = random.choices(choices, weights=[choice[2] for choice in choices])[0]
+        return user, getattr(self, self.FLOWS[flow])
+
+    async def run_open(self, mix: Dict[str, int], rate: float, duration: float) -> float:
+        """
+        Start flows at random times, averaging `rate` flows per second, for `duration` seconds.
+        At most `concurrency` flows run at once, and the rest queue.
+        Returns how long it took for every flow to finish.
+        """
+        start = time.perf_counter()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        tasks = []
+
+        async def run_flow(scheduled: float) -> None:
+            async with semaphore:
+                picked = self._pick(mix)
+                if picked is None:
+                    return
+                user, flow = picked
+                await flow(user, scheduled)
+
+        scheduled = start
+        while True:
+            # The gaps between arrivals of a Poisson process are exponentially distributed.
+            scheduled += random.expovariate(rate)
+            if scheduled - start >= duration:
+                break
+            await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+            tasks.append(asyncio.create_task(run_flow(scheduled)))
+        await asyncio.gather(*tasks)
+        return time.perf_counter() - start
+
+    async def run_closed(self, mix: Dict[str, int], duration: float) -> float:
+        """
+        Run `concurrency` virtual users, each starting a new flow as soon as their last one ends,
+        for `duration` seconds. Returns how long it took for every flow to finish.
+        """
+        start = time.perf_counter()
+
+        async def virtual_user() -> None:
+            while time.perf_counter() - start < duration:
+                picked = self._pick(mix)
+                if picked is None:
+                    # The users have voted for every model, and there are only votes in the mix.
+                    return
+                user, flow = picked
+                await flow(user, time.perf_counter())
+
+        await asyncio.gather(*(virtual_user() for _ in range(self.concurrency)))
+        return time.perf_counter() - start
+
+    def close(self) -> None:
+        """
+        Close the thread pool and the connections.
+        """
+        self._executor.shutdown()
+        self._session.close()
+
+
+def parse_mix(mix: str) -> Dict[str, int]:
+    """
+    Parse a flow mix such as `models_page=4,vote=1` into the weight of each flow.
+    """
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        weights[name.strip()] = int(weight or 1)
+    return weights
+
+
+def merge_histograms(histograms: Dict[str, LatencyHistogram]) -> LatencyHistogram:
+    """
+    Returns a histogram of the calls to every endpoint.
+    """
+    total = LatencyHistogram()
+    for histogram in histograms.values():
+        total.merge(histogram)
+    return total
+
+
+def format_report(histograms: Dict[str, LatencyHistogram], duration: float) -> str:
+    """
+    Returns a table of the throughput, error rate and latency percentiles of each endpoint.
+    """
+    total = merge_histograms(histograms)
+    lines = [
+        f"{'endpoint':<28} {'calls':>7} {'err %':>6} {'req/s':>8} "
+        f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}"
+    ]
+    for endpoint, histogram in itertools.chain(sorted(histograms.items()), [("total", total)]):
+        summary = histogram.summary(duration)
+        lines.append(
+            f"{endpoint:<28} {summary['count']:>7} {summary['error_rate'] * 100:>6.2f} "
+            f"{summary['throughput']:>8.1f} {summary['p50']:>8.1f} {summary['p95']:>8.1f} "
+            f"{summary['p99']:>8.1f} {summary['max']:>8.1f}"
+        )
+    return "\n".join(lines)
+
+
+def main() -> int:
+    """
+    Generate load against the API and print the report.
+    Returns the exit code, which is non-zero if the error rate is above `--max-error-rate`.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=10, help="flows that run at once")
+    parser.add_argument(
+        "--rate", type=float, default=0, help="flows started per second (0 to run back to back)"
+    )
+    parser.add_argument("--duration", type=float, default=30, help="seconds to generate load for")
+    parser.add_argument("--users", type=int, default=5, help="pooled users to run the flows as")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="the weight of each flow")
+    parser.add_argument("--json", help="also write the report to this JSON file")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument(
+        "--allow-live", action="store_true", help="allow generating load on the live website"
+    )
+    args = parser.parse_args()
+
+    if not SERVER and not args.allow_live:
+        parser.error("set BUGGY_CARS_TEST_SERVER to a stand-in server, or pass --allow-live")
+    mix = parse_mix(args.mix)
+    unknown_flows = set(mix) - set(LoadGenerator.FLOWS)
+    if unknown_flows:
+        parser.error(f"unknown flows {', '.join(sorted(unknown_flows))}")
+    if USE_LOCAL_SERVER:
+        stand_in_server.ensure_running()
+
+    model_ids = model_catalog.load_model_ids()
+    user_pool = UserPool(args.users)
+    users = [create_virtual_user(user_pool.lease(), model_ids) for _ in range(args.users)]
+    generator = LoadGenerator(users, model_ids, args.concurrency)
+    try:
+        if args.rate > 0:
+            duration = asyncio.run(generator.run_open(mix, args.rate, args.duration))
+        else:
+            duration = asyncio.run(generator.run_closed(mix, args.duration))
+    finally:
+        generator.close()
+        user_pool.release_all()
+
+    print(format_report(generator.histograms, duration))
+    out_of_votes = sum(not user.unvoted for user in users)
+    if out_of_votes and "vote" in mix:
+        print(f"{out_of_votes} of {len(users)} users voted for every model, and stopped voting.")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as report_file:
+            json.dump(
+                {
+                    endpoint: histogram.summary(duration)
+                    for endpoint, histogram in generator.histograms.items()
+                },
+                report_file,
+                indent=2,
+            )
+
+    total = merge_histograms(generator.histograms)
+    return 1 if total.summary(duration)["error_rate"] > args.max_error_rate else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
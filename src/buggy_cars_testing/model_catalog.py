@@ -0,0 +1,60 @@
+"""
+This contains the loader for the car model catalog, which is the list of all of the car model IDs.
+
+The car models are split across multiple pages in the API. The first page is fetched to find out how
+many pages there are, and the rest are fetched concurrently. The catalog is cached on disk, so
+repeated runs and parallel workers don't need to crawl the pages again.
+"""
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+from buggy_cars_testing import cache_files
+from buggy_cars_testing.api_client import ApiClient, ModelsPage
+from buggy_cars_testing.constants import BASE_API_URL, CATALOG_CACHE_TTL, CATALOG_MAX_WORKERS
+
+
+def get_models_page(page_num: int) -> ModelsPage:
+    """
+    Returns the page of car models specified by `page_num`.
+    """
+    return ApiClient().models_page(page_num)
+
+
+def load_model_ids(use_cache: bool = True) -> List[str]:
+    """
+    Returns the IDs of all of the car models.
+    """
+    first_page = get_models_page(1)
+    total_pages = first_page.total_pages
+
+    path = _catalog_cache_path(total_pages)
+    if use_cache:
+        model_ids = _read_cached_model_ids(path)
+        if model_ids is not None:
+            return model_ids
+
+    with ThreadPoolExecutor(max_workers=CATALOG_MAX_WORKERS) as executor:
+        pages = [first_page] + list(executor.map(get_models_page, range(2, total_pages + 1)))
+
+    # The rankings can change while the pages are being fetched, so a model could be seen twice.
+    model_ids = list(dict.fromkeys(model.id for page in pages for model in page.models))
+    cache_files.write_json(path, {"created": time.time(), "models": model_ids})
+    return model_ids
+
+
+def _catalog_cache_path(total_pages: int) -> str:
+    """
+    The cache is keyed by the API being used and the amount of pages, so adding models to the
+    catalog creates a new cache.
+    """
+    api_hash = hashlib.sha256(BASE_API_URL.encode()).hexdigest()[:16]
+    return cache_files.cache_path(f"catalog-{api_hash}-{total_pages}.json")
+
+
+def _read_cached_model_ids(path: str) -> Optional[List[str]]:
+    cached = cache_files.read_json(path)
+    if not cached or time.time() - cached["created"] > CATALOG_CACHE_TTL:
+        return None
+    return cached["models"]
@@ -0,0 +1,192 @@
+"""
+This contains the page objects for the pages of the website that the tests use.
+
+Each page has precomputed locators for the elements the tests use, so that elements aren't found
+by searching the whole page for their text. Elements are cached by the page object, and the cache is
+checked in the same round trip to the browser as the lookup: the cache is cleared when the browser
+has navigated to another page, and an element is looked up again if the page has re-rendered it.
+"""
+import itertools
+from typing import Dict, Optional, Tuple
+from urllib.parse import quote, urljoin, urlsplit
+
+from selenium.common.exceptions import NoSuchElementException, StaleElementReferenceException
+from selenium.webdriver.remote.webdriver import WebDriver
+from selenium.webdriver.remote.webelement import WebElement
+
+from buggy_cars_testing import page_performance, tracing, waits
+from buggy_cars_testing.constants import BASE_URL
+
+# A locator is either ("css", selector) or ("xpath", expression). XPath is only used for elements
+# that can only be told apart by their text, and is scoped to the type of element.
+Locator = Tuple[str, str]
+
+# Each page object's marker is stored in the window, which is replaced when the browser navigates,
+# so a missing marker means that the page object's cached elements are from another page. The
+# markers of other page objects used on the same window are kept, so they don't clear each other's
+# caches.
+LOOKUP_SCRIPT = """
+const [cached, kind, selector, marker] = arguments;
+const markers = window.__buggyCarsPageMarkers || (window.__buggyCarsPageMarkers = {});
+const navigated = !markers[marker];
+markers[marker] = true;
+if (cached && !navigated && cached.isConnected) return [cached, false];
+const element = kind === "css"
+  ? document.querySelector(selector)
+  : document.evaluate(selector, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null)
+      .singleNodeValue;
+return [element, navigated];
+"""
+
+_markers = itertools.count()
+
+
+def open_page(driver: WebDriver, url: str) -> None:
+    """
+    Go to the `url`, timing how long the page takes to load.
+    The performance of the page the browser is leaving is captured first.
+    """
+    page_performance.CAPTURE.collect(driver)
+    with tracing.span("page", urlsplit(url).path or "/", url=url):
+        driver.get(url)
+    page_performance.CAPTURE.page_loaded(driver, url)
+
+
+class BasePage:
+    """
+    This is the base class for the page objects. Every page has the navigation bar.
+    """
+
+    path = ""
+    locators: Dict[str, Locator] = {
+        "login": ("css", "input[name='login']"),
+        "password": ("css", "input[name='password']"),
+        "profile_link": ("xpath", "//a[normalize-space()='Profile']"),
+        "logout_link": ("xpath", "//a[normalize-space()='Logout']"),
+    }
+
+    def __init__(self, driver: WebDriver) -> None:
+        self.driver = driver
+        self._cache: Dict[str, WebElement] = {}
+        self._marker = f"{type(self).__name__}-{next(_markers)}"
+
+    @property
+    def url(self) -> str:
+        """
+        The URL of the page.
+        """
+        return urljoin(BASE_URL, self.path)
+
+    def open(self) -> "BasePage":
+        """
+        Go to the page.
+        """
+        open_page(self.driver, self.url)
+        return self
+
+    def element(self, name: str) -> WebElement:
+        """
+        Returns the element called `name` in `locators`, using the cached element if it is still on
+        the page.
+        """
+        element = self.find(name)
+        if element is None:
+            kind, selector = self.locators[name]
+            raise NoSuchElementException(f"Could not find {name} using {kind} {selector}")
+        return element
+
+    def find(self, name: str) -> Optional[WebElement]:
+        """
+        Returns the element called `name` in `locators`, or None if it is not on the page.
+        """
+        kind, selector = self.locators[name]
+        with tracing.span("dom", f"{type(self).__name__}.{name}"):
+            try:
+                element, navigated = self.driver.execute_script(
+                    LOOKUP_SCRIPT, self._cache.get(name), kind, selector, self._marker
+                )
+            except StaleElementReferenceException:
+                # The browser can't pass an element from a previous page to the script.
+                self._cache.clear()
+                element, navigated = self.driver.execute_script(
+                    LOOKUP_SCRIPT, None, kind, selector, self._marker
+                )
+
+        if navigated:
+            self._cache.clear()
+        if element is not None:
+            self._cache[name] = element
+        return element
+
+    def wait_for(self, name: str) -> WebElement:
+        """
+        Wait for the element called `name` in `locators` to be added to the page, and return it.
+        """
+        with tracing.span("dom", f"{type(self).__name__}.{name}"):
+            return waits.wait_for_locator(self.driver, self.locators[name])
+
+
+class HomePage(BasePage):
+    """
+    The home page, which has the login form.
+    """
+
+
+class RegisterPage(BasePage):
+    """
+    The page for registering a new user.
+    """
+
+    path = "register"
+
+
+class ProfilePage(BasePage):
+    """
+    The page for updating the logged in user's profile.
+    """
+
+    path = "profile"
+    locators = {
+        **BasePage.locators,
+        "first_name": ("css", "#firstName"),
+        "genders": ("css", "#genders"),
+        "hobbies": ("css", "#hobby"),
+    }
+
+
+class ModelPage(BasePage):
+    """
+    The page for a car model, where users can vote and comment.
+    """
+
+    locators = {
+        **BasePage.locators,
+        "specification": ("xpath", "//h4[normalize-space()='Specification']"),
+        "comment": ("css", "#comment"),
+        "vote_button": ("xpath", "//button[normalize-space()='Vote!']"),
+        "vote_message": ("xpath", "//p[normalize-space()='Thank you for your vote!']"),
+    }
+
+    def __init__(self, driver: WebDriver, model_id: str) -> None:
+        super().__init__(driver)
+        self.path = quote(f"model/{model_id}")
+
+
+class OverallPage(BasePage):
+    """
+    The page with the overall rankings of the car models.
+    """
+
+    path = "overall"
+    locators = {
+        **BasePage.locators,
+        "previous_page": ("xpath", "//a[normalize-space()='«']"),
+        "next_page": ("xpath", "//a[normalize-space()='»']"),
+    }
+
+    def open_page_number(self, page_num: int) -> "OverallPage":
+        """
+        Go straight to page `page_num` of the rankings, rather than clicking through the pages.
+        """
+        open_page(self.driver, urljoin(BASE_URL, f"{self.path}?page={page_num}"))
+        return self
@@ -0,0 +1,378 @@
+"""
+This contains the capture of how fast the pages of the website load, and the budgets they are
+checked against.
+
+For each page that the tests load, the browser's Navigation Timing (time to first byte,
+DOMContentLoaded and load), Resource Timing (the requests the page made and the bytes they
+transferred) and long tasks (scripts that blocked the page for more than 50 ms) are read just before
+the browser leaves the page, so the API calls the page made after it loaded are included. On
+Chrome, the requests and bytes are counted from the DevTools network events instead, which also
+include requests to other sites that Resource Timing can't see the size of.
+
+Capturing is turned on using `BUGGY_CARS_TEST_PAGE_PERFORMANCE_DIR`. Each process writes the pages
+it captured to that directory when it exits, and prints a report of each page against its budget.
+Tests can also check the page they are on using `BaseBuggyCarTests.assert_page_within_budget`.
+
+Run `python3 -m buggy_cars_testing.page_performance <directory>` from the `src` directory to merge
+the files written by the worker processes of the test runner into one report.
+"""
+import argparse
+import atexit
+import glob
+import json
+import math
+import multiprocessing
+import os
+import re
+import statistics
+import sys
+import threading
+from typing import TYPE_CHECKING, Any, Dict, List, NamedTuple, Optional
+from urllib.parse import urlsplit
+
+from buggy_cars_testing.constants import BASE_URL, PAGE_BUDGETS, PAGE_PERFORMANCE_DIR
+
+# Selenium is only imported when a page is captured, so the test runner and the tests that only use
+# the API don't import it.
+if TYPE_CHECKING:
+    from selenium.webdriver.remote.webdriver import WebDriver
+
+MERGED_FILE_NAME = "page_performance.json"
+
+# The pages that have budgets, and the paths (relative to the website) that they are loaded from.
+PAGE_PATHS = {
+    "home": re.compile(r"^$"),
+    "register": re.compile(r"^register$"),
+    "overall": re.compile(r"^overall$"),
+    "model": re.compile(r"^model/"),
+}
+
+# The metrics that have budgets, and their units.
+BUDGET_METRICS = {
+    "ttfb": "ms",
+    "dom_content_loaded": "ms",
+    "transferred_bytes": "bytes",
+    "requests": "requests",
+}
+
+# The long tasks are read from an observer that is created the first time the page is captured.
+# Creating it with `buffered` gives it the long tasks from before it was created, and `takeRecords`
+# returns them straight away rather than in a callback.
+CAPTURE_SCRIPT = """
+const [navigation] = performance.getEntriesByType("navigation");
+const timing = navigation || (() => {
+  const legacy = performance.timing;
+  return {
+    responseStart: legacy.responseStart - legacy.navigationStart,
+    domContentLoadedEventEnd: legacy.domContentLoadedEventEnd - legacy.navigationStart,
+    loadEventEnd: legacy.loadEventEnd - legacy.navigationStart,
+    transferSize: 0,
+  };
+})();
+const resources = performance.getEntriesByType("resource");
+
+if (window.__buggyCarsLongTasks === undefined) {
+  window.__buggyCarsLongTasks = [];
+  if ((PerformanceObserver.supportedEntryTypes || []).includes("longtask")) {
+    window.__buggyCarsLongTaskObserver = new PerformanceObserver((list) => {
+      window.__buggyCarsLongTasks.push(...list.getEntries().map((entry) => entry.duration));
+    });
+    window.__buggyCarsLongTaskObserver.observe({type: "longtask", buffered: true});
+  }
+}
+if (window.__buggyCarsLongTaskObserver) {
+  window.__buggyCarsLongTasks.push(
+    ...window.__buggyCarsLongTaskObserver.takeRecords().map((entry) => entry.duration));
+}
+
+return {
+  url: location.href,
+  ttfb: timing.responseStart,
+  domContentLoaded: timing.domContentLoadedEventEnd,
+  load: timing.loadEventEnd,
+  requests: resources.length + 1,
+  transferredBytes: resources.reduce((total, entry) => total + (entry.transferSize || 0),
+                                     timing.transferSize || 0),
+  longTasks: window.__buggyCarsLongTasks,
+};
+"""
+
+
+class PageMetrics(NamedTuple):
+    """
+    How fast a page loaded. Times are in milliseconds from the start of the navigation.
+    """
+
+    page: str
+    url: str
+    browser: str
+    ttfb: float
+    dom_content_loaded: float
+    load: float
+    transferred_bytes: int
+    requests: int
+    long_tasks: int
+    long_task_time: float
+    # Where the requests and bytes were counted from: "devtools" or "resource timing".
+    network_source: str
+
+
+def page_name(url: str) -> str:
+    """
+    Returns the name of the page at the `url`, e.g. "model", or its path if it has no budget.
+    """
+    path = urlsplit(url).path.lstrip("/")
+    base_path = urlsplit(BASE_URL).path.lstrip("/")
+    if path.startswith(base_path):
+        path = path[len(base_path) :]
+    for name, pattern in PAGE_PATHS.items():
+        if pattern.match(path):
+            return name
+    return "/" + path
+
+
+def _read_network_events(driver: "WebDriver") -> Optional[Dict[str, int]]:
+    """
+    Returns the number of requests and the bytes transferred since the last time the DevTools
+    network events were read, or None if the browser doesn't log them.
+    """
+    # pylint: disable=import-outside-toplevel
+    from selenium.common.exceptions import WebDriverException
+
+    try:
+        entries = driver.get_log("performance")
+    except (WebDriverException, AttributeError):
+        return None
+    requests, transferred_bytes = 0, 0
+    for entry in entries:
+        message = json.loads(entry["message"])["message"]
+        if message["method"] == "Network.requestWillBeSent":
+            if not message["params"]["request"]["url"].startswith("data:"):
+                requests += 1
+        elif message["method"] == "Network.loadingFinished":
+            transferred_bytes += int(message["params"].get("encodedDataLength", 0))
+    return {"requests": requests, "transferred_bytes": transferred_bytes}
+
+
+def measure(driver: "WebDriver", network: Optional[Dict[str, int]] = None) -> PageMetrics:
+    """
+    Returns how fast the page the browser is on loaded.
+    The requests and bytes are taken from the DevTools `network` events if there are any.
+    """
+    timing = driver.execute_script(CAPTURE_SCRIPT)
+    long_tasks = timing["longTasks"]
+    if network is None:
+        network = _read_network_events(driver)
+    if network is not None and network["requests"]:
+        requests, transferred_bytes = network["requests"], network["transferred_bytes"]
+        network_source = "devtools"
+    else:
+        requests, transferred_bytes = timing["requests"], timing["transferredBytes"]
+        network_source = "resource timing"
+    return PageMetrics(
+        page=page_name(timing["url"]),
+        url=timing["url"],
+        browser=driver.name,
+        ttfb=float(timing["ttfb"]),
+        dom_content_loaded=float(timing["domContentLoaded"]),
+        load=float(timing["load"]),
+        transferred_bytes=int(transferred_bytes),
+        requests=int(requests),
+        long_tasks=len(long_tasks),
+        long_task_time=float(sum(long_tasks)),
+        network_source=network_source,
+    )
+
+
+def check_budget(
+    metrics: PageMetrics, budgets: Dict[str, Dict[str, float]] = PAGE_BUDGETS
+) -> List[str]:
+    """
+    Returns a description of each metric of the page that is over its budget.
+    """
+    over = []
+    for metric, budget in budgets.get(metrics.page, {}).items():
+        value = getattr(metrics, metric)
+        if value > budget:
+            over.append(f"{metric} {value:.0f} {BUDGET_METRICS[metric]} > {budget}")
+    return over
+
+
+class PageCapture:
+    """
+    This captures how fast each page that the browsers of this process load.
+    A page is captured when the browser leaves it, or when a test checks it against its budget.
+    """
+
+    def __init__(self, enabled: bool) -> None:
+        self.enabled = enabled
+        self.pages: List[PageMetrics] = []
+        self._lock = threading.Lock()
+        # The browsers (by id) that are on a page that hasn't been captured yet.
+        self._loaded: Dict[int, str] = {}
+
+    def page_loaded(self, driver: "WebDriver", url: str) -> None:
+        """
+        Note that the browser has loaded the `url`, so it is captured when the browser leaves it.
+        """
+        if self.enabled:
+            with self._lock:
+                self._loaded[id(driver)] = url
+
+    def collect(self, driver: "WebDriver") -> Optional[PageMetrics]:
+        """
+        Capture the page the browser is on, if it hasn't been captured already.
+        Returns the metrics, or None if there is no page to capture.
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            url = self._loaded.pop(id(driver), None)
+        # The DevTools events are read even when there is no page to capture, so that the events of
+        # pages that weren't loaded using `open_page` aren't counted against the next page.
+        network = _read_network_events(driver)
+        if url is None:
+            return None
+        # pylint: disable=import-outside-toplevel
+        from selenium.common.exceptions import WebDriverException
+
+        try:
+            metrics = measure(driver, network)
+        except WebDriverException:
+            # The browser has closed or crashed, which the test will report.
+            return None
+        with self._lock:
+            self.pages.append(metrics)
+        return metrics
+
+    def write(self, directory: str) -> str:
+        """
+        Write the captured pages to a file in the `directory`, and return its path.
+        """
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"page-performance-{os.getpid()}.json")
+        with open(path, "w", encoding="utf-8") as pages_file:
+            json.dump([metrics._asdict() for metrics in self.pages], pages_file)
+        return path
+
+
+def _percentile(values: List[float], percent: float) -> float:
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(len(ordered) * percent / 100) - 1)]
+
+
+def aggregate(pages: List[PageMetrics]) -> Dict[str, Dict[str, Any]]:
+    """
+    Returns the median, 95th percentile and maximum of each metric of each page (by page and
+    browser, e.g. "model [chrome]"), and how many of the loads were over budget.
+    """
+    grouped: Dict[str, List[PageMetrics]] = {}
+    for metrics in pages:
+        grouped.setdefault(f"{metrics.page} [{metrics.browser}]", []).append(metrics)
+
+    report = {}
+    for name, loads in sorted(grouped.items()):
+        summary: Dict[str, Any] = {
+            "loads": len(loads),
+            "over_budget": sum(bool(check_budget(metrics)) for metrics in loads),
+        }
+        for metric in (*BUDGET_METRICS, "load", "long_task_time"):
+            values = [getattr(metrics, metric) for metrics in loads]
+            summary[metric] = {
+                "median": statistics.median(values),
+                "p95": _percentile(values, 95),
+                "max": max(values),
+            }
+        report[name] = summary
+    return report
+
+
+def format_report(pages: List[PageMetrics]) -> str:
+    """
+    Returns a table of the 95th percentile of each metric of each page, and the loads that were over
+    budget.
+    """
+    lines = [
+        f"{'page':<22} {'loads':>6} {'ttfb ms':>9} {'dcl ms':>9} {'load ms':>9} {'KB':>8} "
+        f"{'requests':>9} {'long ms':>8} {'over':>5}"
+    ]
+    for name, summary in aggregate(pages).items():
+        lines.append(
+            f"{name[-22:]:<22} {summary['loads']:>6} {summary['ttfb']['p95']:>9.0f} "
+            f"{summary['dom_content_loaded']['p95']:>9.0f} {summary['load']['p95']:>9.0f} "
+            f"{summary['transferred_bytes']['p95'] / 1024:>8.0f} "
+            f"{summary['requests']['p95']:>9.0f} {summary['long_task_time']['p95']:>8.0f} "
+            f"{summary['over_budget']:>5}"
+        )
+    lines.append("(the 95th percentile of each metric)")
+    for metrics in pages:
+        over = check_budget(metrics)
+        if over:
+            lines.append(f"Over budget: {metrics.url} [{metrics.browser}]: {'; '.join(over)}")
+    return "\n".join(lines)
+
+
+def clear_reports(directory: str) -> None:
+    """
+    Remove the files left in the `directory` by a previous run.
+    """
+    for path in glob.glob(os.path.join(directory, "page-performance-*.json")):
+        os.unlink(path)
+
+
+def merge_reports(directory: str) -> List[PageMetrics]:
+    """
+    Merge the files written by each process in the `directory` into one `page_performance.json`
+    with the aggregated report, and return the captured pages.
+    """
+    pages: List[PageMetrics] = []
+    for path in sorted(glob.glob(os.path.join(directory, "page-performance-*.json"))):
+        with open(path, encoding="utf-8") as pages_file:
+            pages.extend(PageMetrics(**metrics) for metrics in json.load(pages_file))
+    with open(os.path.join(directory, MERGED_FILE_NAME), "w", encoding="utf-8") as report_file:
+        json.dump(
+            {
+                "budgets": PAGE_BUDGETS,
+                "summary": aggregate(pages),
+                "pages": [metrics._asdict() for metrics in pages],
+            },
+            report_file,
+            indent=2,
+        )
+    return pages
+
+
+CAPTURE = PageCapture(bool(PAGE_PERFORMANCE_DIR))
+
+
+def _write_pages() -> None:
+    if not CAPTURE.pages:
+        return
+    path = CAPTURE.write(PAGE_PERFORMANCE_DIR)
+    # The test runner prints one report for all of its worker processes.
+    if multiprocessing.parent_process() is None:
+        print(
+            f"\nPage performance (written to {path}):\n{format_report(CAPTURE.pages)}",
+            file=sys.stderr,
+        )
+
+
+if CAPTURE.enabled:
+    atexit.register(_write_pages)
+
+
+def main() -> int:
+    """
+    Merge the files in a directory and print the report.
+    Returns the exit code, which is non-zero if any page was over its budget.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("directory", nargs="?", default=PAGE_PERFORMANCE_DIR)
+    args = parser.parse_args()
+    pages = merge_reports(args.directory)
+    print(format_report(pages))
+    return 1 if any(check_budget(metrics) for metrics in pages) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
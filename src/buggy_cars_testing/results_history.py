@@ -0,0 +1,304 @@
+"""
+This contains the history of the test runs, which is kept in an SQLite database.
+
+The test runner records every job it ran (how long it took and whether it passed, for each
+attempt) and the outcome and duration of every test case and subTest. The history is then used to:
+* start the jobs that take the longest first, so that a slow job doesn't start last and hold up the
+  end of the run,
+* run only the jobs that failed in the previous run, and
+* score how flaky each test case and subTest is.
+
+Run `python3 -m buggy_cars_testing.results_history` from the `src` directory to query the history,
+e.g. `... results_history flaky` for the flakiest tests, or `... results_history test vote` for the
+history of the tests with "vote" in their name.
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import time
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from buggy_cars_testing.constants import HISTORY_DB, HISTORY_FLAKE_RUNS, HISTORY_DURATION_RUNS
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    started REAL NOT NULL,
+    wall_time REAL NOT NULL,
+    arguments TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    test_id TEXT NOT NULL,
+    browser TEXT NOT NULL,
+    shard_index INTEGER NOT NULL,
+    shard_count INTEGER NOT NULL,
+    attempt INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    duration REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS outcomes (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    test_id TEXT NOT NULL,
+    description TEXT NOT NULL,
+    browser TEXT NOT NULL,
+    attempt INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    duration REAL NOT NULL,
+    details TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_by_run ON jobs(run_id);
+CREATE INDEX IF NOT EXISTS outcomes_by_run ON outcomes(run_id);
+"""
+
+# The statuses that count as the test not passing.
+FAILED_STATUSES = ("fail", "error")
+
+# A job is identified by its test case, browser, and shard.
+JobKey = Tuple[str, str, int, int]
+
+
+class RecordedJob(NamedTuple):
+    """
+    An attempt at running a job, as recorded in the history.
+    """
+
+    test_id: str
+    browser: str
+    shard_index: int
+    shard_count: int
+    attempt: int
+    status: str
+    duration: float
+
+
+class RecordedOutcome(NamedTuple):
+    """
+    The outcome of a test case or subTest in an attempt at running a job.
+    """
+
+    test_id: str
+    description: str
+    browser: str
+    attempt: int
+    status: str
+    duration: float
+    details: str
+
+
+class FlakeScore(NamedTuple):
+    """
+    How flaky a test case or subTest is in a browser.
+    The score is how often the status changed from one attempt to the next, from 0 for a test that
+    always passes (or always fails) to 1 for a test that alternates between passing and failing.
+    """
+
+    description: str
+    browser: str
+    score: float
+    attempts: int
+    failures: int
+
+
+class History:
+    """
+    This records the test runs to the history database, and queries it.
+    """
+
+    def __init__(self, path: str = HISTORY_DB) -> None:
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._connection = sqlite3.connect(path)
+        self._connection.executescript(SCHEMA)
+
+    def close(self) -> None:
+        """
+        Close the database.
+        """
+        self._connection.close()
+
+    def record_run(
+        self,
+        jobs: Iterable[RecordedJob],
+        outcomes: Iterable[RecordedOutcome],
+        wall_time: float,
+        arguments: str = "",
+    ) -> int:
+        """
+        Record a test run, and return its id.
+        """
+        with self._connection:
+            run_id = self._connection.execute(
+                "INSERT INTO runs (started, wall_time, arguments) VALUES (?, ?, ?)",
+                (time.time() - wall_time, wall_time, arguments),
+            ).lastrowid
+            self._connection.executemany(
+                "INSERT INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(run_id, *job) for job in jobs],
+            )
+            self._connection.executemany(
+                "INSERT INTO outcomes VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(run_id, *outcome) for outcome in outcomes],
+            )
+        return run_id
+
+    def _recent_run_ids(self, runs: int) -> List[int]:
+        return [
+            row[0]
+            for row in self._connection.execute(
+                "SELECT id FROM runs ORDER BY id DESC LIMIT ?", (runs,)
+            )
+        ]
+
+    def expected_durations(self, runs: int = HISTORY_DURATION_RUNS) -> Dict[JobKey, float]:
+        """
+        Returns the median duration in seconds of each job over the last `runs` runs.
+        """
+        durations: Dict[JobKey, List[float]] = {}
+        for test_id, browser, shard_index, shard_count, duration in self._connection.execute(
+            "SELECT test_id, browser, shard_index, shard_count, duration FROM jobs "
+            "WHERE run_id IN (SELECT id FROM runs ORDER BY id DESC LIMIT ?)",
+            (runs,),
+        ):
+            durations.setdefault((test_id, browser, shard_index, shard_count), []).append(duration)
+        return {key: statistics.median(values) for key, values in durations.items()}
+
+    def last_failures(self) -> Set[JobKey]:
+        """
+        Returns the jobs that still failed after their last attempt in the previous run.
+        """
+        run_ids = self._recent_run_ids(1)
+        if not run_ids:
+            return set()
+        final_status: Dict[JobKey, Tuple[int, str]] = {}
+        for test_id, browser, shard_index, shard_count, attempt, status in self._connection.execute(
+            "SELECT test_id, browser, shard_index, shard_count, attempt, status FROM jobs "
+            "WHERE run_id = ?",
+            run_ids,
+        ):
+            key = (test_id, browser, shard_index, shard_count)
+            if key not in final_status or attempt > final_status[key][0]:
+                final_status[key] = (attempt, status)
+        return {key for key, (_, status) in final_status.items() if status in FAILED_STATUSES}
+
+    def flake_scores(self, runs: int = HISTORY_FLAKE_RUNS) -> List[FlakeScore]:
+        """
+        Returns how flaky each test case and subTest has been over the last `runs` runs, flakiest
+        first. Attempts that were retried in the same run count as separate attempts, so a test
+        that failed and then passed on a retry counts as a change of status.
+        """
+        statuses: Dict[Tuple[str, str], List[bool]] = {}
+        for description, browser, status in self._connection.execute(
+            "SELECT description, browser, status FROM outcomes "
+            "WHERE run_id IN (SELECT id FROM runs ORDER BY id DESC LIMIT ?) "
+            "AND status IN ('pass', 'fail', 'error') ORDER BY run_id, attempt",
+            (runs,),
+        ):
+            statuses.setdefault((description, browser), []).append(status in FAILED_STATUSES)
+
+        scores = []
+        for (description, browser), failed in statuses.items():
+            changes = sum(previous != current for previous, current in zip(failed, failed[1:]))
+            score = changes / (len(failed) - 1) if len(failed) > 1 else 0.0
+            scores.append(FlakeScore(description, browser, score, len(failed), sum(failed)))
+        return sorted(scores, key=lambda flake: (-flake.score, -flake.failures))
+
+    def query(self, sql: str, parameters: Tuple[Any, ...] = ()) -> List[Tuple[Any, ...]]:
+        """
+        Returns the rows of an SQL query of the history.
+        """
+        return self._connection.execute(sql, parameters).fetchall()
+
+
+def _print_table(headers: List[str], rows: Iterable[Tuple[Any, ...]]) -> None:
+    rows = [
+        [f"{value:.3f}" if isinstance(value, float) else str(value) for value in row]
+        for row in rows
+    ]
+    widths = [
+        max([len(header)] + [len(row[index]) for row in rows])
+        for index, header in enumerate(headers)
+    ]
+    for row in [headers] + rows:
+        print("  ".join(value.ljust(width) for value, width in zip(row, widths)).rstrip())
+
+
+def main(arguments: Optional[List[str]] = None) -> None:
+    """
+    Query the history of the test runs.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--history", default=HISTORY_DB, help="the history database")
+    parser.add_argument("--limit", type=int, default=20, help="the most rows to show")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("runs", help="the latest runs")
+    commands.add_parser("slowest", help="the test cases and subTests with the longest median")
+    flaky = commands.add_parser("flaky", help="the flakiest test cases and subTests")
+    flaky.add_argument("--runs", type=int, default=HISTORY_FLAKE_RUNS)
+    commands.add_parser("failures", help="what failed in the latest run")
+    test = commands.add_parser("test", help="the history of the tests matching a pattern")
+    test.add_argument("pattern", help="part of the test name, e.g. vote")
+    commands.add_parser("sql", help="run an SQL query").add_argument("query")
+    args = parser.parse_args(arguments)
+
+    history = History(args.history)
+    if args.command == "runs":
+        _print_table(
+            ["run", "started", "wall s", "jobs", "failed jobs", "arguments"],
+            history.query(
+                "SELECT runs.id, datetime(started, 'unixepoch', 'localtime'), wall_time, "
+                "COUNT(jobs.run_id), SUM(jobs.status IN ('fail', 'error')), arguments "
+                "FROM runs LEFT JOIN jobs ON jobs.run_id = runs.id "
+                "GROUP BY runs.id ORDER BY runs.id DESC LIMIT ?",
+                (args.limit,),
+            ),
+        )
+    elif args.command == "slowest":
+        durations: Dict[Tuple[str, str], List[float]] = {}
+        for description, browser, duration in history.query(
+            "SELECT description, browser, duration FROM outcomes"
+        ):
+            durations.setdefault((description, browser), []).append(duration)
+        medians = sorted(
+            ((statistics.median(values), len(values), *key) for key, values in durations.items()),
+            reverse=True,
+        )
+        _print_table(["median s", "runs", "test", "browser"], medians[: args.limit])
+    elif args.command == "flaky":
+        _print_table(
+            ["score", "attempts", "failures", "test", "browser"],
+            [
+                (flake.score, flake.attempts, flake.failures, flake.description, flake.browser)
+                for flake in history.flake_scores(args.runs)
+                if flake.score > 0
+            ][: args.limit],
+        )
+    elif args.command == "failures":
+        _print_table(
+            ["attempt", "status", "test", "browser"],
+            history.query(
+                "SELECT attempt, status, description, browser FROM outcomes "
+                "WHERE run_id = (SELECT MAX(id) FROM runs) AND status IN ('fail', 'error') "
+                "ORDER BY description, browser, attempt LIMIT ?",
+                (args.limit,),
+            ),
+        )
+    elif args.command == "test":
+        _print_table(
+            ["run", "attempt", "status", "duration s", "test", "browser"],
+            history.query(
+                "SELECT run_id, attempt, status, duration, description, browser FROM outcomes "
+                "WHERE description LIKE ? ORDER BY run_id DESC, attempt DESC LIMIT ?",
+                (f"%{args.pattern}%", args.limit),
+            ),
+        )
+    else:
+        for row in history.query(args.query):
+            print("\t".join(str(value) for value in row))
+    history.close()
+
+
+if __name__ == "__main__":
+    main()
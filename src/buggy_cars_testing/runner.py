@@ -0,0 +1,449 @@
+"""
+This contains a test runner that runs the test cases in parallel worker processes.
+
+Each browser in the browser matrix gets its own pool of worker processes, and each worker process
+keeps one browser open. Test cases marked with `subtest_shards` are split into shards, which run as
+separate jobs. The results from every job are merged into one report.
+
+Each run is recorded to the history of runs (see `results_history`), and the jobs that took the
+longest in previous runs are started first.
+
+Run it from the `src` directory using `python3 -m buggy_cars_testing.runner`.
+"""
+import argparse
+import io
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+import unittest
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, NamedTuple, Tuple
+
+from buggy_cars_testing import page_performance, results_history, tracing
+from buggy_cars_testing.constants import (
+    BROWSER_TYPE_ENV_VAR,
+    HISTORY_DB,
+    PAGE_PERFORMANCE_DIR,
+    SERVER_ENV_VAR,
+    SUBTEST_SHARD_ENV_VAR,
+    TRACE_DIR,
+    USE_LOCAL_SERVER,
+)
+
+BROWSERS = ["chrome", "firefox"]
+SEPARATOR_BOLD = "=" * 70
+SEPARATOR = "-" * 70
+
+
+class Job(NamedTuple):
+    """
+    A test case (or one shard of its subTests) to run in one browser.
+    """
+
+    browser: str
+    test_id: str
+    shard_index: int = 0
+    shard_count: int = 1
+
+    @property
+    def name(self) -> str:
+        """
+        A readable name for the job.
+        """
+        shard = f" shard {self.shard_index + 1}/{self.shard_count}" if self.shard_count > 1 else ""
+        return f"{self.test_id}{shard} [{self.browser}]"
+
+
+class Outcome(NamedTuple):
+    """
+    The outcome of a test case or a subTest.
+    """
+
+    job: Job
+    description: str
+    status: str
+    duration: float
+    details: str = ""
+
+
+class JobResult(NamedTuple):
+    """
+    The outcomes of a job, and how long the job took.
+    The attempt is 1 for the first time the job ran, and goes up each time it is retried.
+    """
+
+    job: Job
+    outcomes: List[Outcome]
+    duration: float
+    attempt: int = 1
+
+
+class _RecordingResult(unittest.TestResult):
+    """
+    This records the outcome of every test case and subTest, in a form that can be sent back from
+    a worker process.
+    """
+
+    def __init__(self, job: Job) -> None:
+        super().__init__()
+        self.job = job
+        self.outcomes: List[Outcome] = []
+        self._started = 0.0
+        self._subtest_started = 0.0
+
+    def startTest(self, test: unittest.TestCase) -> None:
+        super().startTest(test)
+        self._started = self._subtest_started = time.perf_counter()
+
+    def _record(self, test: unittest.TestCase, status: str, err: Any = None) -> None:
+        now = time.perf_counter()
+        started = self._started
+        if isinstance(test, unittest.case._SubTest):  # pylint: disable=protected-access
+            started, self._subtest_started = self._subtest_started, now
+        details = self._exc_info_to_string(err, test) if isinstance(err, tuple) else err
+        self.outcomes.append(
+            Outcome(self.job, _describe(test), status, now - started, details or "")
+        )
+
+    def addSuccess(self, test: unittest.TestCase) -> None:
+        super().addSuccess(test)
+        self._record(test, "pass")
+
+    def addFailure(self, test: unittest.TestCase, err: Any) -> None:
+        super().addFailure(test, err)
+        self._record(test, "fail", err)
+
+    def addError(self, test: unittest.TestCase, err: Any) -> None:
+        super().addError(test, err)
+        self._record(test, "error", err)
+
+    def addSkip(self, test: unittest.TestCase, reason: str) -> None:
+        super().addSkip(test, reason)
+        self._record(test, "skip", reason)
+
+    def addExpectedFailure(self, test: unittest.TestCase, err: Any) -> None:
+        super().addExpectedFailure(test, err)
+        self._record(test, "expected failure")
+
+    def addUnexpectedSuccess(self, test: unittest.TestCase) -> None:
+        super().addUnexpectedSuccess(test)
+        self._record(test, "unexpected success")
+
+    def addSubTest(self, test: unittest.TestCase, subtest: unittest.TestCase, err: Any) -> None:
+        super().addSubTest(test, subtest, err)
+        if err is None:
+            self._record(subtest, "pass")
+        elif issubclass(err[0], test.failureException):
+            self._record(subtest, "fail", err)
+        else:
+            self._record(subtest, "error", err)
+
+
+def _describe(test: unittest.TestCase) -> str:
+    """
+    Returns the description unittest would use for the test, without the docstring.
+    """
+    if isinstance(test, unittest.case._SubTest):  # pylint: disable=protected-access
+        return f"{test.test_case.id()} {test._subDescription()}"  # pylint: disable=protected-access
+    return test.id()
+
+
+def _iterate_tests(suite: unittest.TestSuite) -> Iterator[unittest.TestCase]:
+    for test in suite:
+        if isinstance(test, unittest.TestSuite):
+            yield from _iterate_tests(test)
+        else:
+            yield test
+
+
+def discover_jobs(start_dir: str, pattern: str, browsers: List[str]) -> List[Job]:
+    """
+    Find all of the test cases, and create the jobs to run them in each of the `browsers`.
+    Test cases that don't use a browser are only run once, in the first of the `browsers`.
+    """
+    suite = unittest.defaultTestLoader.discover(start_dir, pattern=pattern)
+    jobs = []
+    for test in _iterate_tests(suite):
+        test_method = getattr(test, test._testMethodName, None)  # pylint: disable=protected-access
+        shard_count = getattr(test_method, "subtest_shards", 1)
+        for browser in browsers if getattr(test, "uses_browser", True) else browsers[:1]:
+            for shard_index in range(shard_count):
+                jobs.append(Job(browser, test.id(), shard_index, shard_count))
+    return jobs
+
+
+def _seed_stand_in_users(start_dir: str, pattern: str) -> None:
+    """
+    Start the stand-in server in this process, so that all of the workers share it, and create the
+    users the test classes need.
+    """
+    # pylint: disable=import-outside-toplevel
+    from buggy_cars_testing import stand_in_server
+
+    server = stand_in_server.ensure_running()
+    for test in _iterate_tests(unittest.defaultTestLoader.discover(start_dir, pattern=pattern)):
+        for username, password in getattr(test, "stand_in_users", {}).items():
+            server.state.add_user(username, password)
+    # The workers are started after this, so they use the stand-in server through its URL.
+    os.environ[SERVER_ENV_VAR] = server.url
+
+
+def _init_worker(browser: str) -> None:
+    os.environ[BROWSER_TYPE_ENV_VAR] = browser
+
+
+def _run_job(job: Job) -> JobResult:
+    """
+    Run a job in a worker process.
+    """
+    start = time.perf_counter()
+    if job.shard_count > 1:
+        os.environ[SUBTEST_SHARD_ENV_VAR] = f"{job.shard_index}/{job.shard_count}"
+    else:
+        os.environ.pop(SUBTEST_SHARD_ENV_VAR, None)
+
+    result = _RecordingResult(job)
+    try:
+        # The test case is put in a suite so that setUpClass and tearDownClass are run.
+        test = unittest.defaultTestLoader.loadTestsFromName(job.test_id)
+        unittest.TestSuite([test]).run(result)
+    except Exception:  # pylint: disable=broad-except
+        outcome = Outcome(job, job.test_id, "error", 0.0, traceback.format_exc())
+        return JobResult(job, [outcome], time.perf_counter() - start)
+    return JobResult(job, result.outcomes, time.perf_counter() - start)
+
+
+def order_longest_first(
+    jobs: List[Job], durations: Dict[results_history.JobKey, float]
+) -> List[Job]:
+    """
+    Returns the jobs in the order they should start, so that the run finishes as soon as possible:
+    the longest first, using their `durations` in previous runs. Jobs that haven't run before are
+    assumed to be as long as the longest job, so they don't hold up the end of the run.
+    """
+    longest = max(durations.values(), default=0.0)
+    return sorted(jobs, key=lambda job: durations.get(_job_key(job), longest), reverse=True)
+
+
+def _job_key(job: Job) -> results_history.JobKey:
+    return (job.test_id, job.browser, job.shard_index, job.shard_count)
+
+
+def run_jobs(jobs: List[Job], workers: int) -> Tuple[List[JobResult], float]:
+    """
+    Run the jobs, using `workers` processes per browser.
+    Returns the result of each job, and the total time taken.
+    """
+    start = time.perf_counter()
+    context = multiprocessing.get_context("spawn")
+    executors: Dict[str, ProcessPoolExecutor] = {}
+    futures: List[Tuple[Job, Future]] = []
+    try:
+        for job in jobs:
+            if job.browser not in executors:
+                executors[job.browser] = ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=context,
+                    initializer=_init_worker,
+                    initargs=(job.browser,),
+                )
+            futures.append((job, executors[job.browser].submit(_run_job, job)))
+
+        results: List[JobResult] = []
+        for job, future in futures:
+            try:
+                results.append(future.result())
+            except Exception:  # pylint: disable=broad-except
+                # The worker process died, e.g. it was killed.
+                outcome = Outcome(job, job.test_id, "error", 0.0, traceback.format_exc())
+                results.append(JobResult(job, [outcome], 0.0))
+    finally:
+        for executor in executors.values():
+            executor.shutdown()
+    return results, time.perf_counter() - start
+
+
+def run_jobs_with_retries(
+    jobs: List[Job], workers: int, retries: int
+) -> Tuple[List[JobResult], List[JobResult], float]:
+    """
+    Run the jobs, and run the jobs that failed again, up to `retries` times.
+    Returns the last attempt at each job, every attempt, and the total time taken.
+    """
+    results, wall_time = run_jobs(jobs, workers)
+    attempts = list(results)
+    for attempt in range(2, retries + 2):
+        failed = [result.job for result in results if has_failures([result])]
+        if not failed:
+            break
+        retried, retry_time = run_jobs(failed, workers)
+        wall_time += retry_time
+        retried_by_job = {result.job: result._replace(attempt=attempt) for result in retried}
+        attempts.extend(retried_by_job.values())
+        results = [retried_by_job.get(result.job, result) for result in results]
+    return results, attempts, wall_time
+
+
+def has_failures(results: List[JobResult]) -> bool:
+    """
+    Returns True if any of the test cases or subTests failed.
+    """
+    return any(
+        outcome.status in ("fail", "error") for result in results for outcome in result.outcomes
+    )
+
+
+def record_history(
+    history: results_history.History,
+    attempts: List[JobResult],
+    wall_time: float,
+    arguments: str,
+) -> None:
+    """
+    Record every attempt at every job, and the outcomes of their test cases and subTests.
+    """
+    history.record_run(
+        [
+            results_history.RecordedJob(
+                *_job_key(result.job),
+                result.attempt,
+                "fail" if has_failures([result]) else "pass",
+                result.duration,
+            )
+            for result in attempts
+        ],
+        [
+            results_history.RecordedOutcome(
+                result.job.test_id,
+                outcome.description,
+                result.job.browser,
+                result.attempt,
+                outcome.status,
+                outcome.duration,
+                outcome.details,
+            )
+            for result in attempts
+            for outcome in result.outcomes
+        ],
+        wall_time,
+        arguments,
+    )
+
+
+def format_report(results: List[JobResult], wall_time: float) -> str:
+    """
+    Returns a report of the results of every job, laid out like the unittest report.
+    """
+    outcomes = [outcome for result in results for outcome in result.outcomes]
+    report = io.StringIO()
+    for outcome in outcomes:
+        if outcome.status in ("fail", "error"):
+            report.write(f"{SEPARATOR_BOLD}\n{outcome.status.upper()}: {outcome.description} ")
+            report.write(f"[{outcome.job.browser}]\n{SEPARATOR}\n{outcome.details}\n")
+
+    report.write(f"{SEPARATOR}\n")
+    report.write(
+        f"Ran {len(results)} jobs in {wall_time:.3f}s "
+        f"(sum of job times {sum(result.duration for result in results):.3f}s)\n"
+    )
+    slowest = max(results, key=lambda result: result.duration, default=None)
+    if slowest:
+        report.write(f"Slowest job: {slowest.job.name} in {slowest.duration:.3f}s\n")
+
+    for browser in sorted({outcome.job.browser for outcome in outcomes}):
+        counts: Dict[str, int] = {}
+        for outcome in outcomes:
+            if outcome.job.browser == browser:
+                counts[outcome.status] = counts.get(outcome.status, 0) + 1
+        summary = ", ".join(f"{status}={count}" for status, count in sorted(counts.items()))
+        report.write(f"{browser}: {summary}\n")
+
+    passed_on_retry = [
+        f"{result.job.name} (attempt {result.attempt})"
+        for result in results
+        if result.attempt > 1 and not has_failures([result])
+    ]
+    if passed_on_retry:
+        report.write("\nPassed after being retried (flaky):\n" + "\n".join(passed_on_retry) + "\n")
+
+    if has_failures(results):
+        failures = sum(outcome.status == "fail" for outcome in outcomes)
+        errors = sum(outcome.status == "error" for outcome in outcomes)
+        report.write(f"\nFAILED (failures={failures}, errors={errors})\n")
+    else:
+        report.write("\nOK\n")
+    return report.getvalue()
+
+
+def main() -> int:
+    """
+    Run the tests and print the merged report.
+    Returns the exit code, which is non-zero if any test failed.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--browsers", nargs="+", choices=BROWSERS, default=BROWSERS, help="the browser matrix"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=4, help="the number of worker processes per browser"
+    )
+    parser.add_argument("--start-dir", default=".")
+    parser.add_argument("--pattern", default="tests*.py")
+    parser.add_argument(
+        "--retries", type=int, default=0, help="how many times to run failed jobs again"
+    )
+    parser.add_argument(
+        "--failed-only", action="store_true", help="only run the jobs that failed in the last run"
+    )
+    parser.add_argument("--history", default=HISTORY_DB, help="the history database")
+    parser.add_argument(
+        "--no-history", action="store_true", help="don't read or record the history of runs"
+    )
+    args = parser.parse_args()
+    history = None if args.no_history else results_history.History(args.history)
+
+    if USE_LOCAL_SERVER:
+        _seed_stand_in_users(args.start_dir, args.pattern)
+
+    if TRACE_DIR:
+        tracing.clear_traces(TRACE_DIR)
+    if PAGE_PERFORMANCE_DIR:
+        page_performance.clear_reports(PAGE_PERFORMANCE_DIR)
+    jobs = discover_jobs(args.start_dir, args.pattern, args.browsers)
+    if history:
+        if args.failed_only:
+            failed = history.last_failures()
+            jobs = [job for job in jobs if _job_key(job) in failed]
+            if not jobs:
+                print("Nothing failed in the last run", file=sys.stderr)
+                return 0
+        jobs = order_longest_first(jobs, history.expected_durations())
+    elif args.failed_only:
+        parser.error("--failed-only needs the history of runs")
+
+    results, attempts, wall_time = run_jobs_with_retries(jobs, args.workers, args.retries)
+    print(format_report(results, wall_time), file=sys.stderr)
+    if history:
+        record_history(history, attempts, wall_time, " ".join(sys.argv[1:]))
+        history.close()
+    if TRACE_DIR:
+        events = tracing.merge_traces(TRACE_DIR)
+        path = os.path.join(TRACE_DIR, tracing.MERGED_FILE_NAME)
+        print(
+            f"Slowest steps (trace written to {path}):\n{tracing.summarize(events)}",
+            file=sys.stderr,
+        )
+    if PAGE_PERFORMANCE_DIR:
+        pages = page_performance.merge_reports(PAGE_PERFORMANCE_DIR)
+        path = os.path.join(PAGE_PERFORMANCE_DIR, page_performance.MERGED_FILE_NAME)
+        print(
+            f"\nPage performance (written to {path}):\n{page_performance.format_report(pages)}",
+            file=sys.stderr,
+        )
+    return 1 if has_failures(results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
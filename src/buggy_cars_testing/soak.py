@@ -0,0 +1,269 @@
+"""
+This contains the soak mode, which runs test classes over and over to find out whether the browsers
+leak memory or file descriptors over a long run.
+
+While the tests run, the memory (RSS), CPU time and open file descriptors of this process, the
+browser drivers it started, and the browsers they started are sampled from `/proc` (so this only
+runs on Linux). At the end, a line is fitted to each of them over time, and growth that goes up
+steadily is reported as a leak. The samples are written to a report, to be plotted.
+
+The browsers in the pool are normally replaced after `DRIVER_MAX_USES` test cases, which would hide
+a leak in a long-running browser and add the start up of new ones to the samples, so they are kept
+for the whole run.
+
+Run it from the `src` directory, e.g.
+`BUGGY_CARS_TEST_SERVER=local python3 -m buggy_cars_testing.soak
+buggy_cars_testing.tests_view_rankings --duration 3600`.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+import unittest
+from typing import Any, Dict, List, Optional, Tuple
+
+from buggy_cars_testing.constants import (
+    SOAK_LEAK_MIN_CORRELATION,
+    SOAK_MAX_FDS_SLOPE,
+    SOAK_MAX_RSS_SLOPE,
+    SOAK_REPORT,
+    SOAK_SAMPLE_INTERVAL,
+)
+from buggy_cars_testing.driver_pool import DRIVER_POOL
+
+# The groups of processes that are sampled.
+GROUPS = ("python", "driver", "browser")
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+
+def _read_stat(pid: int) -> Optional[Tuple[str, int, float, int]]:
+    """
+    Returns the name, parent PID, CPU time in seconds, and RSS in bytes of a process, or None if it
+    has exited.
+    """
+    try:
+        with open(f"/proc/{pid}/stat", encoding="utf-8") as stat_file:
+            stat = stat_file.read()
+    except OSError:
+        return None
+    # The name is in brackets and can contain spaces, so the fields are split after it.
+    name = stat[stat.index("(") + 1 : stat.rindex(")")]
+    fields = stat[stat.rindex(")") + 2 :].split()
+    parent_pid = int(fields[1])
+    cpu_time = (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+    rss = int(fields[21]) * PAGE_SIZE
+    return name, parent_pid, cpu_time, rss
+
+
+def _count_fds(pid: int) -> int:
+    try:
+        return len(os.listdir(f"/proc/{pid}/fd"))
+    except OSError:
+        return 0
+
+
+def _group(name: str, depth: int) -> str:
+    if depth == 0:
+        return "python"
+    if "driver" in name:
+        return "driver"
+    return "browser"
+
+
+def sample_process_tree(root_pid: int) -> Dict[str, Any]:
+    """
+    Returns the total RSS (MB), CPU time (seconds), file descriptors and number of processes of
+    each group of processes in the tree under `root_pid`.
+    """
+    stats = {}
+    children: Dict[int, List[int]] = {}
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            stat = _read_stat(int(entry))
+            if stat:
+                stats[int(entry)] = stat
+                children.setdefault(stat[1], []).append(int(entry))
+
+    sample: Dict[str, Any] = {
+        f"{group}_{field}": 0 for group in GROUPS for field in ("rss", "cpu", "fds", "processes")
+    }
+    # Browsers are found through their drivers, and their helper processes through the browser, so
+    # a process is in the group of the closest driver or browser above it.
+    pending = [(root_pid, 0, "")]
+    while pending:
+        pid, depth, parent_group = pending.pop()
+        if pid not in stats:
+            continue
+        name, _, cpu_time, rss = stats[pid]
+        group = "browser" if parent_group == "browser" else _group(name, depth)
+        sample[f"{group}_rss"] += rss / 2**20
+        sample[f"{group}_cpu"] += cpu_time
+        sample[f"{group}_fds"] += _count_fds(pid)
+        sample[f"{group}_processes"] += 1
+        pending.extend((child, depth + 1, group) for child in children.get(pid, []))
+    return sample
+
+
+class Sampler:
+    """
+    This samples the process tree of this process in a background thread.
+    """
+
+    def __init__(self, interval: float = SOAK_SAMPLE_INTERVAL) -> None:
+        self.interval = interval
+        self.samples: List[Dict[str, Any]] = []
+        self.iteration = 0
+        self._start = time.monotonic()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self) -> "Sampler":
+        """
+        Start sampling.
+        """
+        self._start = time.monotonic()
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """
+        Stop sampling, after taking a last sample.
+        """
+        self._stop.set()
+        self._thread.join()
+        self.sample()
+
+    def sample(self) -> None:
+        """
+        Take a sample now.
+        """
+        sample = sample_process_tree(os.getpid())
+        sample["time"] = time.monotonic() - self._start
+        sample["iteration"] = self.iteration
+        self.samples.append(sample)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.sample()
+            self._stop.wait(self.interval)
+
+
+def fit_trend(samples: List[Dict[str, Any]], field: str) -> Dict[str, float]:
+    """
+    Returns the slope per hour of the line fitted to the `field` over time, and how well the line
+    fits (the correlation, where 1 is growth that goes up steadily).
+    """
+    times = [sample["time"] / 3600 for sample in samples]
+    values = [sample[field] for sample in samples]
+    if len(samples) < 3 or len(set(times)) < 2 or len(set(values)) < 2:
+        return {"slope": 0.0, "correlation": 0.0}
+    slope, _ = statistics.linear_regression(times, values)
+    return {"slope": slope, "correlation": statistics.correlation(times, values)}
+
+
+def find_leaks(
+    samples: List[Dict[str, Any]],
+    max_rss_slope: float = SOAK_MAX_RSS_SLOPE,
+    max_fds_slope: float = SOAK_MAX_FDS_SLOPE,
+) -> Tuple[Dict[str, Dict[str, float]], List[str]]:
+    """
+    Returns the trend of the RSS and file descriptors of each group, and a description of each
+    trend that grows faster than the maximum slope per hour and goes up steadily.
+    """
+    trends = {}
+    leaks = []
+    for group in GROUPS:
+        for field, maximum, unit in (("rss", max_rss_slope, "MB"), ("fds", max_fds_slope, "fds")):
+            trend = fit_trend(samples, f"{group}_{field}")
+            trends[f"{group}_{field}"] = trend
+            if trend["slope"] > maximum and trend["correlation"] >= SOAK_LEAK_MIN_CORRELATION:
+                leaks.append(
+                    f"{group} {field} grows by {trend['slope']:.1f} {unit}/hour "
+                    f"(correlation {trend['correlation']:.2f})"
+                )
+    return trends, leaks
+
+
+def write_report(path: str, report: Dict[str, Any]) -> None:
+    """
+    Write the report as JSON, and the samples as CSV next to it for plotting.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as report_file:
+        json.dump(report, report_file, indent=2)
+    samples = report["samples"]
+    if samples:
+        columns = list(samples[0])
+        with open(os.path.splitext(path)[0] + ".csv", "w", encoding="utf-8") as csv_file:
+            csv_file.write(",".join(columns) + "\n")
+            for sample in samples:
+                csv_file.write(",".join(str(sample[column]) for column in columns) + "\n")
+
+
+def main() -> int:
+    """
+    Run the test classes over and over while sampling, and write the report.
+    Returns the exit code, which is non-zero if a leak was found.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("tests", nargs="+", help="test modules, classes or cases to run")
+    parser.add_argument("--duration", type=float, default=600, help="seconds to run for")
+    parser.add_argument("--iterations", type=int, help="stop after this many runs of the tests")
+    parser.add_argument("--interval", type=float, default=SOAK_SAMPLE_INTERVAL)
+    parser.add_argument("--report", default=SOAK_REPORT)
+    parser.add_argument("--max-rss-slope", type=float, default=SOAK_MAX_RSS_SLOPE)
+    parser.add_argument("--max-fds-slope", type=float, default=SOAK_MAX_FDS_SLOPE)
+    args = parser.parse_args()
+    if not os.path.isdir("/proc"):
+        parser.error("the soak mode needs /proc to sample the processes, so only runs on Linux")
+
+    # Browsers are only closed if they stop responding, or when the run ends.
+    DRIVER_POOL.max_uses = sys.maxsize
+    sampler = Sampler(args.interval).start()
+    start = time.monotonic()
+    iterations: List[Dict[str, Any]] = []
+    try:
+        while time.monotonic() - start < args.duration and (
+            args.iterations is None or len(iterations) < args.iterations
+        ):
+            suite = unittest.defaultTestLoader.loadTestsFromNames(args.tests)
+            result = unittest.TestResult()
+            iteration_start = time.monotonic()
+            suite.run(result)
+            iterations.append(
+                {
+                    "tests": result.testsRun,
+                    "failures": len(result.failures),
+                    "errors": len(result.errors),
+                    "duration": time.monotonic() - iteration_start,
+                }
+            )
+            sampler.iteration = len(iterations)
+            print(
+                f"Iteration {len(iterations)}: {result.testsRun} tests, "
+                f"{len(result.failures)} failures, {len(result.errors)} errors",
+                file=sys.stderr,
+            )
+    finally:
+        sampler.stop()
+
+    trends, leaks = find_leaks(sampler.samples, args.max_rss_slope, args.max_fds_slope)
+    write_report(
+        args.report,
+        {"iterations": iterations, "trends": trends, "leaks": leaks, "samples": sampler.samples},
+    )
+    for name, trend in trends.items():
+        print(f"{name:<18} {trend['slope']:>10.2f}/hour  correlation {trend['correlation']:.2f}")
+    print(f"Wrote the report to {args.report}")
+    if leaks:
+        print("\nPossible leaks:\n" + "\n".join(leaks), file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,800 @@
+"""
+This contains a local stand-in server for the Buggy Cars website and API.
+
+It implements the API endpoints and the minimal web pages that the tests use, so the tests can run
+offline. Run it on its own with `python3 -m buggy_cars_testing.stand_in_server`, or set
+`BUGGY_CARS_TEST_SERVER=local` to have the tests start it in the test process.
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import random
+import string
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, NamedTuple, Optional, Set, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from buggy_cars_testing.constants import (
+    STAND_IN_API_PATH,
+    STAND_IN_HOST,
+    STAND_IN_LATENCY,
+    STAND_IN_MODEL_COUNT,
+    STAND_IN_PAGE_SIZE,
+    STAND_IN_PORT,
+)
+
+TOKEN_LIFETIME = 3600
+# Tokens are signed rather than stored, so they stay valid when the stand-in server is restarted,
+# like the tokens of the live API.
+TOKEN_SECRET = b"buggy-cars-stand-in"
+ID_CHARS = string.digits + "abcdefghijklmnopqrstuv"
+ID_LENGTH = 20
+
+MAKES = ["Alfa Romeo", "Bugatti", "Lamborghini", "Pagani", "Koenigsegg", "Rimac", "Lotus"]
+MODEL_NAMES = ["Veyron", "Diablo", "Zonda", "Agera", "Nevera", "Elise", "Giulia", "Chiron"]
+GENDERS = ["Male", "Female"]
+HOBBIES = [
+    "Hiking",
+    "Reading",
+    "Working",
+    "Learning",
+    "Video Games",
+    "Biking",
+    "Knitting",
+    "Jogging",
+]
+PROFILE_FIELDS = ["firstName", "lastName", "gender", "age", "address", "phone", "hobby"]
+
+ApiResponse = Tuple[int, Any]
+
+
+class ApiRequest(NamedTuple):
+    """
+    An API request, with the user of its token (if the token is valid) and the model ID in its path
+    (if there is one).
+    """
+
+    username: Optional[str]
+    model_id: str
+    query: Dict[str, List[str]]
+    body: Any
+
+
+def _match_route(pattern: Tuple[str, ...], parts: List[str]) -> Optional[List[str]]:
+    """
+    Returns the parts of the path matched by the "*" parts of the route `pattern`, or None if the
+    path doesn't match the route.
+    """
+    if len(pattern) != len(parts):
+        return None
+    matched = []
+    for expected, part in zip(pattern, parts):
+        if expected == "*":
+            matched.append(part)
+        elif expected != part:
+            return None
+    return matched
+
+
+class StandInState:
+    """
+    This holds the data served by the stand-in server: the car models, users, tokens and votes.
+    """
+
+    # The API routes, as the method and the parts of the path, and the method that handles them. A
+    # "*" part of the path is the model ID.
+    ROUTES = {
+        ("POST", ("oauth", "token")): "_issue_token",
+        ("POST", ("users",)): "_register_user",
+        ("GET", ("users", "profile")): "_get_profile",
+        ("PUT", ("users", "profile")): "_update_profile",
+        ("GET", ("models",)): "_get_models_page",
+        ("GET", ("models", "*")): "_get_model",
+        ("POST", ("models", "*", "vote")): "_vote",
+    }
+
+    def __init__(self, model_count: int, page_size: int, seed: int = 0) -> None:
+        self.lock = threading.RLock()
+        self.page_size = page_size
+        self.users: Dict[str, Dict[str, str]] = {}
+        self.votes: Dict[str, Set[str]] = {}
+        self.comments: Dict[str, List[Dict[str, str]]] = {}
+        self.models: List[Dict[str, Any]] = []
+
+        rng = random.Random(seed)
+        make_ids = {make: self._generate_id(rng) for make in MAKES}
+        for index in range(model_count):
+            make = MAKES[index % len(MAKES)]
+            model_id = f"{make_ids[make]}|{self._generate_id(rng)}"
+            self.models.append(
+                {
+                    "id": model_id,
+                    "makeId": make_ids[make],
+                    "make": make,
+                    "name": f"{rng.choice(MODEL_NAMES)} {index + 1}",
+                    "description": f"The number {index + 1} car from {make}.",
+                    "engineVol": round(rng.uniform(1.0, 8.0), 1),
+                    "maxSpeed": rng.randrange(180, 420),
+                }
+            )
+            self.votes[model_id] = set()
+            self.comments[model_id] = []
+        self.models_by_id = {model["id"]: model for model in self.models}
+
+    @staticmethod
+    def _generate_id(rng: random.Random) -> str:
+        """
+        Generate an ID that looks like the IDs used by the live API.
+        """
+        return "".join(rng.choice(ID_CHARS) for _ in range(ID_LENGTH))
+
+    def add_user(
+        self, username: str, password: str, first_name: str = "", last_name: str = ""
+    ) -> None:
+        """
+        Add a user if there isn't already a user with that `username`.
+        """
+        with self.lock:
+            self.users.setdefault(
+                username,
+                {
+                    "username": username,
+                    "password": password,
+                    "firstName": first_name or username.capitalize(),
+                    "lastName": last_name or "Tester",
+                    "gender": "",
+                    "age": "",
+                    "address": "",
+                    "phone": "",
+                    "hobby": "",
+                },
+            )
+
+    def handle_api(
+        self, method: str, path: str, query: Dict[str, List[str]], token: str, body: Any
+    ) -> ApiResponse:
+        """
+        Handle an API request and return the status code and the JSON response.
+        """
+        parts = [unquote(part) for part in path.strip("/").split("/")]
+        with self.lock:
+            username = self._get_user_from_token(token)
+            for (route_method, pattern), handler in self.ROUTES.items():
+                matched = _match_route(pattern, parts)
+                if route_method == method and matched is not None:
+                    request = ApiRequest(username, "".join(matched), query, body)
+                    return getattr(self, handler)(request)
+        return 404, {"message": "Not Found"}
+
+    def _get_user_from_token(self, token: str) -> Optional[str]:
+        """
+        Return the username that the bearer `token` belongs to, if the token is still valid.
+        """
+        try:
+            username, expiry, signature = token.split(" ")[-1].rsplit(".", 2)
+        except ValueError:
+            return None
+        if not hmac.compare_digest(signature, _sign(f"{username}.{expiry}")):
+            return None
+        if int(expiry) < time.time() or username not in self.users:
+            return None
+        return username
+
+    def _issue_token(self, request: ApiRequest) -> ApiResponse:
+        body = request.body
+        user = self.users.get(body.get("username", ""))
+        if body.get("grant_type") != "password" or not user:
+            return 400, {"error": "invalid_grant"}
+        if user["password"] != body.get("password"):
+            return 400, {"error": "invalid_grant"}
+        claims = f"{user['username']}.{int(time.time()) + TOKEN_LIFETIME}"
+        access_token = f"{claims}.{_sign(claims)}"
+        return 200, {
+            "access_token": access_token,
+            "token_type": "Bearer",
+            "expires_in": TOKEN_LIFETIME,
+        }
+
+    def _register_user(self, request: ApiRequest) -> ApiResponse:
+        body = request.body
+        username = body.get("username", "")
+        password = body.get("password", "")
+        if not username:
+            return 400, {"message": "InvalidParameterException: Username cannot be empty"}
+        if username in self.users:
+            return 400, {"message": "UsernameExistsException: User already exists"}
+        if password != body.get("confirmPassword", password):
+            return 400, {"message": "Passwords do not match"}
+        if not _is_valid_password(password):
+            return 400, {
+                "message": "InvalidPasswordException: Password did not conform with policy"
+            }
+        self.add_user(username, password, body.get("firstName", ""), body.get("lastName", ""))
+        return 201, {}
+
+    def _profile(self, username: str) -> Dict[str, str]:
+        user = self.users[username]
+        return {field: user[field] for field in ["username"] + PROFILE_FIELDS}
+
+    def _get_profile(self, request: ApiRequest) -> ApiResponse:
+        if request.username is None:
+            return 401, {"message": "Unauthorized"}
+        return 200, self._profile(request.username)
+
+    def _update_profile(self, request: ApiRequest) -> ApiResponse:
+        if request.username is None:
+            return 401, {"message": "Unauthorized"}
+        user = self.users[request.username]
+        for field in PROFILE_FIELDS:
+            if field in request.body:
+                user[field] = request.body[field]
+        return 200, self._profile(request.username)
+
+    def _ranked_models(self) -> List[Dict[str, Any]]:
+        """
+        Return the models ordered by their rank, which is based on the amount of votes.
+        """
+        ranked = sorted(
+            enumerate(self.models), key=lambda entry: (-len(self.votes[entry[1]["id"]]), entry[0])
+        )
+        return [model for _, model in ranked]
+
+    def _get_models_page(self, request: ApiRequest) -> ApiResponse:
+        try:
+            page = int(request.query.get("page", ["1"])[0])
+        except ValueError:
+            return 400, {"message": "Invalid page"}
+        total_pages = max(1, -(-len(self.models) // self.page_size))
+        start = (page - 1) * self.page_size
+        ranked = self._ranked_models()
+        models = [
+            {
+                "id": model["id"],
+                "makeId": model["makeId"],
+                "make": model["make"],
+                "name": model["name"],
+                "rank": start + offset + 1,
+                "votes": len(self.votes[model["id"]]),
+                "comments": len(self.comments[model["id"]]),
+            }
+            for offset, model in enumerate(ranked[start : start + self.page_size])
+        ]
+        return 200, {"models": models if page >= 1 else [], "totalPages": total_pages, "page": page}
+
+    def _get_model(self, request: ApiRequest) -> ApiResponse:
+        model_id, username = request.model_id, request.username
+        if model_id not in self.models_by_id:
+            return 404, {"message": "Model not found"}
+        model = dict(self.models_by_id[model_id])
+        model["votes"] = len(self.votes[model_id])
+        model["canVote"] = username is not None and username not in self.votes[model_id]
+        model["comments"] = list(self.comments[model_id])
+        return 200, model
+
+    def _vote(self, request: ApiRequest) -> ApiResponse:
+        model_id, username = request.model_id, request.username
+        if username is None:
+            return 401, {"message": "Unauthorized"}
+        if model_id not in self.models_by_id:
+            return 404, {"message": "Model not found"}
+        if username in self.votes[model_id]:
+            return 400, {"message": "Already voted"}
+        self.votes[model_id].add(username)
+        comment = request.body.get("comment", "")
+        if comment:
+            user = self.users[username]
+            self.comments[model_id].insert(
+                0,
+                {
+                    "user": f"{user['firstName']} {user['lastName']}",
+                    "text": comment,
+                    "datePosted": datetime.now(timezone.utc).isoformat(),
+                },
+            )
+        return 200, {}
+
+
+def _sign(claims: str) -> str:
+    return hmac.new(TOKEN_SECRET, claims.encode(), hashlib.sha256).hexdigest()
+
+
+def _is_valid_password(password: str) -> bool:
+    """
+    Check the password against the same policy as the live website: at least 8 characters with
+    lowercase, uppercase, digits and symbols.
+    """
+    return (
+        len(password) >= 8
+        and any(char in string.ascii_lowercase for char in password)
+        and any(char in string.ascii_uppercase for char in password)
+        and any(char in string.digits for char in password)
+        and any(char in string.punctuation for char in password)
+    )
+
+
+class _StandInHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # With the default listen backlog of 5, connections beyond it wait for a SYN retry of a second
+    # or more when many users connect at once.
+    request_queue_size = 128
+
+    def __init__(self, address: Tuple[str, int], state: StandInState, latency: float) -> None:
+        super().__init__(address, _StandInRequestHandler)
+        self.state = state
+        self.latency = latency
+
+
+class _StandInRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Keep-alive connections stall on delayed ACKs unless Nagle's algorithm is disabled.
+    disable_nagle_algorithm = True
+    server: _StandInHTTPServer
+
+    def do_GET(self) -> None:  # pylint: disable=invalid-name
+        """
+        Handle GET requests.
+        """
+        self._dispatch("GET")
+
+    def do_POST(self) -> None:  # pylint: disable=invalid-name
+        """
+        Handle POST requests.
+        """
+        self._dispatch("POST")
+
+    def do_PUT(self) -> None:  # pylint: disable=invalid-name
+        """
+        Handle PUT requests.
+        """
+        self._dispatch("PUT")
+
+    def log_message(self, format: str, *args: Any) -> None:  # pylint: disable=redefined-builtin
+        """
+        Don't log every request, as it clutters the test output.
+        """
+
+    def _dispatch(self, method: str) -> None:
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        url = urlsplit(self.path)
+        api_prefix = "/" + STAND_IN_API_PATH
+        if url.path.startswith(api_prefix):
+            status, response = self.server.state.handle_api(
+                method,
+                url.path[len(api_prefix) :],
+                parse_qs(url.query),
+                self.headers.get("authorization", ""),
+                self._read_body(),
+            )
+            self._send(status, "application/json", json.dumps(response).encode())
+        elif method == "GET":
+            self._read_body()
+            self._send(200, "text/html; charset=utf-8", PAGE_HTML.encode())
+        else:
+            self._read_body()
+            self._send(405, "text/plain", b"Method Not Allowed")
+
+    def _read_body(self) -> Dict[str, Any]:
+        """
+        Read the request body, which may be either JSON or form encoded.
+        """
+        length = int(self.headers.get("content-length") or 0)
+        raw_body = self.rfile.read(length).decode() if length else ""
+        if not raw_body:
+            return {}
+        if "application/x-www-form-urlencoded" in self.headers.get("content-type", ""):
+            return {key: values[0] for key, values in parse_qs(raw_body).items()}
+        try:
+            return json.loads(raw_body)
+        except json.JSONDecodeError:
+            return {}
+
+    def _send(self, status: int, content_type: str, body: bytes) -> None:
+        self.send_response(status)
+        self.send_header("content-type", content_type)
+        self.send_header("content-length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class StandInServer:
+    """
+    This runs the stand-in website and API on a background thread.
+    """
+
+    def __init__(
+        self,
+        host: str = STAND_IN_HOST,
+        port: int = STAND_IN_PORT,
+        model_count: int = STAND_IN_MODEL_COUNT,
+        page_size: int = STAND_IN_PAGE_SIZE,
+        latency: float = STAND_IN_LATENCY,
+    ) -> None:
+        self.state = StandInState(model_count, page_size)
+        self._httpd = _StandInHTTPServer((host, port), self.state, latency)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """
+        The base URL of the website.
+        """
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    @property
+    def api_url(self) -> str:
+        """
+        The base URL of the API.
+        """
+        return self.url + STAND_IN_API_PATH
+
+    @property
+    def listen_backlog(self) -> int:
+        """
+        The number of connections that can wait to be accepted before new ones have to be retried.
+        """
+        return self._httpd.request_queue_size
+
+    def start(self) -> "StandInServer":
+        """
+        Start serving requests on a background thread.
+        """
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """
+        Stop serving requests.
+        """
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+# The stand-in server started by `ensure_running` in this process.
+RUNNING_SERVER: Optional[StandInServer] = None
+RUNNING_SERVER_LOCK = threading.Lock()
+
+
+def ensure_running(users: Optional[Dict[str, str]] = None) -> StandInServer:
+    """
+    Start the stand-in server for this process if it is not running yet, and make sure that the
+    `users` (a mapping of username to password) exist.
+    """
+    global RUNNING_SERVER  # pylint: disable=global-statement
+    with RUNNING_SERVER_LOCK:
+        if RUNNING_SERVER is None:
+            RUNNING_SERVER = StandInServer().start()
+    for username, password in (users or {}).items():
+        RUNNING_SERVER.state.add_user(username, password)
+    return RUNNING_SERVER
+
+
+PAGE_HTML = (
+    """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Buggy Cars Rating</title>
+<style>
+body { font-family: sans-serif; margin: 0 2em; }
+nav { display: flex; gap: 1em; align-items: center; padding: 1em 0; }
+.alert-success { color: #155724; }
+.alert-danger { color: #721c24; }
+.page-button { position: relative; display: inline-block; }
+.blocker { position: absolute; top: 0; left: 0; right: 0; bottom: 0; z-index: 1; }
+td, th { padding: 0 1em; text-align: left; }
+</style>
+</head>
+<body>
+<nav><a class="navbar-brand" href="/">Buggy Rating</a><span id="nav"></span></nav>
+<main id="app"></main>
+<script>
+const API = "/"""
+    + STAND_IN_API_PATH
+    + """";
+const app = document.getElementById("app");
+const nav = document.getElementById("nav");
+
+function token() {
+  return localStorage.getItem("token");
+}
+
+function esc(text) {
+  return String(text).replace(/[&<>"']/g, (c) => "&#" + c.charCodeAt(0) + ";");
+}
+
+function alertBox(ok, message) {
+  const type = ok ? "alert-success" : "alert-danger";
+  return `<div class="alert ${type}">${esc(message)}</div>`;
+}
+
+function clearAlerts() {
+  document.querySelectorAll(".alert").forEach((alert) => alert.remove());
+}
+
+async function api(method, path, body, form) {
+  const headers = {};
+  let payload;
+  if (token()) headers["authorization"] = token();
+  if (form) {
+    headers["content-type"] = "application/x-www-form-urlencoded";
+    payload = new URLSearchParams(body).toString();
+  } else if (body !== undefined) {
+    headers["content-type"] = "application/json";
+    payload = JSON.stringify(body);
+  }
+  const response = await fetch(API + path, { method, headers, body: payload });
+  return { ok: response.ok, data: await response.json() };
+}
+
+async function renderNav() {
+  if (token()) {
+    const profile = await api("GET", "users/profile");
+    if (!profile.ok) {
+      localStorage.removeItem("token");
+      return renderNav();
+    }
+    nav.innerHTML = `<span class="navbar-text">Hi, ${esc(profile.data.firstName)}</span>
+      <a class="nav-link" id="profile-link" href="/profile">Profile</a>
+      <a class="nav-link" id="logout-link" href="/">Logout</a>`;
+    document.getElementById("logout-link").onclick = (event) => {
+      event.preventDefault();
+      localStorage.removeItem("token");
+      renderNav();
+      route();
+    };
+  } else {
+    nav.innerHTML = `<form id="login-form">
+      <input name="login" placeholder="Login">
+      <input name="password" type="password" placeholder="Password">
+      <button type="submit" class="btn">Login</button></form>`;
+    document.getElementById("login-form").onsubmit = async (event) => {
+      event.preventDefault();
+      const form = event.target;
+      const result = await api(
+        "POST",
+        "oauth/token",
+        {
+          grant_type: "password",
+          username: form.elements.login.value,
+          password: form.elements.password.value,
+        },
+        true
+      );
+      if (result.ok) {
+        localStorage.setItem("token", `${result.data.token_type} ${result.data.access_token}`);
+        await renderNav();
+        route();
+      } else {
+        nav.insertAdjacentHTML("beforeend", alertBox(false, "Invalid username/password"));
+      }
+    };
+  }
+}
+
+function renderHome() {
+  app.innerHTML = `<h2>Buggy Rating</h2>
+    <p><a href="/overall">Overall Rating</a></p>
+    <p><a href="/register">Register</a></p>`;
+}
+
+function renderRegister() {
+  app.innerHTML = `<h2>Register with Buggy Cars Rating</h2>
+    <form id="register-form">
+    <p><label for="username">Login</label> <input id="username"></p>
+    <p><label for="firstName">First Name</label> <input id="firstName"></p>
+    <p><label for="lastName">Last Name</label> <input id="lastName"></p>
+    <p><label for="password">Password</label> <input id="password" type="password"></p>
+    <p><label for="confirmPassword">Confirm Password</label>
+      <input id="confirmPassword" type="password"></p>
+    <button type="submit" class="btn">Register</button></form>`;
+  const form = document.getElementById("register-form");
+  form.onsubmit = async (event) => {
+    event.preventDefault();
+    clearAlerts();
+    const value = (id) => document.getElementById(id).value;
+    const result = await api("POST", "users", {
+      username: value("username"),
+      firstName: value("firstName"),
+      lastName: value("lastName"),
+      password: value("password"),
+      confirmPassword: value("confirmPassword"),
+    });
+    const message = result.ok ? "Registration is successful" : result.data.message;
+    form.insertAdjacentHTML("afterend", alertBox(result.ok, message));
+  };
+}
+
+async function renderProfile() {
+  if (!token()) {
+    app.innerHTML = "<p>You need to be logged in to see this page.</p>";
+    return;
+  }
+  const profile = (await api("GET", "users/profile")).data;
+  const genders = """
+    + json.dumps(GENDERS)
+    + """;
+  const hobbies = """
+    + json.dumps(HOBBIES)
+    + """;
+  app.innerHTML = `<h2>Additional Info</h2>
+    <form id="profile-form">
+    <p><label for="firstName">First Name</label>
+      <input id="firstName" value="${esc(profile.firstName)}"></p>
+    <p><label for="lastName">Last Name</label>
+      <input id="lastName" value="${esc(profile.lastName)}"></p>
+    <p><label for="gender">Gender</label>
+      <input id="gender" list="genders" value="${esc(profile.gender)}">
+      <datalist id="genders">
+      ${genders.map((gender) => `<option value="${esc(gender)}">`).join("")}
+      </datalist></p>
+    <p><label for="age">Age</label> <input id="age" value="${esc(profile.age)}"></p>
+    <p><label for="address">Address</label>
+      <textarea id="address">${esc(profile.address)}</textarea></p>
+    <p><label for="phone">Phone</label> <input id="phone" value="${esc(profile.phone)}"></p>
+    <p><label for="hobby">Hobby</label> <select id="hobby">
+      ${hobbies.map((hobby) => `<option value="${esc(hobby)}">${esc(hobby)}</option>`).join("")}
+      </select></p>
+    <button type="submit" class="btn">Save</button></form>`;
+  document.getElementById("hobby").value = profile.hobby;
+  const form = document.getElementById("profile-form");
+  form.onsubmit = async (event) => {
+    event.preventDefault();
+    clearAlerts();
+    const updated = {};
+    ["firstName", "lastName", "gender", "age", "address", "phone", "hobby"].forEach((id) => {
+      updated[id] = document.getElementById(id).value;
+    });
+    const result = await api("PUT", "users/profile", updated);
+    const message = result.ok ? "The profile has been saved successful" : result.data.message;
+    form.insertAdjacentHTML("afterend", alertBox(result.ok, message));
+  };
+}
+
+async function renderModel(modelId) {
+  const result = await api("GET", "models/" + encodeURIComponent(modelId));
+  if (!result.ok) {
+    app.innerHTML = alertBox(false, result.data.message);
+    return;
+  }
+  const model = result.data;
+  let voteSection = "<p>You need to be logged in to vote.</p>";
+  if (model.canVote) {
+    voteSection = `<p><textarea id="comment"></textarea></p>
+      <button id="vote-button" class="btn btn-success">Vote!</button>`;
+  } else if (token()) {
+    voteSection = `<p class="card-text">Thank you for your vote!</p>`;
+  }
+  const rows = model.comments.map(
+    (comment) => `<tr><td>${esc(comment.datePosted)}</td><td>${esc(comment.user)}</td>
+      <td>${esc(comment.text)}</td></tr>`
+  );
+  app.innerHTML = `<h3>${esc(model.make)} ${esc(model.name)}</h3>
+    <p>${esc(model.description)}</p>
+    <h4>Specification</h4>
+    <ul><li>Engine: ${esc(model.engineVol)}l</li><li>Max Speed: ${esc(model.maxSpeed)}km/h</li></ul>
+    <h4>Votes: <span id="votes">${esc(model.votes)}</span></h4>
+    ${voteSection}
+    <table class="table" id="comments">
+    <thead><tr><th>Date</th><th>Author</th><th>Comment</th></tr></thead>
+    <tbody>${rows.join("")}</tbody></table>`;
+  const voteButton = document.getElementById("vote-button");
+  if (voteButton) {
+    voteButton.onclick = async () => {
+      const comment = document.getElementById("comment").value;
+      await api("POST", `models/${encodeURIComponent(modelId)}/vote`, { comment });
+      renderModel(modelId);
+    };
+  }
+}
+
+async function renderOverall() {
+  let page = Number(new URLSearchParams(location.search).get("page")) || 1;
+  app.innerHTML = `<table class="table" id="rankings">
+    <thead><tr><th>Make</th><th>Model</th><th>Rank</th><th>Votes</th><th>Comments</th></tr></thead>
+    <tbody></tbody></table>
+    <div class="pagination">
+    <span class="page-button"><a id="previous-page" class="btn" href="/overall">«</a></span>
+    page <span id="page-number"></span> of <span id="total-pages"></span>
+    <span class="page-button"><a id="next-page" class="btn" href="/overall">»</a></span>
+    </div>`;
+  const previous = document.getElementById("previous-page");
+  const next = document.getElementById("next-page");
+
+  function setBlocked(button, blocked) {
+    const blocker = button.parentElement.querySelector(".blocker");
+    if (blocked && !blocker) {
+      button.insertAdjacentHTML("afterend", `<span class="blocker"></span>`);
+    } else if (!blocked && blocker) {
+      blocker.remove();
+    }
+  }
+
+  async function load() {
+    const result = (await api("GET", "models?page=" + page)).data;
+    app.querySelector("#rankings tbody").innerHTML = result.models
+      .map(
+        (model) => `<tr><td>${esc(model.make)}</td>
+        <td><a href="/model/${encodeURIComponent(model.id)}">${esc(model.name)}</a></td>
+        <td>${model.rank}</td><td>${model.votes}</td><td>${model.comments}</td></tr>`
+      )
+      .join("");
+    document.getElementById("page-number").textContent = page;
+    document.getElementById("total-pages").textContent = result.totalPages;
+    history.replaceState(null, "", "/overall?page=" + page);
+    setBlocked(previous, page <= 1);
+    setBlocked(next, page >= result.totalPages);
+  }
+
+  previous.onclick = (event) => {
+    event.preventDefault();
+    page -= 1;
+    load();
+  };
+  next.onclick = (event) => {
+    event.preventDefault();
+    page += 1;
+    load();
+  };
+  await load();
+}
+
+function route() {
+  const path = location.pathname;
+  if (path === "/register") return renderRegister();
+  if (path === "/profile") return renderProfile();
+  if (path === "/overall") return renderOverall();
+  if (path.startsWith("/model/")) return renderModel(decodeURIComponent(path.slice(7)));
+  return renderHome();
+}
+
+renderNav();
+route();
+</script>
+</body>
+</html>
+"""
+)
+
+
+def main() -> None:
+    """
+    Run the stand-in server until it is interrupted.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default=STAND_IN_HOST)
+    parser.add_argument("--port", type=int, default=STAND_IN_PORT)
+    parser.add_argument("--models", type=int, default=STAND_IN_MODEL_COUNT)
+    parser.add_argument("--page-size", type=int, default=STAND_IN_PAGE_SIZE)
+    parser.add_argument("--latency", type=float, default=STAND_IN_LATENCY, help="in seconds")
+    parser.add_argument(
+        "--user",
+        action="append",
+        default=[],
+        metavar="USERNAME:PASSWORD",
+        help="a user to create on startup, can be repeated",
+    )
+    args = parser.parse_args()
+
+    server = StandInServer(args.host, args.port, args.models, args.page_size, args.latency)
+    for user in args.user:
+        username, password = user.split(":", 1)
+        server.state.add_user(username, password)
+
+    print(f"Serving the website on {server.url} and the API on {server.api_url}")
+    server.start()
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+This contains the tests that only use the API, so they run without a browser.
+"""
+import itertools
+
+from buggy_cars_testing.api_client import ApiError
+from buggy_cars_testing.base_api_tests import BaseApiTests
+
+# How many models from the top of the rankings are checked against their details.
+MODELS_TO_CHECK = 5
+
+
+class ApiTests(BaseApiTests):
+    """
+    This class contains the tests that only use the API.
+    """
+
+    def test_model_details_match_rankings(self) -> None:
+        """
+        Check that the details of the models at the top of the rankings match their entries in the
+        rankings.
+        """
+        for ranked in itertools.islice(self.api.iter_models(), MODELS_TO_CHECK):
+            with self.subTest(model=ranked.id):
+                model = self.api.model(ranked.id)
+                self.assertEqual(
+                    (ranked.make, ranked.name),
+                    (model.make, model.name),
+                    f"The details of {ranked.id} should be for the same car as in the rankings",
+                )
+                # Votes can be added between the two requests, but never taken away.
+                self.assertGreaterEqual(
+                    model.votes,
+                    ranked.votes,
+                    f"{ranked.id} should have at least the votes it has in the rankings",
+                )
+
+    def test_profile_needs_token(self) -> None:
+        """
+        Check that the profile can't be read without logging in.
+        """
+        with self.assertRaises(ApiError) as context:
+            self.api.profile()
+        self.assertEqual(401, context.exception.status, "Expected the profile to be unauthorized")
+
+    def test_vote_needs_token(self) -> None:
+        """
+        Check that a vote can't be sent without logging in.
+        """
+        model = next(self.api.iter_models())
+        with self.assertRaises(ApiError) as context:
+            self.api.vote(model.id, "This vote has no token")
+        self.assertEqual(401, context.exception.status, "Expected the vote to be unauthorized")
+        self.assertEqual(
+            model.votes, self.api.model(model.id).votes, "The vote should not have been counted"
+        )
@@ -0,0 +1,205 @@
+"""
+This contains the tests of many users voting for the same car model at the same time.
+
+The votes are held back by a barrier and then all sent at once, each from its own thread, so the API
+counts them under contention. Each user sends more than one vote, so the API also has to reject the
+duplicates that arrive at the same time as the first vote.
+"""
+import collections
+import string
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, NamedTuple
+import unittest
+
+import requests
+
+from buggy_cars_testing import stand_in_server
+from buggy_cars_testing.api_client import ApiClient, ApiError
+from buggy_cars_testing.base_api_tests import BaseApiTests
+from buggy_cars_testing.constants import (
+    COMMENT_LENGTH,
+    CONCURRENT_VOTE_ATTEMPTS,
+    CONCURRENT_VOTERS,
+    CONCURRENT_VOTERS_ENV_VAR,
+    USE_LOCAL_SERVER,
+)
+from buggy_cars_testing.load_generator import LatencyHistogram
+from buggy_cars_testing.user_pool import Lease, UserPool
+from buggy_cars_testing.vote_ledger import VoteLedger
+
+
+class VoteAttempt(NamedTuple):
+    """
+    A vote sent by one of the users. `status` is 0 if the vote failed without a response.
+    """
+
+    username: str
+    comment: str
+    status: int
+    started: float
+    finished: float
+
+    @property
+    def accepted(self) -> bool:
+        """
+        Whether the API accepted the vote.
+        """
+        return self.status == 200
+
+
+@unittest.skipUnless(
+    CONCURRENT_VOTERS, f"set {CONCURRENT_VOTERS_ENV_VAR} to vote concurrently on the live website"
+)
+class ConcurrentVoteTests(BaseApiTests):
+    """
+    This class contains the tests of voting for the same model from many users at once.
+    """
+
+    user_pool: UserPool
+    leases: List[Lease]
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """
+        Lease the users that vote.
+        """
+        super().setUpClass()
+        # Votes that don't fit in the listen backlog wait a second or more for a SYN retry, which
+        # would make the votes per second and latency meaningless.
+        if USE_LOCAL_SERVER:
+            backlog = stand_in_server.RUNNING_SERVER.listen_backlog
+            if backlog < CONCURRENT_VOTERS * CONCURRENT_VOTE_ATTEMPTS:
+                raise AssertionError(
+                    f"The stand-in server's listen backlog of {backlog} is too small for "
+                    f"{CONCURRENT_VOTERS * CONCURRENT_VOTE_ATTEMPTS} votes at once"
+                )
+        cls.user_pool = UserPool(CONCURRENT_VOTERS)
+        cls.leases = [cls.user_pool.lease() for _ in range(CONCURRENT_VOTERS)]
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        """
+        Give back the leased users.
+        """
+        cls.user_pool.release_all()
+
+    def test_concurrent_votes_for_one_model(self) -> None:
+        """
+        Check that when the users vote for the same model at once, every vote that was accepted is
+        counted, each user's vote is only counted once, and none of the comments are lost.
+        The votes per second and latency of the votes are printed.
+        """
+        clients = {
+            lease.username: self.api.with_token(self.get_token(*lease)) for lease in self.leases
+        }
+        model_id = self._find_model_all_can_vote(clients)
+        votes_before = self.api.model(model_id).votes
+
+        attempts = self._vote_at_once(clients, model_id)
+        model = self.api.model(model_id)
+        for attempt in attempts:
+            if attempt.accepted:
+                VoteLedger(attempt.username).record_vote(model_id)
+        self._print_report(model_id, attempts)
+
+        accepted = collections.Counter(attempt.username for attempt in attempts if attempt.accepted)
+        with self.subTest(check="count"):
+            # On the live website, this fails if someone else votes for the model at the same time.
+            self.assertEqual(
+                votes_before + sum(accepted.values()),
+                model.votes,
+                f"The votes for {model_id} should have gone up by the number of votes accepted",
+            )
+
+        with self.subTest(check="duplicates"):
+            for username, client in clients.items():
+                self.assertLessEqual(
+                    accepted[username], 1, f"More than one vote from {username} was accepted"
+                )
+                self.assertEqual(
+                    not accepted[username],
+                    client.model(model_id).can_vote,
+                    f"{username} should only be able to vote for {model_id} if no vote was "
+                    "accepted",
+                )
+
+        with self.subTest(check="comments"):
+            full_names = {
+                username: client.profile().full_name for username, client in clients.items()
+            }
+            posted = collections.Counter((comment.user, comment.text) for comment in model.comments)
+            for attempt in attempts:
+                self.assertEqual(
+                    1 if attempt.accepted else 0,
+                    posted[(full_names[attempt.username], attempt.comment)],
+                    f"The comment '{attempt.comment}' by {attempt.username} should be on "
+                    f"{model_id} once if the vote was accepted, and otherwise not at all",
+                )
+
+    def _find_model_all_can_vote(self, clients: Dict[str, ApiClient]) -> str:
+        """
+        Returns the first model in the rankings that none of the users have voted for.
+        """
+        with ThreadPoolExecutor(max_workers=len(clients)) as executor:
+            for ranked in self.api.iter_models():
+                if all(
+                    executor.map(
+                        lambda client, model_id=ranked.id: client.model(model_id).can_vote,
+                        clients.values(),
+                    )
+                ):
+                    return ranked.id
+        self.fail("Every model has been voted for by at least one of the users")
+
+    def _vote_at_once(self, clients: Dict[str, ApiClient], model_id: str) -> List[VoteAttempt]:
+        """
+        Send `CONCURRENT_VOTE_ATTEMPTS` votes with different comments from each user, all at once.
+        """
+        barrier = threading.Barrier(len(clients) * CONCURRENT_VOTE_ATTEMPTS)
+
+        def send_vote(username: str, client: ApiClient) -> VoteAttempt:
+            comment = self.generate_random_string(string.ascii_letters, COMMENT_LENGTH)
+            barrier.wait()
+            started = time.perf_counter()
+            try:
+                client.vote(model_id, comment)
+                status = 200
+            except ApiError as error:
+                status = error.status
+            except requests.RequestException:
+                status = 0
+            return VoteAttempt(username, comment, status, started, time.perf_counter())
+
+        with ThreadPoolExecutor(max_workers=barrier.parties) as executor:
+            futures = [
+                executor.submit(send_vote, username, client)
+                for username, client in clients.items()
+                for _ in range(CONCURRENT_VOTE_ATTEMPTS)
+            ]
+            return [future.result() for future in futures]
+
+    @staticmethod
+    def _print_report(model_id: str, attempts: List[VoteAttempt]) -> None:
+        """
+        Print the votes accepted per second, and the latency percentiles of all of the votes.
+        """
+        histogram = LatencyHistogram()
+        for attempt in attempts:
+            histogram.record(
+                int((attempt.finished - attempt.started) * 1e6), error=not attempt.accepted
+            )
+        duration = max(attempt.finished for attempt in attempts) - min(
+            attempt.started for attempt in attempts
+        )
+        summary = histogram.summary(duration)
+        accepted = summary["count"] - summary["errors"]
+        print(
+            f"\n{accepted} of {summary['count']} concurrent votes for {model_id} accepted in "
+            f"{duration:.3f}s ({accepted / duration:.1f} votes/s), latency "
+            f"p50 {summary['p50']:.1f} ms, p95 {summary['p95']:.1f} ms, "
+            f"p99 {summary['p99']:.1f} ms, max {summary['max']:.1f} ms",
+            file=sys.stderr,
+        )
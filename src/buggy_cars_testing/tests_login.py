@@ -1,32 +1,37 @@
 """
 This contains the tests that require logging in as a user.
 """
+import os
 import random
 import string
-from typing import Any, List, Dict
-from urllib.parse import urljoin, quote
-
-import requests
+from typing import Any, Dict, List, Optional
 
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.wait import WebDriverWait
 from selenium.webdriver.remote.webelement import WebElement
 
-from buggy_cars_testing.base_buggy_car_tests import BaseBuggyCarTests
+from buggy_cars_testing import combinations, model_catalog
+from buggy_cars_testing.base_buggy_car_tests import BaseBuggyCarTests, subtest_shards
 from buggy_cars_testing.constants import (
-    BASE_API_URL,
-    BASE_URL,
-    WEB_PAGE_WAIT_TIME,
+    CASSETTE_PATH,
+    COMBINATIONS,
+    EXHAUSTIVE_COMBINATIONS,
     PHONE_NUMBER_LENGTH,
     COMMENT_LENGTH,
-    API_WAIT_TIME,
+    LOGIN_MODE,
+    USER_POOL_SIZE,
 )
+from buggy_cars_testing.page_objects import HomePage, ModelPage, ProfilePage
+from buggy_cars_testing.user_pool import UserPool
+from buggy_cars_testing.vote_ledger import VoteLedger
 
 # Ideally this wouldn't be stored here, but instead in a secrets vault or a config file
 # but for simplicity, this is hardcoded here.
 USERNAME = "mgltest4"
 PASSWORD = "Password1234!"
 
+# The ages used when updating the profile, as the youngest and oldest age in each bracket.
+AGE_BRACKETS = {"child": (0, 17), "adult": (18, 64), "senior": (65, 94)}
+
 
 class LoginTests(BaseBuggyCarTests):
     """
@@ -34,136 +39,146 @@ class LoginTests(BaseBuggyCarTests):
     """
 
     all_cars: List[str] = []
+    vote_ledger: VoteLedger
     token: str
+    home_page: HomePage
+    stand_in_users = {USERNAME: PASSWORD}
+
+    # The user that the tests log in as. This is the hardcoded user, unless the user pool is used.
+    username = USERNAME
+    password = PASSWORD
+    user_pool: Optional[UserPool] = UserPool(USER_POOL_SIZE) if USER_POOL_SIZE else None
 
     @classmethod
     def setUpClass(cls) -> None:
         """
         This collects all the car model IDs.
         The IDs are used to test voting.
-        This process is quite slow, so this is only done once when the class is setup rather than
-        before each test case.
+        Collecting the IDs needs to go through every page of car models, so this is only done once
+        when the class is setup rather than before each test case, and the IDs are cached on disk.
         """
+        super().setUpClass()
+        cls.all_cars = model_catalog.load_model_ids()
 
-        def add_cars_from_page(page_num: int) -> Dict[Any, Any]:
-            """
-            The car models is split across multiple pages, so add the car model IDs from the page
-            specified by `page_num`.
-            """
-            url = urljoin(BASE_API_URL, f"models?page={page_num}")
-            models = requests.get(url, timeout=API_WAIT_TIME).json()
-
-            for model in models["models"]:
-                cls.all_cars.append(model["id"])
-            return models
-
-        # Get the first page separately so we can find out what the total amount of pages are.
-        models_page = add_cars_from_page(1)
-        total_pages = models_page["totalPages"]
+        # Shuffle the IDs so we don't always pick the same ones. When a cassette is used, they are
+        # shuffled the same way each time, so the requests for the models match the recording.
+        rng = random.Random(os.path.basename(CASSETTE_PATH)) if CASSETTE_PATH else random
+        rng.shuffle(cls.all_cars)
 
-        for page in range(2, total_pages + 1):
-            add_cars_from_page(page)
+        if cls.user_pool:
+            cls.username, cls.password = cls.user_pool.lease()
+        cls.vote_ledger = VoteLedger(cls.username)
 
-        # Shuffle the IDs so we don't always pick the same ones.
-        random.shuffle(cls.all_cars)
+    @classmethod
+    def tearDownClass(cls) -> None:
+        """
+        Give back the leased user, if the user pool is used.
+        """
+        if cls.user_pool:
+            cls.user_pool.release(cls.username)
+        super().tearDownClass()
 
     def setUp(self) -> None:
         """
         Login before each test case.
         """
         super().setUp()
-        self.driver.get(BASE_URL)
-        self.set_value_in_input_box("login", USERNAME, True)
-        element = self.set_value_in_input_box("password", PASSWORD, True)
-        element.submit()
+        self.home_page = HomePage(self.driver)
 
-        # Wait until successfully logged in by waiting for the logout element to appear.
-        WebDriverWait(self.driver, WEB_PAGE_WAIT_TIME).until(lambda _: self._get_logout_element())
+        # Get a token for use by API queries.
+        self.token = self.get_token(self.username, self.password)
 
-        # Create a token for use by API queries.
-        self.token = self.generate_token(USERNAME, PASSWORD)
+        self._log_in()
 
     def tearDown(self) -> None:
         """
         Logout after finishing the test case.
         """
-        logout_element = WebDriverWait(self.driver, WEB_PAGE_WAIT_TIME).until(
-            lambda _: self._get_logout_element()
-        )
-        logout_element.click()
+        self._wait_for_logout_element().click()
 
         super().tearDown()
 
-    def test_update_profile_valid(self) -> None:
+    def test_login_with_form(self) -> None:
         """
-        Check that a logged in user can update their profile.
+        Check that a user can log in using the login form.
         """
-        self.get_element_containing_text("Profile").click()
+        self._get_logout_element().click()
+        self.home_page.wait_for("login")
 
-        # Wait for the profile page to load.
-        WebDriverWait(self.driver, WEB_PAGE_WAIT_TIME).until(
-            lambda _: self.driver.find_elements(By.ID, "firstName")
+        self._log_in_with_form()
+        self.assertTrue(
+            self._wait_for_logout_element(),
+            f"Expected to be logged in as {self.username} after submitting the login form",
         )
 
-        genders = self.driver.find_element(By.ID, "genders")
-        hobbies = self.driver.find_element(By.ID, "hobby")
-
-        # Go through and try out all of the gender and hobby options.
-        for gender in genders.find_elements(By.TAG_NAME, "option"):
-            for hobby in hobbies.find_elements(By.TAG_NAME, "option"):
-                # Use a subtest so that multiple combinations can be tested without a failure in
-                # one causing the rest to fail.
-                with self.subTest(
-                    gender=gender.get_attribute("value"), hobby=hobby.get_attribute("value")
-                ):
-                    # Randomly generate most of the profile options.
-                    profile_values = {}
-                    profile_values["firstName"] = self.generate_random_name()
-                    profile_values["lastName"] = self.generate_random_name()
-                    profile_values["age"] = random.randrange(95)
-                    # Ideally the address would be randomly generated too, but it requires a
-                    # third-party library (https://pypi.org/project/random-address/)
-                    # so for simplicity, it is hardcoded.
-                    profile_values["address"] = "123 Fake Street\nFake Suburb\nFake City\n1234"
-                    profile_values["phone"] = self.generate_random_string(
-                        string.digits, PHONE_NUMBER_LENGTH
-                    )
-                    profile_values["gender"] = gender.get_attribute("value")
-
-                    # Update the elements to have the generated profile options.
-                    for key, value in profile_values.items():
-                        self.set_value_in_input_box(key, value)
-                    hobby.click()
-                    hobby.submit()
-
-                    alerts = WebDriverWait(self.driver, WEB_PAGE_WAIT_TIME).until(
-                        lambda _: self.find_active_alert_messages()
-                    )
-                    self.assertTrue(
-                        alerts,
-                        "Expected alert after profile update form is "
-                        "submitted but none were found",
-                    )
-                    self.assertIn(
-                        "The profile has been saved successful",
-                        " ".join(alerts),
-                        f"Did not successfully update profile with {profile_values} and "
-                        f"hobby '{hobby.get_attribute('value')}'",
-                    )
+    @subtest_shards(4)
+    def test_update_profile_valid(self) -> None:
+        """
+        Check that a logged in user can update their profile.
+        """
+        self.home_page.element("profile_link").click()
 
-                    # Check that the API has the updated profile
-                    profile = self.get_request_from_api_with_token(self.token, "users/profile")
-                    for key, value in profile_values.items():
-                        self.assertEqual(
-                            str(value),
-                            str(profile[key]),
-                            f"{key} has not been updated in the API",
-                        )
+        # Wait for the profile page to load.
+        profile_page = ProfilePage(self.driver)
+        profile_page.wait_for("first_name")
+
+        genders = profile_page.element("genders")
+        hobbies = profile_page.element("hobbies")
+
+        for option in self.shard_subtests(self._profile_options(genders, hobbies)):
+            gender, hobby, age_bracket = option["gender"], option["hobby"], option["age"]
+            # Use a subtest so that multiple combinations can be tested without a failure in
+            # one causing the rest to fail.
+            with self.subTest(
+                gender=gender.get_attribute("value"),
+                hobby=hobby.get_attribute("value"),
+                age=age_bracket,
+            ):
+                # Randomly generate most of the profile options.
+                profile_values = {}
+                profile_values["firstName"] = self.generate_random_name()
+                profile_values["lastName"] = self.generate_random_name()
+                profile_values["age"] = random.randint(*AGE_BRACKETS[age_bracket])
+                # Ideally the address would be randomly generated too, but it requires a
+                # third-party library (https://pypi.org/project/random-address/)
+                # so for simplicity, it is hardcoded.
+                profile_values["address"] = "123 Fake Street\nFake Suburb\nFake City\n1234"
+                profile_values["phone"] = self.generate_random_string(
+                    string.digits, PHONE_NUMBER_LENGTH
+                )
+                profile_values["gender"] = gender.get_attribute("value")
+
+                # Update the elements to have the generated profile options.
+                for key, value in profile_values.items():
+                    self.set_value_in_input_box(key, value)
+                hobby.click()
+                hobby.submit()
+
+                alerts = self.wait_for_alert_messages()
+                self.assertTrue(
+                    alerts,
+                    "Expected alert after profile update form is submitted but none were found",
+                )
+                self.assertIn(
+                    "The profile has been saved successful",
+                    " ".join(alerts),
+                    f"Did not successfully update profile with {profile_values} and "
+                    f"hobby '{hobby.get_attribute('value')}'",
+                )
+
+                # Check that the API has the updated profile
+                profile = self.api.with_token(self.token).profile().to_json()
+                for key, value in profile_values.items():
                     self.assertEqual(
-                        hobby.get_attribute("value"),
-                        profile["hobby"],
-                        "Hobby has not been updated in the API",
+                        str(value),
+                        str(profile[key]),
+                        f"{key} has not been updated in the API",
                     )
+                self.assertEqual(
+                    hobby.get_attribute("value"),
+                    profile["hobby"],
+                    "Hobby has not been updated in the API",
+                )
 
     def test_vote_no_comment(self) -> None:
         """
@@ -184,33 +199,28 @@ class LoginTests(BaseBuggyCarTests):
         """
         model_id = self._find_model_with_no_vote()
 
-        self.driver.get(urljoin(BASE_URL, quote(f"model/{model_id}")))
-        WebDriverWait(self.driver, WEB_PAGE_WAIT_TIME).until(
-            lambda _: self.get_element_containing_text("Specification")
-        )
+        model_page = ModelPage(self.driver, model_id).open()
+        model_page.wait_for("specification")
 
-        api_url = urljoin(BASE_API_URL, quote(f"models/{model_id}"))
-        votes_before = requests.get(api_url, timeout=API_WAIT_TIME).json()["votes"]
+        votes_before = self.api.model(model_id).votes
 
         if add_comment:
             comment = self.generate_random_string(string.ascii_letters, COMMENT_LENGTH)
-            self.set_value_in_input_box("comment", comment)
+            model_page.element("comment").send_keys(comment)
 
-        self.get_element_containing_text("Vote!").click()
+        model_page.element("vote_button").click()
 
-        WebDriverWait(self.driver, WEB_PAGE_WAIT_TIME).until(
-            lambda _: self.get_element_containing_text("Thank you for your vote!")
-        )
-        post_vote_result = self.get_request_from_api_with_token(
-            self.token, quote(f"models/{model_id}")
-        )
+        model_page.wait_for("vote_message")
+        post_vote_result = self.api.with_token(self.token).model(model_id)
+        if not post_vote_result.can_vote:
+            self.vote_ledger.record_vote(model_id)
         self.assertGreater(
-            post_vote_result["votes"],
+            post_vote_result.votes,
             votes_before,
             f"The vote count should have increased for {model_id} after voting for it.",
         )
         self.assertFalse(
-            post_vote_result["canVote"],
+            post_vote_result.can_vote,
             f"The user should not be able to vote for {model_id} after voting for it already",
         )
 
@@ -218,25 +228,20 @@ class LoginTests(BaseBuggyCarTests):
             """
             Helper function to check if the webpage has been updated with the comment.
             """
-            comments_table = self.driver.find_element(By.TAG_NAME, "table")
-            for row in comments_table.find_elements(By.TAG_NAME, "tr"):
-                row_contents = row.find_elements(By.TAG_NAME, "td")
-                if row_contents[1].text == author and row_contents[2].text == comment:
-                    return True
-            return False
+            comments_table = self.get_table_contents()
+            return any(row["cells"][1:3] == [author, comment] for row in comments_table["rows"])
 
         def found_added_comment_api(author: str) -> bool:
             """
             Helper function to check if the API has been updated with the comment.
             """
-            for online_comment in post_vote_result["comments"]:
-                if online_comment["user"] == author and online_comment["text"] == comment:
+            for online_comment in post_vote_result.comments:
+                if online_comment.user == author and online_comment.text == comment:
                     return True
             return False
 
         if add_comment:
-            profile = self.get_request_from_api_with_token(self.token, "users/profile")
-            user_name = f"{profile['firstName']} {profile['lastName']}"
+            user_name = self.api.with_token(self.token).profile().full_name
 
             self.assertTrue(
                 found_added_comment_api(user_name),
@@ -248,23 +253,81 @@ class LoginTests(BaseBuggyCarTests):
                 f"The webpage should have the comment '{comment}' by '{user_name}' for {model_id}",
             )
 
+    @staticmethod
+    def _profile_options(genders: WebElement, hobbies: WebElement) -> List[Dict[str, Any]]:
+        """
+        Returns the gender option, hobby option and age bracket to update the profile with in each
+        subTest.
+        By default, this is every gender with every hobby, and the age brackets are taken in turn,
+        as every pair of the three would take more subTests. A higher strength in
+        `BUGGY_CARS_TEST_COMBINATIONS` adds the age brackets as a third option.
+        """
+        parameters: Dict[str, List[Any]] = {
+            "gender": genders.find_elements(By.TAG_NAME, "option"),
+            "hobby": hobbies.find_elements(By.TAG_NAME, "option"),
+        }
+        if (
+            COMBINATIONS == EXHAUSTIVE_COMBINATIONS
+            or not COMBINATIONS.isdigit()
+            or int(COMBINATIONS) > 2
+        ):
+            parameters["age"] = list(AGE_BRACKETS)
+        options = combinations.pick_combinations(parameters)
+        for index, option in enumerate(options):
+            option.setdefault("age", list(AGE_BRACKETS)[index % len(AGE_BRACKETS)])
+        return options
+
+    def _log_in(self) -> None:
+        """
+        Log in using either the login form or the token, depending on `LOGIN_MODE`.
+        """
+        if LOGIN_MODE == "form":
+            self.home_page.open()
+            self._log_in_with_form()
+        else:
+            # This is faster than filling in the login form, which is covered by its own test.
+            self.log_in_with_token(self.token)
+
+        # Wait until successfully logged in by waiting for the logout element to appear.
+        self._wait_for_logout_element()
+
+    def _log_in_with_form(self) -> None:
+        """
+        Fill in and submit the login form on the current page.
+        """
+        self.set_value_in_input_box("login", self.username, True)
+        element = self.set_value_in_input_box("password", self.password, True)
+        element.submit()
+
     def _get_logout_element(self) -> WebElement:
         """
         Get the logout element.
         """
-        return self.get_element_containing_text("Logout")
+        return self.home_page.element("logout_link")
+
+    def _wait_for_logout_element(self) -> WebElement:
+        """
+        Wait for the logout element to appear, and return it.
+        """
+        return self.home_page.wait_for("logout_link")
 
     def _find_model_with_no_vote(self) -> str:
         """
         Find a car model that has not been voted for by this user.
         Ideally, there would be a way to remove a user's vote so we don't have this problem.
+        If the user pool is used, a user that has voted for every model is swapped for another user.
         """
-
-        for model_id in self.all_cars:
-            model_info = self.get_request_from_api_with_token(
-                self.token, quote(f"models/{model_id}")
-            )
-            if model_info["canVote"]:
-                return model_id
-
-        raise RuntimeError(f"{USERNAME} has voted for every model, need to use another user")
+        try:
+            return self.vote_ledger.claim_model_with_no_vote(self.token, self.all_cars)
+        except RuntimeError:
+            if not self.user_pool:
+                raise
+
+        cls = type(self)
+        cls.username, cls.password = self.user_pool.retire(self.username)
+        cls.vote_ledger = VoteLedger(self.username)
+        self.token = self.get_token(self.username, self.password)
+        if LOGIN_MODE == "form":
+            self._get_logout_element().click()
+        self._log_in()
+        return self.vote_ledger.claim_model_with_no_vote(self.token, self.all_cars)
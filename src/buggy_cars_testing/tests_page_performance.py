@@ -0,0 +1,31 @@
+"""
+This contains the tests that check the pages of the website load within their budgets.
+"""
+from buggy_cars_testing import model_catalog
+from buggy_cars_testing.base_buggy_car_tests import BaseBuggyCarTests
+from buggy_cars_testing.page_objects import HomePage, ModelPage, OverallPage, RegisterPage
+
+
+class PagePerformanceTests(BaseBuggyCarTests):
+    """
+    This class contains the tests that check how fast the pages of the website load.
+    """
+
+    def test_pages_within_budget(self) -> None:
+        """
+        Check that each page loads within its budget of time to first byte, DOMContentLoaded, bytes
+        transferred and requests made.
+        """
+        model_id = model_catalog.load_model_ids()[0]
+        # Each page, and an element that shows the page has finished rendering.
+        pages = [
+            ("home", HomePage(self.driver), "input[name='login']"),
+            ("register", RegisterPage(self.driver), "#username"),
+            ("overall", OverallPage(self.driver), "table tbody tr"),
+            ("model", ModelPage(self.driver, model_id), "table"),
+        ]
+        for name, page, rendered_selector in pages:
+            with self.subTest(page=name):
+                page.open()
+                self.wait_for_element(rendered_selector)
+                self.assert_page_within_budget()
@@ -5,14 +5,11 @@ import random
 import string
 from urllib.parse import urljoin
 
-from selenium.webdriver.support.wait import WebDriverWait
-
 from buggy_cars_testing.base_buggy_car_tests import BaseBuggyCarTests
 from buggy_cars_testing.constants import (
     BASE_URL,
     USERNAME_LENGTH,
     PASSWORD_PER_CHAR_TYPE_LENGTH,
-    WEB_PAGE_WAIT_TIME,
 )
 
 
@@ -26,7 +23,7 @@ class RegisterUserTests(BaseBuggyCarTests):
         Go to the register page.
         """
         super().setUp()
-        self.driver.get(urljoin(BASE_URL, "register"))
+        self.open_page(urljoin(BASE_URL, "register"))
 
     # It would be best if the test removes the user it tries to register as part of the tearDown.
     # However there doesn't seem to be a way to remove registered users.
@@ -73,9 +70,7 @@ class RegisterUserTests(BaseBuggyCarTests):
         element = self.set_value_in_input_box("confirmPassword", password)
         element.submit()
 
-        alerts = WebDriverWait(self.driver, WEB_PAGE_WAIT_TIME).until(
-            lambda _: self.find_active_alert_messages()
-        )
+        alerts = self.wait_for_alert_messages()
         self.assertTrue(
             alerts, "Expected alert after registration form is submitted but none were found"
         )
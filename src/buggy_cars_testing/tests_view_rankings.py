@@ -1,19 +1,29 @@
 """
 This contains the tests that check the navigation of the overall ranking page.
 """
-from urllib.parse import urljoin
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
 
-import requests
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.wait import WebDriverWait
+from selenium.webdriver.remote.webdriver import WebDriver
 from selenium.webdriver.remote.webelement import WebElement
-from selenium.common.exceptions import (
-    ElementClickInterceptedException,
-    StaleElementReferenceException,
-)
+from selenium.common.exceptions import ElementClickInterceptedException
 
-from buggy_cars_testing.base_buggy_car_tests import BaseBuggyCarTests
-from buggy_cars_testing.constants import BASE_API_URL, BASE_URL, WEB_PAGE_WAIT_TIME, API_WAIT_TIME
+from buggy_cars_testing import dom_extraction, waits
+from buggy_cars_testing.api_client import RankedModel
+from buggy_cars_testing.base_buggy_car_tests import BaseBuggyCarTests, subtest_shards
+from buggy_cars_testing.constants import RANKING_PAGE_WORKERS
+from buggy_cars_testing.driver_pool import DRIVER_POOL
+from buggy_cars_testing.page_objects import OverallPage
+
+# The columns of the ranking table, and the attribute of the API record that each column shows.
+RANKING_COLUMNS = {
+    "Make": "make",
+    "Model": "name",
+    "Rank": "rank",
+    "Votes": "votes",
+    "Comments": "comments",
+}
 
 
 class ViewRankingTests(BaseBuggyCarTests):
@@ -22,41 +32,30 @@ class ViewRankingTests(BaseBuggyCarTests):
     """
 
     total_pages: int
+    overall_page: OverallPage
 
     def setUp(self) -> None:
         """
-        Go to the overall ranking page and wait for it to load.
+        Find out how many pages of rankings there are.
         """
         super().setUp()
-        self.driver.get(urljoin(BASE_URL, "overall"))
-        self.total_pages = requests.get(
-            urljoin(BASE_API_URL, "models"), timeout=API_WAIT_TIME
-        ).json()["totalPages"]
-        WebDriverWait(self.driver, WEB_PAGE_WAIT_TIME).until(
-            lambda _: self._get_first_car_in_page()
-        )
+        self.overall_page = OverallPage(self.driver)
+        self.total_pages = self.api.models_page(1).total_pages
 
+    @subtest_shards(4)
     def test_navigating_via_buttons_overall_ranking(self):
         """
         Check that each page can go to the previous and next page using the buttons.
         """
-        previous_page_button = self.get_element_containing_text("«")
-        next_page_button = self.get_element_containing_text("»")
-
-        def check_page_reloaded() -> None:
-            """
-            The page has reloaded to another page when the first car entry in the page no longer
-            matches the previous first car entry.
-            """
-            return first_car_in_page != self._get_first_car_in_page()
 
         def check_page_correctly_updated() -> None:
             """
             Check that the page has updated to the new page.
+            The page has reloaded to another page when the first car entry in the page no longer
+            matches the previous first car entry.
             """
             nonlocal first_car_in_page
-            WebDriverWait(self.driver, WEB_PAGE_WAIT_TIME).until(lambda _: check_page_reloaded())
-            first_car_in_page = self._get_first_car_in_page()
+            first_car_in_page = self._wait_for_first_car_change(first_car_in_page)
 
         def assert_page_change_invalid(button: WebElement, target_page_num: int) -> None:
             """
@@ -69,10 +68,15 @@ class ViewRankingTests(BaseBuggyCarTests):
                 button.click()
 
         # This checks that we can get to the previous page, back to the original page, and to the
-        # next page.
-        for page_num in range(1, self.total_pages + 1):
+        # next page. Each page is opened directly, so the pages don't depend on each other and can
+        # be split between shards.
+        for page_num in self.shard_subtests(range(1, self.total_pages + 1)):
             with self.subTest(page=page_num):
-                first_car_in_page = self._get_first_car_in_page()
+                self.overall_page.open_page_number(page_num)
+                first_car_in_page = self._wait_for_first_car_change(None)
+                previous_page_button = self.overall_page.element("previous_page")
+                next_page_button = self.overall_page.element("next_page")
+
                 if page_num == 1:
                     # You shouldn't be able to go to page 0 (since it doesn't exist)
                     assert_page_change_invalid(previous_page_button, page_num - 1)
@@ -91,16 +95,81 @@ class ViewRankingTests(BaseBuggyCarTests):
                     next_page_button.click()
                     check_page_correctly_updated()
 
-    def _get_first_car_in_page(self) -> str:
+    @subtest_shards(2)
+    def test_pages_match_api_overall_ranking(self) -> None:
+        """
+        Check that every page of the rankings shows the same cars as the API.
+        The pages are read using several browsers at once: this test case's browser, and more from
+        the pool of browsers. The extra browsers are closed afterwards, rather than kept in the pool
+        of each worker process for test cases that only need one browser.
+        """
+        pages = self.shard_subtests(range(1, self.total_pages + 1))
+        drivers: "queue.Queue[WebDriver]" = queue.Queue()
+        drivers.put(self.driver)
+        for _ in range(min(RANKING_PAGE_WORKERS, len(pages)) - 1):
+            driver = DRIVER_POOL.acquire()
+            self.addCleanup(DRIVER_POOL.release, driver, discard=True)
+            drivers.put(driver)
+
+        with ThreadPoolExecutor(max_workers=drivers.qsize()) as executor:
+            futures = [
+                (page_num, executor.submit(self._read_page, page_num, drivers))
+                for page_num in pages
+            ]
+            for page_num, future in futures:
+                with self.subTest(page=page_num):
+                    shown_rows, api_rows = future.result()
+                    self.assertEqual(
+                        api_rows,
+                        shown_rows,
+                        f"Page {page_num} should show the same cars as the API",
+                    )
+
+    def _read_page(
+        self, page_num: int, drivers: "queue.Queue[WebDriver]"
+    ) -> Tuple[List[List[str]], List[List[str]]]:
+        """
+        Open page `page_num` of the rankings in a browser from `drivers`, and returns the rows shown
+        in the page and the rows the API has for that page.
+        The votes can change while the page is read (e.g. from the voting tests), so if the rows
+        don't match, the page and the API are read once more.
+        """
+        driver = drivers.get()
+        try:
+            overall_page = OverallPage(driver)
+            for _ in range(2):
+                overall_page.open_page_number(page_num)
+                waits.wait_for_table_row_change(driver, 1, None)
+                table = dom_extraction.get_table(driver)
+                self.assertIsNotNone(table, f"Page {page_num} should show the ranking table")
+                api_models = self.api.models_page(page_num).models
+                shown_rows, api_rows = _compare_rows(table, api_models)
+                if shown_rows == api_rows:
+                    break
+            return shown_rows, api_rows
+        finally:
+            drivers.put(driver)
+
+    def _wait_for_first_car_change(self, previous_first_car: Optional[str]) -> str:
         """
-        Returns the first car entry in the page.
+        Wait for the first car entry in the page to be different from `previous_first_car`, which
+        happens when the page loads or changes to another page. Returns the new first car entry.
         """
-        while True:
-            try:
-                car_table = self.driver.find_element(By.TAG_NAME, "table")
-                first_entry = car_table.find_elements(By.TAG_NAME, "tr")[1]
-                return first_entry.text
-            except StaleElementReferenceException:
-                # The page reloaded while we're trying to get the first car, so the elements
-                # become stale.
-                continue
+        return waits.wait_for_table_row_change(self.driver, 1, previous_first_car)
+
+
+def _compare_rows(
+    table: Dict[str, Any], api_models: List[RankedModel]
+) -> Tuple[List[List[str]], List[List[str]]]:
+    """
+    Returns the columns of the ranking `table` that are in `RANKING_COLUMNS`, and the same columns
+    made from the `api_models`, so that they can be compared.
+    """
+    columns = [
+        (index, RANKING_COLUMNS[header])
+        for index, header in enumerate(table["headers"])
+        if header in RANKING_COLUMNS
+    ]
+    shown_rows = [[row["cells"][index] for index, _ in columns] for row in table["rows"]]
+    api_rows = [[str(getattr(model, field)) for _, field in columns] for model in api_models]
+    return shown_rows, api_rows
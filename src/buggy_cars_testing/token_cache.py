@@ -0,0 +1,132 @@
+"""
+This contains a cache of API tokens, so that a new token is only requested when the cached token is
+about to expire.
+
+Tokens are cached in memory, and in a file so that they are shared with other worker processes.
+"""
+import hashlib
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from urllib.parse import urljoin
+
+from buggy_cars_testing import cache_files, cassettes, http_session, tracing
+from buggy_cars_testing.api_client import TOKEN_PATH
+from buggy_cars_testing.constants import BASE_API_URL, TOKEN_DEFAULT_LIFETIME, TOKEN_REFRESH_MARGIN
+
+CachedToken = Tuple[str, float]
+
+
+def request_token(username: str, password: str) -> CachedToken:
+    """
+    Request a new token from the API.
+    Returns the token to use for API calls and the time that it expires.
+    """
+    url = urljoin(BASE_API_URL, TOKEN_PATH)
+    token_contents = http_session.post(
+        url, data={"grant_type": "password", "username": username, "password": password}
+    ).json()
+    expiry = time.time() + token_contents.get("expires_in", TOKEN_DEFAULT_LIFETIME)
+    token = f"{token_contents['token_type']} {token_contents['access_token']}"
+    cassettes.register_token(token, username)
+    return token, expiry
+
+
+class TokenProvider:
+    """
+    This hands out cached tokens, keyed by the credentials used to create them.
+    It is safe to use from multiple threads and multiple processes.
+    """
+
+    def __init__(self, file_name: str = "tokens.json") -> None:
+        # This only guards the dictionaries, and is never held while a token is requested.
+        self._lock = threading.Lock()
+        self._tokens: Dict[str, CachedToken] = {}
+        # A lock for each key, so only one thread requests a token for a user at a time, without
+        # holding up the threads that get tokens for other users.
+        self._key_locks: Dict[str, threading.Lock] = {}
+        self._file_name = file_name
+
+    def get_token(self, username: str, password: str) -> str:
+        """
+        Returns a token for the user, requesting a new one if there isn't a cached token that will
+        be valid for at least `TOKEN_REFRESH_MARGIN` seconds.
+        """
+        key = self._cache_key(username, password)
+        with tracing.span("token", "get_token"):
+            with self._lock:
+                token = self._valid_token(self._tokens.get(key))
+            if not token:
+                with self._key_lock(key):
+                    token = self._fill(key, username, password)
+            cassettes.register_token(token, username)
+            return token
+
+    def invalidate(self, username: str, password: str) -> None:
+        """
+        Forget the cached token for the user, e.g. if the API has rejected it.
+        """
+        key = self._cache_key(username, password)
+        with self._lock:
+            self._tokens.pop(key, None)
+        path = cache_files.cache_path(self._file_name)
+        with self._key_lock(key), cache_files.file_lock(path + ".lock"):
+            stored = cache_files.read_json(path) or {}
+            if stored.pop(key, None):
+                cache_files.write_json(path, stored)
+
+    def _key_lock(self, key: str) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _fill(self, key: str, username: str, password: str) -> str:
+        """
+        Returns the token for the `key` from the file, or requests a new token and adds it to the
+        file. The file is only locked while it is read and written, not while the token is
+        requested, so other processes can get their tokens in the meantime.
+        """
+        with self._lock:
+            # Another thread may have got the token while this one waited for the key's lock.
+            token = self._valid_token(self._tokens.get(key))
+        if token:
+            return token
+
+        path = cache_files.cache_path(self._file_name)
+        with cache_files.file_lock(path + ".lock"):
+            cached = (cache_files.read_json(path) or {}).get(key)
+        if not self._valid_token(cached):
+            cached = request_token(username, password)
+            with cache_files.file_lock(path + ".lock"):
+                stored = cache_files.read_json(path) or {}
+                stored = {
+                    stored_key: stored_token
+                    for stored_key, stored_token in stored.items()
+                    if self._valid_token(stored_token)
+                }
+                stored[key] = cached
+                cache_files.write_json(path, stored)
+
+        with self._lock:
+            self._tokens[key] = tuple(cached)
+        return cached[0]
+
+    @staticmethod
+    def _cache_key(username: str, password: str) -> str:
+        """
+        The password is part of the key so that a changed password doesn't reuse an old token, and
+        it is hashed so that the password isn't stored in the file.
+        Tokens replayed from a cassette are scrubbed, so they are kept apart from real tokens.
+        """
+        source = BASE_API_URL
+        if cassettes.CASSETTE and cassettes.CASSETTE.mode != "record":
+            source += f"\n{cassettes.CASSETTE.path}"
+        return hashlib.sha256(f"{source}\n{username}\n{password}".encode()).hexdigest()
+
+    @staticmethod
+    def _valid_token(cached: Optional[CachedToken]) -> Optional[str]:
+        if cached and cached[1] - TOKEN_REFRESH_MARGIN > time.time():
+            return cached[0]
+        return None
+
+
+TOKEN_PROVIDER = TokenProvider()
@@ -0,0 +1,207 @@
+"""
+This contains the instrumentation that times each step of the tests.
+
+A step is timed using `span`, e.g. `with tracing.span("wait", "alerts"): ...`. When tracing is
+turned on using `BUGGY_CARS_TEST_TRACE_DIR`, each process writes its spans to a Chrome trace file in
+that directory when it exits, and prints the steps that took the most time. When tracing is off,
+a span only costs a check of a flag.
+
+Run `python3 -m buggy_cars_testing.tracing <directory>` from the `src` directory to merge the trace
+files written by the worker processes of the test runner into one `trace.json`.
+"""
+import argparse
+import atexit
+import contextlib
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, Iterator, List, NamedTuple, Tuple
+
+from buggy_cars_testing.constants import TRACE_DIR, TRACE_TOP_SINKS
+
+MERGED_FILE_NAME = "trace.json"
+
+
+class Span(NamedTuple):
+    """
+    A timed step. The times are in nanoseconds since the epoch.
+    """
+
+    category: str
+    name: str
+    start: int
+    duration: int
+    thread: int
+    args: Dict[str, Any]
+
+
+class Tracer:
+    """
+    This records the spans for the process.
+    """
+
+    def __init__(self, enabled: bool) -> None:
+        self.enabled = enabled
+        self.spans: List[Span] = []
+        # perf_counter_ns is precise but has an arbitrary start, so it is converted to the time
+        # since the epoch to line up the spans from different processes.
+        self._epoch_offset = time.time_ns() - time.perf_counter_ns()
+
+    @contextlib.contextmanager
+    def span(self, category: str, name: str, **args: Any) -> Iterator[None]:
+        """
+        Time the steps run in the `with` block.
+        """
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            end = time.perf_counter_ns()
+            # Appending to a list is thread safe, so no lock is needed.
+            self.spans.append(
+                Span(
+                    category,
+                    name,
+                    start + self._epoch_offset,
+                    end - start,
+                    threading.get_ident(),
+                    args,
+                )
+            )
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        """
+        Returns the spans in the Chrome trace event format.
+        """
+        pid = os.getpid()
+        events = [
+            {"name": "process_name", "ph": "M", "pid": pid, "args": {"name": " ".join(sys.argv)}}
+        ]
+        for recorded in self.spans:
+            events.append(
+                {
+                    "name": recorded.name,
+                    "cat": recorded.category,
+                    "ph": "X",
+                    "ts": recorded.start / 1000,
+                    "dur": recorded.duration / 1000,
+                    "pid": pid,
+                    "tid": recorded.thread,
+                    "args": {key: str(value) for key, value in recorded.args.items()},
+                }
+            )
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write(self, directory: str) -> str:
+        """
+        Write the spans to a Chrome trace file in the `directory`, and return its path.
+        """
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"trace-{os.getpid()}.json")
+        with open(path, "w", encoding="utf-8") as trace_file:
+            json.dump(self.to_chrome_trace(), trace_file)
+        return path
+
+
+def summarize(events: List[Dict[str, Any]], top: int = TRACE_TOP_SINKS) -> str:
+    """
+    Returns a table of the steps that took the most time, from Chrome trace `events`.
+    Self time is the time spent in the step itself, rather than in the steps inside it, e.g. the
+    time of a test case minus the time of its waits and API calls.
+    """
+    totals: Dict[Tuple[str, str], List[float]] = {}
+    by_thread: Dict[Tuple[Any, Any], List[Dict[str, Any]]] = {}
+    for event in events:
+        if event.get("ph") == "X":
+            by_thread.setdefault((event["pid"], event["tid"]), []).append(event)
+
+    for thread_events in by_thread.values():
+        thread_events.sort(key=lambda event: (event["ts"], -event["dur"]))
+        stack: List[Tuple[Dict[str, Any], List[float]]] = []
+        for event in thread_events:
+            while stack and event["ts"] >= stack[-1][0]["ts"] + stack[-1][0]["dur"]:
+                stack.pop()
+            total = totals.setdefault((event["cat"], event["name"]), [0, 0.0, 0.0, 0.0])
+            total[0] += 1
+            total[1] += event["dur"]
+            total[2] += event["dur"]
+            total[3] = max(total[3], event["dur"])
+            if stack:
+                parent = stack[-1][1]
+                parent[2] -= event["dur"]
+            stack.append((event, total))
+
+    lines = [
+        f"{'category':<10} {'step':<60} {'calls':>6} {'self s':>9} {'total s':>9} {'max ms':>9}"
+    ]
+    for (category, name), (count, total, self_time, maximum) in sorted(
+        totals.items(), key=lambda item: item[1][2], reverse=True
+    )[:top]:
+        lines.append(
+            f"{category:<10} {name[-60:]:<60} {count:>6} {self_time / 1e6:>9.3f} "
+            f"{total / 1e6:>9.3f} {maximum / 1e3:>9.1f}"
+        )
+    return "\n".join(lines)
+
+
+def clear_traces(directory: str) -> None:
+    """
+    Remove the trace files left in the `directory` by a previous run.
+    """
+    for path in glob.glob(os.path.join(directory, "trace-*.json")):
+        os.unlink(path)
+
+
+def merge_traces(directory: str) -> List[Dict[str, Any]]:
+    """
+    Merge the trace files written by each process in the `directory` into one `trace.json`, and
+    return the merged events.
+    """
+    events: List[Dict[str, Any]] = []
+    for path in sorted(glob.glob(os.path.join(directory, "trace-*.json"))):
+        with open(path, encoding="utf-8") as trace_file:
+            events.extend(json.load(trace_file)["traceEvents"])
+    with open(os.path.join(directory, MERGED_FILE_NAME), "w", encoding="utf-8") as trace_file:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, trace_file)
+    return events
+
+
+TRACER = Tracer(bool(TRACE_DIR))
+span = TRACER.span
+
+
+def _write_trace() -> None:
+    if not TRACER.spans:
+        return
+    path = TRACER.write(TRACE_DIR)
+    # The test runner prints one summary for all of its worker processes.
+    if multiprocessing.parent_process() is None:
+        events = TRACER.to_chrome_trace()["traceEvents"]
+        print(f"\nSlowest steps (trace written to {path}):\n{summarize(events)}", file=sys.stderr)
+
+
+if TRACER.enabled:
+    atexit.register(_write_trace)
+
+
+def main() -> None:
+    """
+    Merge the trace files in a directory and print the steps that took the most time.
+    """
+    parser = argparse.ArgumentParser(description="Merge the trace files written by the tests.")
+    parser.add_argument("directory", nargs="?", default=TRACE_DIR)
+    parser.add_argument("--top", type=int, default=TRACE_TOP_SINKS)
+    args = parser.parse_args()
+    events = merge_traces(args.directory)
+    print(summarize(events, args.top))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+This contains a pool of registered test users, which are leased out to test classes.
+
+Sharing one user between parallel workers means the workers overwrite each other's profile updates,
+and all of the votes come out of that one user's budget. Instead, users are registered in bulk
+through the API, their credentials are stored in the cache directory, and each worker leases a
+different user. A user that has voted for every model is retired and replaced by a new user.
+"""
+import atexit
+import hashlib
+import os
+import random
+import secrets
+import string
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, NamedTuple, Set
+from urllib.parse import urljoin
+
+from buggy_cars_testing import cache_files, http_session, token_cache
+from buggy_cars_testing.constants import (
+    BASE_API_URL,
+    CATALOG_MAX_WORKERS,
+    NAME_LENGTH,
+    PASSWORD_PER_CHAR_TYPE_LENGTH,
+    USERNAME_LENGTH,
+)
+
+
+class Lease(NamedTuple):
+    """
+    The credentials of a leased user.
+    """
+
+    username: str
+    password: str
+
+
+def _random_string(chars_to_use: str, length: int) -> str:
+    return "".join(secrets.choice(chars_to_use) for _ in range(length))
+
+
+def register_user(username: str, password: str, first_name: str, last_name: str) -> None:
+    """
+    Register a new user through the API.
+    """
+    response = http_session.post(
+        urljoin(BASE_API_URL, "users"),
+        json={
+            "username": username,
+            "firstName": first_name,
+            "lastName": last_name,
+            "password": password,
+            "confirmPassword": password,
+        },
+    )
+    if not response.ok:
+        raise RuntimeError(f"Could not register {username}: {response.text}")
+
+
+def _register_random_user() -> Dict[str, Any]:
+    """
+    Register a user with a random username and a password that meets the password policy.
+    """
+    username = _random_string(string.ascii_lowercase, USERNAME_LENGTH)
+    password_chars = [
+        secrets.choice(chars)
+        for chars in (
+            string.ascii_lowercase,
+            string.ascii_uppercase,
+            string.punctuation,
+            string.digits,
+        )
+        for _ in range(PASSWORD_PER_CHAR_TYPE_LENGTH)
+    ]
+    password = "".join(random.sample(password_chars, len(password_chars)))
+    register_user(
+        username,
+        password,
+        _random_string(string.ascii_lowercase, NAME_LENGTH).capitalize(),
+        _random_string(string.ascii_lowercase, NAME_LENGTH).capitalize(),
+    )
+    return {"username": username, "password": password, "retired": False}
+
+
+class UserPool:
+    """
+    This registers users, and leases them out so that no two workers use the same user at once.
+    Leases are lock files holding the process ID of the worker, so the lease of a worker that died
+    without releasing its user is taken over.
+    """
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self._api_hash = hashlib.sha256(BASE_API_URL.encode()).hexdigest()[:16]
+        self.path = cache_files.cache_path(f"users-{self._api_hash}.json")
+        self._held: Set[str] = set()
+        atexit.register(self.release_all)
+
+    def provision(self) -> None:
+        """
+        Register users in bulk until the pool has `size` users that haven't been retired.
+        """
+        with cache_files.file_lock(self.path + ".lock"):
+            users = self._read()
+            missing = self.size - sum(not user["retired"] for user in users)
+            if missing > 0:
+                with ThreadPoolExecutor(max_workers=CATALOG_MAX_WORKERS) as executor:
+                    users.extend(executor.map(lambda _: _register_random_user(), range(missing)))
+                cache_files.write_json(self.path, users)
+
+    def lease(self) -> Lease:
+        """
+        Lease a user that isn't being used by another worker.
+        If every user is leased, another user is registered.
+        """
+        self.provision()
+        for user in self._read():
+            if not user["retired"] and self._try_lease(user["username"]):
+                if self._can_log_in(user):
+                    return Lease(user["username"], user["password"])
+                # The user no longer exists, e.g. the stand-in server has been restarted.
+                return self.retire(user["username"])
+
+        user = _register_random_user()
+        # The new user is leased before it is added to the pool, so that another worker can't lease
+        # it first.
+        if not self._try_lease(user["username"]):
+            return self.lease()
+        with cache_files.file_lock(self.path + ".lock"):
+            users = self._read()
+            users.append(user)
+            cache_files.write_json(self.path, users)
+        return Lease(user["username"], user["password"])
+
+    def release(self, username: str) -> None:
+        """
+        Give back the lease on a user.
+        """
+        if username in self._held:
+            self._held.discard(username)
+            try:
+                os.unlink(self._lease_path(username))
+            except FileNotFoundError:
+                pass
+
+    def release_all(self) -> None:
+        """
+        Give back all of the leases held by this process.
+        """
+        for username in list(self._held):
+            self.release(username)
+
+    def retire(self, username: str) -> Lease:
+        """
+        Retire a user that can't be used anymore (e.g. it has voted for every model), and lease
+        another user in its place. The pool is topped up with a new user if needed.
+        """
+        with cache_files.file_lock(self.path + ".lock"):
+            users = self._read()
+            for user in users:
+                if user["username"] == username:
+                    user["retired"] = True
+            cache_files.write_json(self.path, users)
+        self.release(username)
+        return self.lease()
+
+    @staticmethod
+    def _can_log_in(user: Dict[str, Any]) -> bool:
+        try:
+            token_cache.request_token(user["username"], user["password"])
+        except (KeyError, ValueError):
+            return False
+        return True
+
+    def _read(self) -> List[Dict[str, Any]]:
+        return cache_files.read_json(self.path) or []
+
+    def _lease_path(self, username: str) -> str:
+        return cache_files.cache_path(f"lease-{self._api_hash}-{username}")
+
+    def _try_lease(self, username: str) -> bool:
+        """
+        Try to create the lease file for the user. Returns True if the lease was taken.
+        """
+        path = self._lease_path(username)
+        for _ in range(2):
+            try:
+                file_descriptor = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                if not self._is_stale(path):
+                    return False
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+                continue
+            with os.fdopen(file_descriptor, "w", encoding="utf-8") as lease_file:
+                lease_file.write(str(os.getpid()))
+            self._held.add(username)
+            return True
+        return False
+
+    @staticmethod
+    def _is_stale(path: str) -> bool:
+        """
+        A lease is stale if the process that holds it is no longer running.
+        """
+        try:
+            with open(path, encoding="utf-8") as lease_file:
+                pid = int(lease_file.read() or 0)
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return True
+        except (OSError, ValueError):
+            # The lease is still being written, or the process belongs to another user.
+            return False
+        return False
@@ -0,0 +1,109 @@
+"""
+This contains a ledger of the car models that a user has and hasn't voted for.
+
+A vote can't be undone, so the voting tests need to find a model that the user hasn't voted for yet.
+Rather than asking the API about every model until one is found, the ledger keeps an index of the
+models that are known to be votable. The index is stored in a file, so it is kept between test runs
+and shared with other worker processes.
+"""
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from buggy_cars_testing import cache_files
+from buggy_cars_testing.api_client import ApiClient
+from buggy_cars_testing.constants import BASE_API_URL, CATALOG_MAX_WORKERS
+
+
+class VoteLedger:
+    """
+    This keeps track of which car models the user has voted for.
+    """
+
+    def __init__(self, username: str) -> None:
+        self.username = username
+        user_hash = hashlib.sha256(f"{BASE_API_URL}\n{username}".encode()).hexdigest()[:16]
+        self.path = cache_files.cache_path(f"votes-{user_hash}.json")
+
+    def claim_model_with_no_vote(self, token: str, all_cars: List[str]) -> str:
+        """
+        Returns a car model that the user has not voted for, out of `all_cars`.
+        The model is removed from the votable models, so that other worker processes don't pick the
+        same model.
+        """
+        while True:
+            with cache_files.file_lock(self.path + ".lock"):
+                ledger = self._read()
+                if not ledger["unvoted"]:
+                    ledger = self._resync(token, all_cars, ledger)
+                    if not ledger["unvoted"]:
+                        raise RuntimeError(
+                            f"{self.username} has voted for every model, need to use another user"
+                        )
+                model_id = ledger["unvoted"].pop(0)
+                self._write(ledger)
+
+            # The model could have been voted for outside of the tests, so check it is still
+            # votable. This is the only API call needed when the ledger is up to date.
+            if self._can_vote(token, model_id):
+                return model_id
+            self.record_vote(model_id)
+
+    def unvoted_models(self, token: str, all_cars: List[str]) -> List[str]:
+        """
+        Returns the car models out of `all_cars` that the user can vote for, bringing the ledger up
+        to date. The API is asked about every model the user isn't known to have voted for.
+        """
+        with cache_files.file_lock(self.path + ".lock"):
+            ledger = self._resync(token, all_cars, self._read())
+            self._write(ledger)
+        return list(ledger["unvoted"])
+
+    def record_vote(self, model_id: str) -> None:
+        """
+        Record that the user has voted for the model.
+        """
+        with cache_files.file_lock(self.path + ".lock"):
+            ledger = self._read()
+            if model_id in ledger["unvoted"]:
+                ledger["unvoted"].remove(model_id)
+            if model_id not in ledger["voted"]:
+                ledger["voted"].append(model_id)
+            self._write(ledger)
+
+    def _resync(
+        self, token: str, all_cars: List[str], ledger: Dict[str, List[str]]
+    ) -> Dict[str, List[str]]:
+        """
+        Ask the API about all of the models that the user isn't known to have voted for.
+        If none of them are votable, the models that the user is known to have voted for are
+        checked as well, in case the votes have been reset (e.g. by restarting the stand-in server).
+        """
+        voted = set(ledger["voted"])
+        ledger = self._probe(token, [model_id for model_id in all_cars if model_id not in voted])
+        ledger["voted"].extend(voted)
+        if not ledger["unvoted"]:
+            ledger = self._probe(token, all_cars)
+        return ledger
+
+    def _probe(self, token: str, candidates: List[str]) -> Dict[str, List[str]]:
+        """
+        Check whether the user can vote for each of the `candidates`, sending the requests
+        concurrently.
+        """
+        ledger: Dict[str, List[str]] = {"voted": [], "unvoted": []}
+        with ThreadPoolExecutor(max_workers=CATALOG_MAX_WORKERS) as executor:
+            can_vote = executor.map(lambda model_id: self._can_vote(token, model_id), candidates)
+            for model_id, votable in zip(candidates, can_vote):
+                ledger["unvoted" if votable else "voted"].append(model_id)
+        return ledger
+
+    @staticmethod
+    def _can_vote(token: str, model_id: str) -> bool:
+        return ApiClient(token).model(model_id).can_vote
+
+    def _read(self) -> Dict[str, List[str]]:
+        return cache_files.read_json(self.path) or {"voted": [], "unvoted": []}
+
+    def _write(self, ledger: Dict[str, List[str]]) -> None:
+        cache_files.write_json(self.path, ledger)
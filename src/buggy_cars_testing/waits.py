@@ -0,0 +1,181 @@
+"""
+This contains waits that the browser resolves as soon as the page changes, rather than by polling.
+
+Each wait installs a MutationObserver in the page using `execute_async_script`. The observer checks
+the condition every time the page changes, and the script returns as soon as the condition is met.
+This is one WebDriver round trip per wait, rather than one or more per poll, and there is no fixed
+poll interval to wait out.
+"""
+import time
+from typing import Any, List, Optional, Tuple
+
+from selenium.common.exceptions import JavascriptException, TimeoutException
+from selenium.webdriver.remote.webdriver import WebDriver
+from selenium.webdriver.remote.webelement import WebElement
+
+from buggy_cars_testing import tracing
+from buggy_cars_testing.constants import WEB_PAGE_WAIT_TIME
+
+# The conditions return a truthy value once they are met, which is returned by the wait.
+WAIT_SCRIPT = """
+const [conditionName, conditionArgs, timeoutMs, done] = arguments;
+
+function isDisplayed(element) {
+  const style = window.getComputedStyle(element);
+  return style.visibility !== "hidden" && element.getClientRects().length > 0;
+}
+
+// The text of the cells of a row of the first table, separated by tabs.
+function tableRowText(rowIndex) {
+  const table = document.querySelector("table");
+  const row = table && table.rows[rowIndex];
+  return row ? Array.from(row.cells, (cell) => cell.innerText.trim()).join("\t") : null;
+}
+
+const conditions = {
+  alerts: () => {
+    const alerts = Array.from(document.querySelectorAll("div[class*='alert']"))
+      .filter(isDisplayed)
+      .map((alert) => alert.innerText.trim());
+    return alerts.length ? alerts : null;
+  },
+  element: ([selector]) => document.querySelector(selector),
+  locator: ([kind, selector]) => kind === "css"
+    ? document.querySelector(selector)
+    : document.evaluate(selector, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null)
+        .singleNodeValue,
+  tableRowChanged: ([rowIndex, previousText]) => {
+    const text = tableRowText(rowIndex);
+    return text !== null && text !== previousText ? text : null;
+  },
+};
+
+let finished = false;
+let timer = null;
+const observer = new MutationObserver(check);
+
+function finish(value) {
+  if (finished) return;
+  finished = true;
+  observer.disconnect();
+  clearTimeout(timer);
+  done(value);
+}
+
+function check() {
+  const value = conditions[conditionName](conditionArgs);
+  if (value) finish(value);
+}
+
+observer.observe(document, { childList: true, subtree: true, characterData: true, attributes: true });
+timer = setTimeout(() => finish(null), timeoutMs);
+check();
+"""
+
+# The script timeout needs to be longer than any of the waits, so the waits can time out by
+# themselves.
+SCRIPT_TIMEOUT_MARGIN = 5
+
+# Parts of the messages of the errors that the browsers raise when the page navigates away while the
+# wait script is running (Chrome, Firefox, and Chrome when the page is replaced by a new document).
+NAVIGATION_ERRORS = (
+    "document unloaded",
+    "document was unloaded",
+    "execution context was destroyed",
+)
+
+
+def wait_for(
+    driver: WebDriver,
+    condition: str,
+    *args: Any,
+    timeout: float = WEB_PAGE_WAIT_TIME,
+    message: str = "",
+) -> Any:
+    """
+    Wait until the `condition` in `WAIT_SCRIPT` is met, and return its value.
+    Raises a TimeoutException if it isn't met within `timeout` seconds.
+    """
+    with tracing.span("wait", condition, args=args):
+        return _wait_for(driver, condition, args, timeout, message)
+
+
+def _wait_for(driver: WebDriver, condition: str, args: Any, timeout: float, message: str) -> Any:
+    deadline = time.monotonic() + timeout
+    while True:
+        remaining = deadline - time.monotonic()
+        try:
+            result = driver.execute_async_script(
+                WAIT_SCRIPT, condition, list(args), max(remaining, 0) * 1000
+            )
+        except JavascriptException as error:
+            # Any other error in the script (e.g. an invalid selector) won't go away by retrying.
+            if not any(part in (error.msg or "").lower() for part in NAVIGATION_ERRORS):
+                raise
+            # The page navigated away while waiting, so wait again on the new page.
+            if time.monotonic() < deadline:
+                continue
+            result = None
+        if result is not None:
+            return result
+        raise TimeoutException(message or f"Timed out waiting for {condition} {args}")
+
+
+def wait_for_alert_messages(driver: WebDriver, timeout: float = WEB_PAGE_WAIT_TIME) -> List[str]:
+    """
+    Wait for any alerts to be displayed, and return their text.
+    """
+    return wait_for(driver, "alerts", timeout=timeout, message="No alerts were displayed")
+
+
+def wait_for_element(
+    driver: WebDriver, css_selector: str, timeout: float = WEB_PAGE_WAIT_TIME
+) -> WebElement:
+    """
+    Wait for an element matching the `css_selector` to be added to the page, and return it.
+    """
+    return wait_for(
+        driver,
+        "element",
+        css_selector,
+        timeout=timeout,
+        message=f"No element matched {css_selector}",
+    )
+
+
+def wait_for_locator(
+    driver: WebDriver, locator: Tuple[str, str], timeout: float = WEB_PAGE_WAIT_TIME
+) -> WebElement:
+    """
+    Wait for an element matching the page object `locator` (either ("css", selector) or
+    ("xpath", expression)) to be added to the page, and return it.
+    """
+    kind, selector = locator
+    return wait_for(
+        driver,
+        "locator",
+        kind,
+        selector,
+        timeout=timeout,
+        message=f"No element matched {kind} {selector}",
+    )
+
+
+def wait_for_table_row_change(
+    driver: WebDriver,
+    row_index: int,
+    previous_text: Optional[str],
+    timeout: float = WEB_PAGE_WAIT_TIME,
+) -> str:
+    """
+    Wait for the text of a row of the first table in the page to be different from the
+    `previous_text`, and return the new text. The row index includes the header row.
+    """
+    return wait_for(
+        driver,
+        "tableRowChanged",
+        row_index,
+        previous_text,
+        timeout=timeout,
+        message=f"Row {row_index} of the table did not change from '{previous_text}'",
+    )